@@ -0,0 +1,63 @@
+"""
+@file bench_memory.py
+@brief Memory benchmark of the sensor object models - memory retained per sensor when building
+N sensors from JSON specs: builder-variant ('sensors_builder_validatedjson') vs. compact ('sensors_compact').
+
+Run from the 'source' directory as:  python -m benchmarks.bench_memory [num_sensors]
+"""
+
+import contextlib
+import io
+import json
+import sys
+import tracemalloc
+
+import sensors_builder_validatedjson as builder_variant
+from sensors_compact import build_compact_sensor
+
+
+def make_json_specs(num_sensors):
+    """ Synthetic sensor specs (as JSON-strings) - every 10th sensor has an extension field ('clk_speed'). """
+    json_specs = []
+    for idx in range(num_sensors):
+        spec = {"sensor_type": "i2c", "bus_no": idx // 128, "i2c_addr": idx % 128,
+                "dev_name": "BM280", "alias": "sensor%d" % idx}
+        if idx % 10 == 0:
+            spec["clk_speed"] = 100000
+        json_specs.append(json.dumps(spec))
+    return json_specs
+
+
+def build_regular(sensor_spec):
+    return builder_variant.Sensors.build_sensor(sensor_clsname=builder_variant.sensor_type_map[sensor_spec["sensor_type"]],
+                                                base_clsname=builder_variant.ExternalSensorBase,
+                                                props=sensor_spec)
+
+
+def bytes_per_sensor(build_func, json_specs):
+    """ Memory retained by the built sensors (decoded specs are dropped after building). """
+    tracemalloc.start()
+    start_size, _ = tracemalloc.get_traced_memory()
+    # The builder-variant prints a lot while building - discard that:
+    with contextlib.redirect_stdout(io.StringIO()) as discarded:
+        sensors = []
+        for json_spec in json_specs:
+            sensors.append(build_func(json.loads(json_spec)))
+            discarded.seek(0)
+            discarded.truncate()
+    end_size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (end_size - start_size) / len(sensors)
+
+
+if __name__ == "__main__":
+    num_sensors = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    bench_specs = make_json_specs(num_sensors)
+    regular = bytes_per_sensor(build_regular, bench_specs)
+    compact = bytes_per_sensor(build_compact_sensor, bench_specs)
+    print("Memory for %d sensors:" % num_sensors)
+    print("Builder-variant (2 objects w. __dict__): %6.0f bytes/sensor, %7.1f MB total" %
+          (regular, regular * num_sensors / 1e6))
+    print("Compact (__slots__, interned strings):   %6.0f bytes/sensor, %7.1f MB total" %
+          (compact, compact * num_sensors / 1e6))
+    print("Reduction: %.1fx" % (regular / compact))
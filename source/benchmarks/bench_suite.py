@@ -0,0 +1,288 @@
+"""
+@file bench_suite.py
+@brief Benchmark suite of the hot paths of 'sensors_builder_validatedjson' - at 1k, 10k and 100k sensors:
+'add_sensor', 'build_sensor', 'JsonValidator.check', 'get_sensor_by_alias' and 'read_sensors'
+(reads through the simulated devices of the mocked driver - virtual clock, i.e. no bus latency).
+For each benchmark and size: throughput (ops/sec), p50/p99 latency per op - each the median over the
+repeated runs - and peak (traced) memory.
+Results are written as JSON, and can be compared against a stored baseline - regressions beyond
+the tolerance are reported, and give exit code 1 (e.g. for a release check). Around each run of a benchmark,
+a fixed reference workload is timed ('machine_speed') - the comparison scales the baseline by the ratio
+of the two speeds, so a machine running slower or faster as a whole (shared host, CPU frequency)
+is not taken for a change of the code.
+
+Run from the 'source' directory as:
+  python -m benchmarks.bench_suite [--sizes 1000,10000] [--output results.json] [--repeat 3] [--no-memory]
+                                   [--baseline benchmarks/baseline.json] [--tolerance 0.25] [--save-baseline]
+"""
+
+import argparse
+import array
+import contextlib
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import sensors_builder_validatedjson as builder_variant
+from sensor_drivers.mocked_sensor_driver import SimulationEngine, SimClock
+from benchmarks.bench_validation import make_specs
+
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+# Number of 'read_sensors()' cycles per size (at least):
+MIN_READ_CYCLES = 5
+READ_SENSORS_PER_SIZE = 20000
+# Absolute slack in baseline comparison - so tiny values (sub-us latencies, ~0 memory) do not flag noise:
+LATENCY_SLACK_US = 1.0
+MEM_SLACK_KB = 64.0
+# Relative slack for p99-latency (at least, on top of the tolerance) - tail latency is the noisiest metric
+# (a few preempted ops move it), so only a large shift counts as regression:
+P99_REL_SLACK = 1.0
+# Fewer runs per benchmark than this make the baseline comparison unreliable:
+MIN_COMPARE_REPEAT = 3
+# A run repeats the benchmark until it took at least this long [sec] - so short ones are not mostly timer noise:
+MIN_RUN_SEC = 0.05
+# Reference workload for 'machine_speed()' - JSON round-trips of a sensor spec:
+SPEED_SPEC = {"sensor_type": "i2c", "bus_no": 1, "i2c_addr": 64, "dev_name": "HDC1080", "alias": "RHT-1-64"}
+SPEED_OPS = 2000
+SPEED_RUNS = 5
+
+
+class BenchContext:
+    """ Synthetic config of one size - and the registry built from it (by the 'add_sensor' benchmark). """
+    def __init__(self, num_sensors, seed=1):
+        self.num_sensors = num_sensors
+        self.specs = make_specs(num_sensors)
+        self.json_specs = [json.dumps(spec) for spec in self.specs]
+        rng = random.Random(seed)
+        self.lookup_aliases = [rng.choice(self.specs)["alias"] for _ in range(num_sensors)]
+        self.read_cycles = max(MIN_READ_CYCLES, READ_SENSORS_PER_SIZE // num_sensors)
+        self.sensors = None
+
+
+# ****************** Benchmarks - each records the latency of every op into 'latencies' ******************
+
+def bench_add_sensor(ctx, latencies):
+    sensors = builder_variant.Sensors()
+    for idx, json_spec in enumerate(ctx.json_specs):
+        start = time.perf_counter_ns()
+        sensors.add_sensor(json_spec)
+        latencies[idx] = time.perf_counter_ns() - start
+    if len(sensors.sensors) != ctx.num_sensors:
+        raise ValueError("Only %d of %d sensors added!" % (len(sensors.sensors), ctx.num_sensors))
+    if ctx.sensors is None:
+        SimulationEngine(seed=1, clock=SimClock(), jitter=0.0).attach(sensors)
+        ctx.sensors = sensors
+
+
+def bench_build_sensor(ctx, latencies):
+    build_sensor = builder_variant.Sensors.build_sensor
+    sensor_type_map = builder_variant.sensor_type_map
+    base_class = builder_variant.ExternalSensorBase
+    for idx, spec in enumerate(ctx.specs):
+        start = time.perf_counter_ns()
+        build_sensor(sensor_clsname=sensor_type_map[spec["sensor_type"]], base_clsname=base_class, props=spec)
+        latencies[idx] = time.perf_counter_ns() - start
+
+
+def bench_validator_check(ctx, latencies):
+    get_json_validator = builder_variant.get_json_validator
+    spec_sensor_type = builder_variant.spec_sensor_type
+    for idx, spec in enumerate(ctx.specs):
+        start = time.perf_counter_ns()
+        valid = get_json_validator(spec_sensor_type(spec)).check(spec)
+        latencies[idx] = time.perf_counter_ns() - start
+        if not valid:
+            raise ValueError("Benchmark spec unexpectedly invalid: %s" % spec)
+
+
+def bench_get_sensor_by_alias(ctx, latencies):
+    get_sensor_by_alias = ctx.sensors.get_sensor_by_alias
+    for idx, s_alias in enumerate(ctx.lookup_aliases):
+        start = time.perf_counter_ns()
+        get_sensor_by_alias(s_alias)
+        latencies[idx] = time.perf_counter_ns() - start
+
+
+def bench_read_sensors(ctx, latencies):
+    for idx in range(ctx.read_cycles):
+        start = time.perf_counter_ns()
+        ctx.sensors.read_sensors()
+        latencies[idx] = time.perf_counter_ns() - start
+
+
+# Name --> (benchmark function, op-unit, number of ops):
+benchmarks = {
+    "add_sensor": (bench_add_sensor, "sensor", lambda ctx: ctx.num_sensors),
+    "build_sensor": (bench_build_sensor, "sensor", lambda ctx: ctx.num_sensors),
+    "validator_check": (bench_validator_check, "spec", lambda ctx: ctx.num_sensors),
+    "get_sensor_by_alias": (bench_get_sensor_by_alias, "lookup", lambda ctx: ctx.num_sensors),
+    "read_sensors": (bench_read_sensors, "cycle", lambda ctx: ctx.read_cycles),
+}
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
+
+
+def median(values):
+    sorted_values = sorted(values)
+    middle = len(sorted_values) // 2
+    if len(sorted_values) % 2:
+        return sorted_values[middle]
+    return (sorted_values[middle - 1] + sorted_values[middle]) / 2.0
+
+
+def machine_speed():
+    """ Throughput [ops/sec] of the reference workload - median of 'SPEED_RUNS' runs. """
+    run_speeds = []
+    for _ in range(SPEED_RUNS):
+        start = time.perf_counter()
+        for _ in range(SPEED_OPS):
+            json.loads(json.dumps(SPEED_SPEC))["alias"]
+        run_speeds.append(SPEED_OPS / (time.perf_counter() - start))
+    return median(run_speeds)
+
+
+def run_benchmark(name, ctx, measure_memory=True, repeat=3):
+    """
+    Run benchmark 'repeat' times - throughput and latencies are the medians over the runs
+    (i.e. one disturbed run - or one lucky one - does not move them).
+    Each run is one or more passes of the benchmark function - at least 'MIN_RUN_SEC' in total.
+    """
+    bench_func, op_unit, num_ops = benchmarks[name]
+    run_ops_per_sec = []
+    run_p50s = []
+    run_p99s = []
+    # Machine speed before and after each run:
+    speeds = [machine_speed()]
+    # Sensor-code prints a lot - discard that (the 'print'-cost is part of the measured paths, as in real use):
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            pass_latencies = []
+            run_elapsed = 0.0
+            while run_elapsed < MIN_RUN_SEC or not pass_latencies:
+                latencies = array.array("q", bytes(8 * num_ops(ctx)))
+                start = time.perf_counter()
+                bench_func(ctx, latencies)
+                run_elapsed += time.perf_counter() - start
+                pass_latencies.append(latencies)
+            sorted_latencies = sorted(itertools.chain.from_iterable(pass_latencies))
+            run_ops_per_sec.append(len(sorted_latencies) / run_elapsed)
+            run_p50s.append(percentile(sorted_latencies, 0.50) / 1000.0)
+            run_p99s.append(percentile(sorted_latencies, 0.99) / 1000.0)
+            speeds.append(machine_speed())
+        peak_mem = None
+        if measure_memory:
+            # Separate run - tracing slows the code down:
+            mem_run_latencies = array.array("q", bytes(8 * num_ops(ctx)))
+            tracemalloc.start()
+            base_mem, _ = tracemalloc.get_traced_memory()
+            bench_func(ctx, mem_run_latencies)
+            _, peak_mem = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            peak_mem -= base_mem
+    result = {"benchmark": name, "num_sensors": ctx.num_sensors, "op_unit": op_unit, "ops": num_ops(ctx),
+              "ops_per_sec": median(run_ops_per_sec), "p50_us": median(run_p50s), "p99_us": median(run_p99s),
+              "machine_speed": median([(speed_before + speed_after) / 2.0
+                                       for speed_before, speed_after in zip(speeds, speeds[1:])])}
+    if peak_mem is not None:
+        result["peak_mem_kb"] = peak_mem / 1024.0
+    return result
+
+
+def run_suite(sizes, measure_memory=True, repeat=3, progress=None):
+    results = {}
+    for num_sensors in sizes:
+        ctx = BenchContext(num_sensors)
+        for name in benchmarks:
+            result = run_benchmark(name, ctx, measure_memory, repeat)
+            results["%s@%d" % (name, num_sensors)] = result
+            if progress is not None:
+                progress(result)
+    return {"meta": {"python": platform.python_version(), "implementation": platform.python_implementation(),
+                     "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                     "sizes": list(sizes), "repeat": repeat},
+            "results": results}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Regressions against baseline - list of (key, metric, baseline-value, value):
+    throughput below, or p99-latency/peak-memory above the baseline by more than 'tolerance' (fraction)
+    - and, for the latter two, by more than the absolute slack. p99-latency is allowed to exceed
+    the baseline by at least 'P99_REL_SLACK' (fraction).
+    Baseline throughput and latency are scaled by the machine speed of the run over that of the baseline
+    (reported baseline values are the scaled ones).
+    """
+    regressions = []
+    for key, result in results["results"].items():
+        base_result = baseline["results"].get(key)
+        if base_result is None:
+            continue
+        speed_ratio = 1.0
+        if "machine_speed" in result and "machine_speed" in base_result:
+            speed_ratio = result["machine_speed"] / base_result["machine_speed"]
+        base_ops_per_sec = base_result["ops_per_sec"] * speed_ratio
+        if result["ops_per_sec"] < base_ops_per_sec * (1.0 - tolerance):
+            regressions.append((key, "ops_per_sec", base_ops_per_sec, result["ops_per_sec"]))
+        for metric, slack, rel_slack, scale in (("p99_us", LATENCY_SLACK_US, P99_REL_SLACK, 1.0 / speed_ratio),
+                                                ("peak_mem_kb", MEM_SLACK_KB, 0.0, 1.0)):
+            if metric not in result or metric not in base_result:
+                continue
+            base_value = base_result[metric] * scale
+            limit = max(base_value * (1.0 + max(tolerance, rel_slack)), base_value + slack)
+            if result[metric] > limit:
+                regressions.append((key, metric, base_value, result[metric]))
+    return regressions
+
+
+def print_result(result):
+    print("%-20s %7d sensors: %12.0f %s/sec  p50=%10.1fus  p99=%10.1fus  peak-mem=%s" %
+          (result["benchmark"], result["num_sensors"], result["ops_per_sec"], result["op_unit"],
+           result["p50_us"], result["p99_us"],
+           "%.0fkB" % result["peak_mem_kb"] if "peak_mem_kb" in result else "-"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark suite of the sensor registry hot paths.")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated numbers of sensors (default: %(default)s)")
+    parser.add_argument("--output", help="write results (JSON) to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline results (default: %(default)s)")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed deviation from baseline, as fraction (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as new baseline")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark - medians count (default: %(default)s)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the (slower) peak-memory runs")
+    args = parser.parse_args()
+    #
+    suite_results = run_suite([int(size) for size in args.sizes.split(",")], measure_memory=not args.no_memory,
+                              repeat=args.repeat, progress=print_result)
+    if args.output:
+        with open(args.output, "w") as results_file:
+            json.dump(suite_results, results_file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(suite_results, baseline_file, indent=2)
+        print("Baseline saved to '%s'." % args.baseline)
+    elif os.path.exists(args.baseline):
+        if args.repeat < MIN_COMPARE_REPEAT:
+            print("NOTE: --repeat %d is below %d - expect noise to show up as regressions." %
+                  (args.repeat, MIN_COMPARE_REPEAT))
+        with open(args.baseline) as baseline_file:
+            found = compare(suite_results, json.load(baseline_file), args.tolerance)
+        for key, metric, base_value, value in found:
+            print("REGRESSION: %s %s: %.1f --> %.1f" % (key, metric, base_value, value))
+        print("%d regression(s) against baseline '%s' (tolerance %.0f%%)." %
+              (len(found), args.baseline, 100 * args.tolerance))
+        if found:
+            sys.exit(1)
+    else:
+        print("No baseline '%s' - use --save-baseline to store one." % args.baseline)
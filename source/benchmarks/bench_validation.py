@@ -0,0 +1,78 @@
+"""
+@file bench_validation.py
+@brief Benchmark of sensor-spec JSON-validation throughput (specs/sec):
+'before' = fresh validators per spec + double validation (as 'add_sensor()' used to do),
+'cached' = cached per-type validator, single validation pass ('jsonschema'),
+'fast'   = cached per-type schema compiled into a Python check-function.
+
+Run from the 'source' directory as:  python -m benchmarks.bench_validation [num_specs]
+"""
+
+import sys
+import time
+
+from jsonschema import Draft4Validator
+
+from schema_compiler import compile_schema
+from sensors_builder_validatedjson import sensor_base_schema, json_dev_schemas, spec_sensor_type
+
+
+def make_specs(num_specs):
+    """ Synthetic (valid) sensor specs - round-robin over sensor types. """
+    specs = []
+    for idx in range(num_specs):
+        kind = idx % 3
+        if kind == 0:
+            spec = {"sensor_type": "i2c", "bus_no": idx // 128, "i2c_addr": idx % 128}
+        elif kind == 1:
+            spec = {"sensor_type": "spi", "bus_no": idx // 8, "cs_no": idx % 8}
+        else:
+            spec = {"sensor_type": "uart", "bus_no": idx, "baud_rate": 115200}
+        spec["dev_name"] = "DEV%d" % kind
+        spec["alias"] = "sensor%d" % idx
+        specs.append(spec)
+    return specs
+
+
+def validate_before(sensor_spec):
+    # Validators created per call, and each spec validated twice ('validate()' + 'is_valid()'):
+    base_validator = Draft4Validator(sensor_base_schema)
+    base_validator.validate(sensor_spec)
+    base_validator.is_valid(sensor_spec)
+    dev_validator = Draft4Validator(json_dev_schemas[sensor_spec["sensor_type"]])
+    dev_validator.validate(sensor_spec)
+    return dev_validator.is_valid(sensor_spec)
+
+
+cached_validators = {sensor_type: Draft4Validator({"allOf": [sensor_base_schema, dev_schema]})
+                     for sensor_type, dev_schema in json_dev_schemas.items()}
+compiled_checks = {sensor_type: compile_schema({"allOf": [sensor_base_schema, dev_schema]}, sensor_type)
+                   for sensor_type, dev_schema in json_dev_schemas.items()}
+
+
+def validate_cached(sensor_spec):
+    return cached_validators[spec_sensor_type(sensor_spec)].is_valid(sensor_spec)
+
+
+def validate_fast(sensor_spec):
+    return compiled_checks[spec_sensor_type(sensor_spec)](sensor_spec)
+
+
+def specs_per_sec(validate_func, specs):
+    start = time.perf_counter()
+    for sensor_spec in specs:
+        if not validate_func(sensor_spec):
+            raise ValueError("Benchmark spec unexpectedly invalid: %s" % sensor_spec)
+    return len(specs) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    num_specs = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    bench_specs = make_specs(num_specs)
+    before = specs_per_sec(validate_before, bench_specs)
+    cached = specs_per_sec(validate_cached, bench_specs)
+    fast = specs_per_sec(validate_fast, bench_specs)
+    print("Validating %d sensor specs:" % num_specs)
+    print("Before (validators per spec, 2 passes): %10.0f specs/sec" % before)
+    print("Cached validator, 1 pass:               %10.0f specs/sec (%.1fx)" % (cached, cached / before))
+    print("Compiled check-function (fast path):    %10.0f specs/sec (%.1fx)" % (fast, fast / before))
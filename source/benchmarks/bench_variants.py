@@ -0,0 +1,126 @@
+"""
+@file bench_variants.py
+@brief Comparative benchmark of the 'Sensors' implementation variants - the same workload (N sensors,
+round-robin I2C/SPI/UART) through each variant's own 'add_sensor()' input format
+(parameter pack, or JSON-string for the JSON-variants), measuring:
+- build cost   --> time per 'add_sensor()' (incl. validation & registration)
+- memory       --> memory retained per registered sensor (traced)
+- read-loop    --> overhead per sensor of 'get_sensor_data()' - all read functions replaced by the SAME
+                   trivial function, so only the variant's own loop/lookup cost is measured
+
+A variant that fails to register any of the sensors fails the run - with the errors it printed.
+
+Run from the 'source' directory as:  python -m benchmarks.bench_variants [num_sensors] [--output results.json]
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import time
+import tracemalloc
+
+from benchmarks.bench_validation import make_specs
+
+
+# Variant module --> input format of its 'add_sensor()':
+variants = {
+    "sensors": "ppack",
+    "sensors_fwk": "ppack",
+    "sensors_exp": "ppack",
+    "sensors_consolidated": "ppack",
+    "sensors_builder": "ppack",
+    "sensors_builder_json": "json",
+    "sensors_builder_validatedjson": "json",
+}
+READ_LOOPS = 5
+
+
+def make_inputs(num_sensors):
+    """ Same sensors in both input formats: parameter packs and JSON-strings. """
+    specs = make_specs(num_sensors)
+    bus_value_names = {"i2c": "i2c_addr", "spi": "cs_no", "uart": "baud_rate"}
+    ppacks = [(spec["sensor_type"], spec["bus_no"], spec[bus_value_names[spec["sensor_type"]]],
+               spec["dev_name"], spec["alias"]) for spec in specs]
+    return {"ppack": ppacks, "json": [json.dumps(spec) for spec in specs]}
+
+
+MAX_ERROR_LINES = 20
+
+
+def null_read():
+    return 1.0
+
+
+def error_lines(variant_output):
+    """ Error messages in the (captured) output of a variant - each ERROR line and the one after (exception args). """
+    lines = variant_output.splitlines()
+    return [line for idx, line in enumerate(lines) if "ERROR" in line or (idx and lines[idx - 1].startswith("ERROR"))]
+
+
+def bench_variant(module_name, inputs):
+    variant = importlib.import_module(module_name)
+    variant_inputs = inputs[variants[module_name]]
+    num_sensors = len(variant_inputs)
+    # Build (timed) - output kept, for the errors of sensors not added:
+    variant_output = io.StringIO()
+    with contextlib.redirect_stdout(variant_output):
+        sensors = variant.Sensors()
+        start = time.perf_counter()
+        for sensor_input in variant_inputs:
+            sensors.add_sensor(sensor_input)
+        build_time = time.perf_counter() - start
+    num_added = len(sensors.sensors)
+    del sensors
+    if num_added != num_sensors:
+        raise RuntimeError("'%s' registered only %d of %d sensors:\n%s" %
+                           (module_name, num_added, num_sensors,
+                            "\n".join(error_lines(variant_output.getvalue())[:MAX_ERROR_LINES])))
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        # Build again (traced) - for memory retained by the registry:
+        tracemalloc.start()
+        start_mem, _ = tracemalloc.get_traced_memory()
+        sensors = variant.Sensors()
+        for sensor_input in variant_inputs:
+            sensors.add_sensor(sensor_input)
+        end_mem, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # Read-loop:
+        for sensor in sensors.sensors:
+            # Read function is in the sensor object itself ('sensors.py') - or in its 'base':
+            getattr(sensor, "base", sensor).read = null_read
+        best_loop = None
+        for _ in range(READ_LOOPS):
+            start = time.perf_counter()
+            for _sensor_name, _sensor_val in sensors.get_sensor_data():
+                pass
+            loop_time = time.perf_counter() - start
+            best_loop = loop_time if best_loop is None else min(best_loop, loop_time)
+    return {"variant": module_name, "input": variants[module_name], "num_sensors": num_sensors,
+            "build_us_per_sensor": 1e6 * build_time / num_sensors,
+            "bytes_per_sensor": (end_mem - start_mem) / num_sensors,
+            "read_loop_ns_per_sensor": 1e9 * best_loop / num_sensors}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Comparative benchmark of the 'Sensors' variants.")
+    parser.add_argument("num_sensors", type=int, nargs="?", default=10000)
+    parser.add_argument("--output", help="write results (JSON) to this file")
+    args = parser.parse_args()
+    #
+    bench_inputs = make_inputs(args.num_sensors)
+    results = [bench_variant(module_name, bench_inputs) for module_name in variants]
+    print("%d sensors per variant:" % args.num_sensors)
+    print("%-30s %-6s %14s %14s %16s" % ("Variant", "Input", "Build us/sensor", "Bytes/sensor", "Read ns/sensor"))
+    for result in sorted(results, key=lambda result: result["build_us_per_sensor"]):
+        print("%-30s %-6s %14.1f %14.0f %16.1f" %
+              (result["variant"], result["input"], result["build_us_per_sensor"],
+               result["bytes_per_sensor"], result["read_loop_ns_per_sensor"]))
+    for metric, label in (("build_us_per_sensor", "Fastest build"), ("bytes_per_sensor", "Smallest memory"),
+                          ("read_loop_ns_per_sensor", "Fastest read-loop")):
+        print("%-18s %s" % (label + ":", min(results, key=lambda result: result[metric])["variant"]))
+    if args.output:
+        with open(args.output, "w") as results_file:
+            json.dump(results, results_file, indent=2)
@@ -0,0 +1,235 @@
+"""
+@file registry_snapshot.py
+@brief Compact, versioned binary snapshot of a sensor registry - for (near-)instant startup.
+A snapshot is restored WITHOUT JSON-parsing, schema-validation or 'SensorBuilder' calls:
+one raw (prototype) object is constructed per sensor type, and each sensor is a copy of that, with its fields set.
+The snapshot carries a content-hash of the source config, so it is rejected once the config changes.
+
+File layout (little-endian) - designed for memory-mapped reading:
+- header:  magic(4s) version(H) reserved(H) config-digest(32s) num_sensors(I) num_strings(I) strings_offset(I)
+- records: num_sensors x [type-code(B) pad(3x) bus_no(i) bus-value(i) dev_name(I) alias(I) extras(I)]
+           where dev_name/alias/extras are string-table indices (NO_STRING if absent),
+           and 'bus-value' is I2C-address, SPI CS-number or UART baud-rate.
+- strings: num_strings x [length(I) utf8-bytes]
+Fields that do not fit a record (e.g. extension fields like 'clk_speed') are stored as a JSON-string in 'extras',
+as is a sensor's value shape (see 'sensor_readings') - if not the default of its type.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+from sensor_readings import ValueShape, default_value_shapes
+
+
+SNAPSHOT_MAGIC = b"SNSR"
+SNAPSHOT_VERSION = 1
+NO_STRING = 0xFFFFFFFF
+
+_header = struct.Struct("<4sHH32sIII")
+_record = struct.Struct("<BxxxiiIII")
+_str_len = struct.Struct("<I")
+
+# Record type-codes - NOTE: append only (or bump SNAPSHOT_VERSION)!
+type_codes = {"i2c": 1, "spi": 2, "uart": 3}
+type_names = {type_code: type_name for type_name, type_code in type_codes.items()}
+# Device-specific field holding the 'bus-value' of a record:
+bus_value_fields = {"i2c": "i2c_addr", "spi": "cs_no", "uart": "baud_rate"}
+
+_INT32_MIN = -2 ** 31
+_INT32_MAX = 2 ** 31 - 1
+
+
+def config_digest(config):
+    """ SHA-256 digest of the source config content (bytes or str). """
+    if isinstance(config, str):
+        config = config.encode("utf-8")
+    return hashlib.sha256(config).digest()
+
+
+def config_file_digest(config_path):
+    """ SHA-256 digest of the source config file - read in blocks. """
+    digest = hashlib.sha256()
+    with open(config_path, "rb") as config_file:
+        for block in iter(lambda: config_file.read(65536), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def _is_int32(value):
+    return type(value) is int and _INT32_MIN <= value <= _INT32_MAX
+
+
+def _prototype(type_name, prototypes, sensor_type_map, base_type):
+    """ Raw sensor object (constructed once per type) - holds the 'standard' fields of that type. """
+    prototype = prototypes.get(type_name)
+    if prototype is None:
+        prototype = prototypes[type_name] = sensor_type_map[type_name](base_type=base_type)
+    return prototype
+
+
+def _value_shape_spec(value_shape):
+    """ Value shape as JSON-able [constructor name, args] - None if it can not be stored. """
+    created_by = getattr(value_shape, "_created_by", None)
+    if created_by is None:
+        return None
+    return [created_by[0].__name__, list(created_by[1])]
+
+
+def write_snapshot(path, sensors, digest, sensor_type_map, base_type, value_shapes=None):
+    """
+    Write snapshot of 'sensors' (list of sensor objects w. 'base') to file 'path'.
+    'value_shapes' (sensor --> ValueShape) - optional - are stored for sensors not of their type's default shape.
+    """
+    strings = {}
+
+    def string_index(text):
+        str_idx = strings.get(text)
+        if str_idx is None:
+            str_idx = strings[text] = len(strings)
+        return str_idx
+
+    prototypes = {}
+    records = bytearray()
+    for sensor in sensors:
+        base = sensor.base
+        type_name = base.type_name
+        prototype = _prototype(type_name, prototypes, sensor_type_map, base_type)
+        value_field = bus_value_fields[type_name]
+        extras = {"base": {}, "sensor": {}}
+        # Fixed record fields - stored as extras if not representable:
+        bus_no = base.bus_no
+        if not _is_int32(bus_no):
+            extras["base"]["bus_no"] = bus_no
+            bus_no = 0
+        bus_value = sensor.__dict__.get(value_field)
+        if not _is_int32(bus_value):
+            extras["sensor"][value_field] = bus_value
+            bus_value = 0
+        dev_name = base.dev_name
+        if isinstance(dev_name, str):
+            dev_name = string_index(dev_name)
+        else:
+            extras["base"]["dev_name"] = dev_name
+            dev_name = NO_STRING
+        alias = base.alias
+        if isinstance(alias, str):
+            alias = string_index(alias)
+        else:
+            extras["base"]["alias"] = alias
+            alias = NO_STRING
+        # Extension fields (i.e. beyond those of a raw sensor of this type):
+        for field_name, field_value in sensor.__dict__.items():
+            if field_name not in prototype.__dict__:
+                extras["sensor"][field_name] = field_value
+        for field_name, field_value in base.__dict__.items():
+            if field_name not in prototype.base.__dict__:
+                extras["base"][field_name] = field_value
+        value_shape = (value_shapes or {}).get(sensor)
+        if value_shape is not None and value_shape is not default_value_shapes.get(type_name):
+            value_shape_spec = _value_shape_spec(value_shape)
+            if value_shape_spec is None:
+                print("ERROR: value shape %s of sensor '%s' can not be stored in snapshot!" % (value_shape, base.alias))
+            elif value_shape_spec != _value_shape_spec(default_value_shapes.get(type_name)):
+                extras["value_shape"] = value_shape_spec
+        if extras["base"] or extras["sensor"] or "value_shape" in extras:
+            extras_idx = string_index(json.dumps(extras))
+        else:
+            extras_idx = NO_STRING
+        records += _record.pack(type_codes[type_name], bus_no, bus_value, dev_name, alias, extras_idx)
+    #
+    strings_offset = _header.size + len(records)
+    # Written to a (uniquely named) temporary file, then renamed - so an interrupted write never leaves a partial
+    # snapshot at 'path', and concurrent writers do not collide:
+    snap_file = tempfile.NamedTemporaryFile(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".",
+                                            suffix=".tmp", delete=False)
+    try:
+        _write_file(snap_file, digest, records, strings, strings_offset)
+        os.replace(snap_file.name, path)
+    except BaseException:
+        os.unlink(snap_file.name)
+        raise
+
+
+def _write_file(snap_file, digest, records, strings, strings_offset):
+    with snap_file:
+        snap_file.write(_header.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, digest,
+                                     len(records) // _record.size, len(strings), strings_offset))
+        snap_file.write(records)
+        for text in strings:
+            encoded = text.encode("utf-8")
+            snap_file.write(_str_len.pack(len(encoded)))
+            snap_file.write(encoded)
+        snap_file.flush()
+        os.fsync(snap_file.fileno())
+
+
+def read_snapshot(path, digest, sensor_type_map, base_type, value_shapes=None):
+    """
+    Restore list of sensors from snapshot file 'path' - stored value shapes are put into dict 'value_shapes'
+    (sensor --> ValueShape), if given.
+    Returns None if the snapshot is missing, of another version, or was made from another config (=digest).
+    """
+    try:
+        with open(path, "rb") as snap_file, mmap.mmap(snap_file.fileno(), 0, access=mmap.ACCESS_READ) as snap_map:
+            return _restore_sensors(snap_map, digest, sensor_type_map, base_type, value_shapes)
+    except (OSError, ValueError, KeyError, IndexError, TypeError, AttributeError, struct.error):
+        # Missing, empty or corrupt snapshot:
+        return None
+
+
+def _restore_sensors(snap_map, digest, sensor_type_map, base_type, value_shapes):
+    magic, version, _, snap_digest, num_sensors, num_strings, strings_offset = _header.unpack_from(snap_map, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or snap_digest != digest:
+        return None
+    if strings_offset != _header.size + num_sensors * _record.size or strings_offset > len(snap_map):
+        return None
+    # String-table - must end exactly at the end of the file (i.e. not truncated):
+    strings = []
+    offset = strings_offset
+    for _ in range(num_strings):
+        (str_len,) = _str_len.unpack_from(snap_map, offset)
+        offset += _str_len.size
+        if offset + str_len > len(snap_map):
+            return None
+        strings.append(str(snap_map[offset:offset + str_len], "utf-8"))
+        offset += str_len
+    if offset != len(snap_map):
+        return None
+    # Records:
+    records_view = memoryview(snap_map)[_header.size:strings_offset]
+    try:
+        records = list(_record.iter_unpack(records_view))
+    finally:
+        records_view.release()
+    #
+    prototypes = {}
+    sensors = []
+    for type_code, bus_no, bus_value, dev_name, alias, extras_idx in records:
+        type_name = type_names[type_code]
+        prototype = _prototype(type_name, prototypes, sensor_type_map, base_type)
+        sensor_class = type(prototype)
+        sensor = sensor_class.__new__(sensor_class)
+        base = base_type.__new__(base_type)
+        base.__dict__.update(prototype.base.__dict__)
+        base.bus_no = bus_no
+        base.dev_name = strings[dev_name] if dev_name != NO_STRING else None
+        base.alias = strings[alias] if alias != NO_STRING else None
+        sensor.__dict__.update(prototype.__dict__)
+        sensor.__dict__[bus_value_fields[type_name]] = bus_value
+        sensor.base = base
+        if extras_idx != NO_STRING:
+            extras = json.loads(strings[extras_idx])
+            base.__dict__.update(extras["base"])
+            sensor.__dict__.update(extras["sensor"])
+            value_shape_spec = extras.get("value_shape")
+            if value_shape_spec is not None and value_shapes is not None:
+                shape_name, shape_args = value_shape_spec
+                if shape_name not in ("scalar", "vector", "structured"):
+                    raise ValueError("Unknown value shape '%s'!" % shape_name)
+                value_shapes[sensor] = getattr(ValueShape, shape_name)(*shape_args)
+        sensors.append(sensor)
+    return sensors
@@ -0,0 +1,124 @@
+"""
+@file schema_compiler.py
+@brief Compiles (small, fixed) JSON schemas into specialized Python check-functions,
+as a fast-path alternative to the generic 'jsonschema' traversal.
+Only the keyword subset used by the sensor schemas is supported - i.e.
+'type', 'required', 'properties', 'allOf', 'minimum' and 'maximum' (Draft4 semantics).
+Any other keyword makes 'compile_schema()' raise ValueError, so the caller can fall back to 'jsonschema'.
+
+@note 'jsonschema' remains the reference - and is still used for reporting errors.
+Run this module to do a differential check of both against the sensor schemas.
+"""
+
+# Type-checks as done by Draft4 ('bool' is NOT a number, and 1.0 is NOT an integer):
+_type_exprs = {
+    "object": "isinstance(%(x)s, dict)",
+    "array": "isinstance(%(x)s, list)",
+    "string": "isinstance(%(x)s, str)",
+    "integer": "(isinstance(%(x)s, int) and not isinstance(%(x)s, bool))",
+    "number": "(isinstance(%(x)s, (int, float)) and not isinstance(%(x)s, bool))",
+    "boolean": "isinstance(%(x)s, bool)",
+    "null": "%(x)s is None",
+}
+
+_supported_keywords = {"type", "required", "properties", "allOf", "minimum", "maximum"}
+
+
+def _compile_expr(schema, var, known_type=None):
+    """
+    Returns a Python boolean expression (as string) checking the value named 'var' against 'schema'.
+    'known_type' is the type the value is already checked to have (so the guards for it can be skipped).
+    """
+    unsupported = set(schema) - _supported_keywords
+    if unsupported:
+        raise ValueError("Cannot compile schema keyword(s): %s" % ", ".join(sorted(unsupported)))
+    exprs = []
+    if "type" in schema:
+        type_names = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+        if type_names != [known_type]:
+            exprs.append("(" + " or ".join(_type_exprs[type_name] % {"x": var} for type_name in type_names) + ")")
+        if len(type_names) == 1:
+            known_type = type_names[0]
+    # Object-keywords - ignored for non-objects:
+    required = schema.get("required", [])
+    obj_exprs = ["%r in %s" % (prop_name, var) for prop_name in required]
+    for prop_name, prop_schema in schema.get("properties", {}).items():
+        prop_expr = _compile_expr(prop_schema, "%s[%r]" % (var, prop_name))
+        if prop_expr == "True":
+            continue
+        if prop_name in required:
+            # Presence is already checked (before this, due to short-circuit evaluation):
+            obj_exprs.append(prop_expr)
+        else:
+            obj_exprs.append("(%r not in %s or %s)" % (prop_name, var, prop_expr))
+    if obj_exprs:
+        if known_type == "object":
+            exprs.extend(obj_exprs)
+        else:
+            exprs.append("(not isinstance(%s, dict) or (%s))" % (var, " and ".join(obj_exprs)))
+    # Number-keywords - ignored for non-numbers (a failure is 'value < min' or 'value > max', like in 'jsonschema'):
+    num_exprs = []
+    if "minimum" in schema:
+        num_exprs.append("not %s < %r" % (var, schema["minimum"]))
+    if "maximum" in schema:
+        num_exprs.append("not %s > %r" % (var, schema["maximum"]))
+    if num_exprs:
+        if known_type in ("integer", "number"):
+            exprs.extend(num_exprs)
+        else:
+            exprs.append("(not %s or (%s))" % (_type_exprs["number"] % {"x": var}, " and ".join(num_exprs)))
+    for sub_schema in schema.get("allOf", []):
+        exprs.append(_compile_expr(sub_schema, var, known_type))
+    exprs = [expr for expr in exprs if expr != "True"]
+    return " and ".join(exprs) if exprs else "True"
+
+
+def compile_schema(schema, name="schema"):
+    """
+    Generates and compiles a check-function for 'schema'.
+    The returned function takes a (decoded) JSON-instance and returns True if valid, False otherwise.
+    The generated source is available as the function's 'source' attribute.
+    """
+    expr = _compile_expr(schema, "instance")
+    func_name = "check_%s" % name
+    source = "def %s(instance):\n    return %s\n" % (func_name, expr)
+    namespace = {}
+    exec(compile(source, "<compiled schema '%s'>" % name, "exec"), namespace)
+    check_func = namespace[func_name]
+    check_func.source = source
+    return check_func
+
+
+# *********** TEST ******************
+if __name__ == "__main__":
+    import itertools
+    from jsonschema import Draft4Validator
+    from sensors_builder_validatedjson import sensor_base_schema, json_dev_schemas
+    #
+    # Differential test: compiled check-function vs. 'jsonschema' on a corpus of (mostly invalid) edge-cases:
+    values = [None, True, False, 0, -1, 1, 7, 8, 127, 128, 2399, 2400, 921400, 921401,
+              1.0, 3.5, float("nan"), "", "i2c", "spi", "uart", "x", [], {}]
+    keys = ["sensor_type", "bus_no", "dev_name", "i2c_addr", "cs_no", "baud_rate"]
+    valid_spec = {"sensor_type": "i2c", "bus_no": 1, "dev_name": "DEV", "i2c_addr": 7, "cs_no": 7, "baud_rate": 2400}
+    corpus = [None, 1, "x", [], {}, valid_spec]
+    for key, value in itertools.product(keys, values):
+        corpus.append(dict(valid_spec, **{key: value}))
+        corpus.append({k: v for k, v in valid_spec.items() if k != key})
+    #
+    schemas = {"base": sensor_base_schema}
+    for sensor_type, dev_schema in json_dev_schemas.items():
+        schemas[sensor_type] = dev_schema
+        schemas["base+" + sensor_type] = {"allOf": [sensor_base_schema, dev_schema]}
+    #
+    num_mismatches = 0
+    for schema_name, schema in schemas.items():
+        reference = Draft4Validator(schema)
+        compiled = compile_schema(schema, schema_name.replace("+", "_"))
+        for instance in corpus:
+            if reference.is_valid(instance) != compiled(instance):
+                num_mismatches += 1
+                print("MISMATCH for schema '%s': instance=%r" % (schema_name, instance))
+    print("Differential check: %d schemas x %d instances - %d mismatch(es)." %
+          (len(schemas), len(corpus), num_mismatches))
+    if num_mismatches:
+        raise SystemExit(1)
@@ -0,0 +1,237 @@
+"""
+@file sensor_bus.py
+@brief Persistent bus handles - sensors on the same physical bus (type, bus_no) share ONE open device node
+(e.g. '/dev/i2c-1', '/dev/spidev0.0', '/dev/ttyS4'), opened on first use and kept open for the life of the
+pool, instead of every sensor (or every read) opening and closing it.
+A handle is handed out LOCKED ('with pool.locked(type_name, bus_no) as handle: ...'), so one transaction
+at a time per bus. The drivers' handle-based read functions ('read_on(handle, bus_value)', see 'bus_reads'
+in 'sensor_drivers') do the transfer - 'attach()' binds them as the sensors' 'read()'.
+Any file can stand in for a device node (e.g. regular files or a pty - see 'device_paths').
+
+@note The bound read functions are closures over the pool (i.e. per process) - not for 'sensor_workers'.
+"""
+
+import contextlib
+import os
+import threading
+
+
+# Device node per bus type (bus_no filled in):
+default_device_paths = {"i2c": "/dev/i2c-%d", "spi": "/dev/spidev%d.0", "uart": "/dev/ttyS%d"}
+
+
+def bus_value(sensor):
+    """ The device-specific bus value of a sensor - I2C address, SPI chip-select or UART baud-rate. """
+    type_name = sensor.base.type_name
+    if type_name == "i2c":
+        return sensor.i2c_addr
+    if type_name == "spi":
+        return sensor.cs_no
+    return sensor.baud_rate
+
+
+class BusHandle:
+    """
+    One open device node - use as context manager to hold its lock for a transaction.
+    'fd' is None once closed (see 'BusHandlePool.close_bus()') - get handles by 'BusHandlePool.locked()'.
+    """
+    def __init__(self, bus_key, path, fd):
+        self.bus_key = bus_key
+        self.path = path
+        self.fd = fd
+        self.lock = threading.Lock()
+        self.transactions = 0
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.transactions += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.lock.release()
+
+    def write(self, data):
+        return os.write(self.fd, data)
+
+    def read(self, size):
+        return os.read(self.fd, size)
+
+
+class BusHandlePool:
+    """
+    Open bus handles, keyed by (type, bus_no). 'device_paths' maps bus type --> path pattern
+    (default: 'default_device_paths'), or a function (type_name, bus_no) --> path.
+    """
+    def __init__(self, device_paths=None, open_flags=os.O_RDWR | os.O_NOCTTY):
+        self.device_paths = device_paths or default_device_paths
+        self.open_flags = open_flags
+        self.handles = {}
+        self.lock = threading.Lock()
+        self.opens = 0
+        # Attached sensors: sensor --> its own (read, read_into) - and number of them per bus:
+        self.attached = {}
+        self.bus_users = {}
+
+    def device_path(self, type_name, bus_no):
+        if callable(self.device_paths):
+            return self.device_paths(type_name, bus_no)
+        return self.device_paths[type_name] % bus_no
+
+    def handle(self, type_name, bus_no):
+        """ Handle of bus (type_name, bus_no) - opened on first use (raises OSError if that fails). """
+        bus_handle = self.handles.get((type_name, bus_no))
+        if bus_handle is not None:
+            return bus_handle
+        with self.lock:
+            bus_handle = self.handles.get((type_name, bus_no))
+            if bus_handle is None:
+                path = self.device_path(type_name, bus_no)
+                bus_handle = BusHandle((type_name, bus_no), path, os.open(path, self.open_flags))
+                self.handles[(type_name, bus_no)] = bus_handle
+                self.opens += 1
+        return bus_handle
+
+    @contextlib.contextmanager
+    def locked(self, type_name, bus_no):
+        """ Open handle of bus (type_name, bus_no), held locked - for one transaction. """
+        while True:
+            bus_handle = self.handle(type_name, bus_no)
+            with bus_handle:
+                if bus_handle.fd is not None:
+                    yield bus_handle
+                    return
+            # Closed after lookup (by 'close_bus()') - next lookup (re)opens it
+
+    def bind_read(self, type_name, bus_no, read_on, device_value):
+        """ Zero-argument read function (as 'sensor.base.read') doing 'read_on(handle, device_value)' on the bus. """
+        handle = self.handle
+
+        def read():
+            # As 'locked()' - without the context manager overhead:
+            while True:
+                bus_handle = handle(type_name, bus_no)
+                with bus_handle:
+                    if bus_handle.fd is not None:
+                        return read_on(bus_handle, device_value)
+        return read
+
+    def attach_sensor(self, sensor, bus_reads):
+        """ Let 'sensor' read through this pool - 'bus_reads' is a dict of bus type --> 'read_on' driver function. """
+        base = sensor.base
+        read_on = bus_reads.get(base.type_name)
+        if read_on is None:
+            return False
+        if sensor not in self.attached:
+            self.attached[sensor] = (base.read, base.read_into)
+            bus_key = (base.type_name, base.bus_no)
+            self.bus_users[bus_key] = self.bus_users.get(bus_key, 0) + 1
+        base.read = self.bind_read(base.type_name, base.bus_no, read_on, bus_value(sensor))
+        # The drivers' 'read_into()' bypass the pool - use the (decoding) fallback via 'read()':
+        base.read_into = None
+        return True
+
+    def attach(self, sensors, bus_reads):
+        """ Let all sensors of a 'Sensors' registry read through this pool. """
+        for sensor in sensors.sensors:
+            self.attach_sensor(sensor, bus_reads)
+        if hasattr(sensors, "_read_layout"):
+            sensors._read_layout = None
+
+    def detach_sensor(self, sensor):
+        """ Give 'sensor' back its own read functions - the handle of its bus is closed when no sensor uses it. """
+        own_reads = self.attached.pop(sensor, None)
+        if own_reads is None:
+            return False
+        base = sensor.base
+        base.read, base.read_into = own_reads
+        bus_key = (base.type_name, base.bus_no)
+        self.bus_users[bus_key] -= 1
+        if not self.bus_users[bus_key]:
+            del self.bus_users[bus_key]
+            self.close_bus(*bus_key)
+        return True
+
+    def close_bus(self, type_name, bus_no):
+        """ Close handle of a bus - after a transaction in progress; a later read opens it again. """
+        with self.lock:
+            bus_handle = self.handles.pop((type_name, bus_no), None)
+        if bus_handle is not None:
+            with bus_handle.lock:
+                os.close(bus_handle.fd)
+                bus_handle.fd = None
+
+    def close(self):
+        """ Close all handles (waiting for transactions in progress) - a later read opens its bus again. """
+        for bus_key in list(self.handles):
+            self.close_bus(*bus_key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def counters(self):
+        return {"opens": self.opens, "open_buses": len(self.handles),
+                "transactions": sum(bus_handle.transactions for bus_handle in list(self.handles.values()))}
+
+
+# *********** TEST ******************
+if __name__ == "__main__":
+    import tempfile
+    import time
+    from sensor_drivers.mocked_sensor_driver import bus_reads
+
+    class DemoBase:
+        def __init__(self, type_name, bus_no, alias):
+            self.type_name = type_name
+            self.bus_no = bus_no
+            self.alias = alias
+            self.read = None
+            self.read_into = None
+
+    class DemoI2cSensor:
+        def __init__(self, bus_no, i2c_addr):
+            self.base = DemoBase("i2c", bus_no, "RHT-%d-%d" % (bus_no, i2c_addr))
+            self.i2c_addr = i2c_addr
+
+    class DemoUartSensor:
+        def __init__(self, port, baud_rate):
+            self.base = DemoBase("uart", port, "RHT-uart%d" % port)
+            self.baud_rate = baud_rate
+
+    class DemoRegistry:
+        def __init__(self, sensors):
+            self.sensors = sensors
+
+    # Stand-ins: regular files for the I2C buses, a pty for the UART port:
+    tmp_dir = tempfile.mkdtemp()
+    pty_master, pty_slave = os.openpty()
+    stand_in_paths = {"i2c": os.path.join(tmp_dir, "i2c-%d"), "uart": os.ttyname(pty_slave)}
+    for bus_no in range(4):
+        open(stand_in_paths["i2c"] % bus_no, "wb").close()
+    registry = DemoRegistry([DemoI2cSensor(bus_no, addr) for bus_no in range(4) for addr in range(10, 60)] +
+                            [DemoUartSensor(0, 115200)])
+    num_reads = 0
+    with BusHandlePool(lambda type_name, bus_no: stand_in_paths[type_name] if type_name == "uart"
+                       else stand_in_paths[type_name] % bus_no) as pool:
+        pool.attach(registry, bus_reads)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            for _ in range(20):
+                for sensor in registry.sensors:
+                    sensor.base.read()
+                    num_reads += 1
+                os.read(pty_master, 4096)   # Drain the pty (the "device" side)
+            pooled_time = time.perf_counter() - start
+        print("Pooled: %d reads, %s - %.1f us/read" % (num_reads, pool.counters(), 1e6 * pooled_time / num_reads))
+    # Same transfers - opening/closing the device node per read:
+    start = time.perf_counter()
+    for _ in range(20):
+        for sensor in registry.sensors[:-1]:
+            fd = os.open(stand_in_paths["i2c"] % sensor.base.bus_no, os.O_RDWR | os.O_NOCTTY)
+            os.write(fd, bytes((sensor.i2c_addr,)))
+            os.close(fd)
+    print("Open/close per read: %.1f us/read" % (1e6 * (time.perf_counter() - start) / (20 * (num_reads // 20 - 1))))
+    os.close(pty_master)
+    os.close(pty_slave)
@@ -0,0 +1,122 @@
+"""
+@file sensor_cache.py
+@brief Read-through value cache in front of 'sensor.base.read()' - so bus traffic scales with the number
+of sensors, not with the number of consumers reading them.
+- a value younger than the sensor's 'max age' is returned from the cache (=hit)
+- otherwise the sensor is read (=miss) - and other threads asking for the SAME sensor while that read
+  is in flight wait for its result instead of doing their own bus transaction (=coalesced)
+Thread-safe; counters 'hits', 'misses' and 'coalesced' show how much bus traffic was saved.
+"""
+
+import threading
+import time
+
+
+class _PendingRead:
+    """ A read in flight - waited for by coalesced requests. """
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ReadCache:
+    """
+    Value cache - 'default_max_age' (seconds) applies to sensors without a max age of their own
+    (see 'set_max_age()'). Max age 0 means: never served from cache, but concurrent reads are still coalesced.
+    """
+    def __init__(self, default_max_age=0.0, clock=time.monotonic):
+        self.default_max_age = default_max_age
+        self.clock = clock
+        self.max_ages = {}
+        # sensor --> (value, time of read):
+        self.values = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def set_max_age(self, sensor, max_age):
+        self.max_ages[sensor] = max_age
+
+    def invalidate(self, sensor=None):
+        """ Drop cached value of 'sensor' - or of all sensors (=None). """
+        with self.lock:
+            if sensor is None:
+                self.values.clear()
+            else:
+                self.values.pop(sensor, None)
+
+    def forget(self, sensor):
+        """ Drop everything about 'sensor' (e.g. when removed from registry). """
+        with self.lock:
+            self.values.pop(sensor, None)
+            self.max_ages.pop(sensor, None)
+
+    def counters(self):
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+
+    def read(self, sensor):
+        """ Value of 'sensor' - from cache, from a read already in flight, or read now (exceptions are passed on). """
+        with self.lock:
+            read_time = self.clock()
+            cached = self.values.get(sensor)
+            if cached is not None and read_time - cached[1] <= self.max_ages.get(sensor, self.default_max_age):
+                self.hits += 1
+                return cached[0]
+            pending = self.pending.get(sensor)
+            if pending is None:
+                pending = self.pending[sensor] = _PendingRead()
+                self.misses += 1
+                is_reader = True
+            else:
+                self.coalesced += 1
+                is_reader = False
+        if not is_reader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+        # Do the (bus-)read - the value's age counts from when the read was started:
+        try:
+            pending.value = sensor.base.read()
+        except BaseException as exc:
+            pending.error = exc
+            raise
+        finally:
+            with self.lock:
+                if pending.error is None:
+                    self.values[sensor] = (pending.value, read_time)
+                del self.pending[sensor]
+            pending.done.set()
+        return pending.value
+
+
+# *********** TEST ******************
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+
+    class DemoBase:
+        def __init__(self, alias):
+            self.alias = alias
+            self.bus_reads = 0
+
+        def read(self):
+            self.bus_reads += 1
+            time.sleep(0.05)
+            return 1.12345
+
+    class DemoSensor:
+        def __init__(self, alias):
+            self.base = DemoBase(alias)
+
+    demo_sensors = [DemoSensor("RHT-sensor%d" % num) for num in range(4)]
+    cache = ReadCache(default_max_age=0.5)
+    cache.set_max_age(demo_sensors[0], 0.0)
+    # 8 consumers, each reading all sensors 3 times:
+    with ThreadPoolExecutor(max_workers=8) as consumers:
+        for _ in range(3):
+            list(consumers.map(lambda consumer: [cache.read(sensor) for sensor in demo_sensors], range(8)))
+    print("Bus reads per sensor: %s" % {sensor.base.alias: sensor.base.bus_reads for sensor in demo_sensors})
+    print("Cache counters: %s" % cache.counters())
@@ -0,0 +1,61 @@
+"""
+@file sensor_constructors.py
+@brief Cache of precompiled sensor constructors - a faster replacement for the 'SensorBuilder.with_field()' chain.
+For each 'shape', i.e. (sensor class, base class, property names), a constructor is generated ONCE,
+with the placement of each property resolved up front - exactly as 'with_field()' would do it:
+- property already in the base object --> set in base object
+- otherwise --> set in sensor object (an 'extension field' if not in the sensor class either)
+A sensor is then built with a single call: 'constructor(values)', with values in property-name order.
+(The raw object created for the first sensor of a shape serves as probe - passed to 'constructor(values, probe)'.)
+"""
+
+# Shape --> constructor:
+_sensor_constructors = {}
+
+
+def compile_sensor_constructor(sensor_clsname, base_clsname, prop_names, probe, skip_props=("sensor_type",)):
+    """
+    Generate constructor for the given shape - properties in 'skip_props' are ignored.
+    'probe' is a raw object of the sensor class, used for finding out where properties go.
+    """
+    targets = []
+    for prop_name in prop_names:
+        if prop_name in skip_props:
+            targets.append("_")
+        elif prop_name in probe.base.__dict__:
+            targets.append("base_fields[%r]" % prop_name)
+        else:
+            if prop_name not in probe.__dict__:
+                print("Warning: field named '%s' - not in (sub)class %s! Extending class ..." %
+                      (prop_name, sensor_clsname.__name__))
+            targets.append("dev_fields[%r]" % prop_name)
+    #
+    func_name = "construct_%s" % sensor_clsname.__name__
+    source = ("def %s(values, sensor=None):\n"
+              "    if sensor is None:\n"
+              "        sensor = sensor_clsname(base_type=base_clsname)\n"
+              "    base_fields = sensor.base.__dict__\n"
+              "    dev_fields = sensor.__dict__\n" % func_name)
+    if targets:
+        source += "    %s, = values\n" % ", ".join(targets)
+    source += "    return sensor\n"
+    namespace = {"sensor_clsname": sensor_clsname, "base_clsname": base_clsname}
+    exec(compile(source, "<sensor constructor %s>" % func_name, "exec"), namespace)
+    constructor = namespace[func_name]
+    constructor.source = source
+    return constructor
+
+
+def construct_sensor(sensor_clsname, base_clsname, prop_names, values):
+    """
+    Build sensor of class 'sensor_clsname' (with base 'base_clsname'), with properties 'prop_names' (tuple)
+    set to 'values' - using the (cached) constructor for this shape.
+    """
+    shape = (sensor_clsname, base_clsname, prop_names)
+    constructor = _sensor_constructors.get(shape)
+    if constructor is None:
+        probe = sensor_clsname(base_type=base_clsname)
+        constructor = _sensor_constructors[shape] = compile_sensor_constructor(sensor_clsname, base_clsname,
+                                                                               prop_names, probe)
+        return constructor(values, probe)
+    return constructor(values)
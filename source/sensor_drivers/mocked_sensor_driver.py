@@ -1,3 +1,16 @@
+import asyncio
+import math
+import random
+import threading
+import time
+
+
+# Driver interface (as 'sensor_driver') - the simulation engine below is imported explicitly:
+__all__ = ["ComplexValue", "configure_i2c_sensor", "configure_spi_sensor",
+           "get_i2c_val", "get_spi_val", "get_uart_val",
+           "get_i2c_val_into", "get_spi_val_into", "get_uart_val_into",
+           "get_i2c_val_on", "get_spi_val_on", "get_uart_val_on", "bus_reads",
+           "aget_i2c_val", "aget_spi_val", "aget_uart_val", "MOCK_READ_DELAY"]
 
 
 # For demo purposes:
@@ -19,10 +32,10 @@ def configure_i2c_sensor(bus_no=None, i2c_addr=None):
 
 
 def configure_spi_sensor(bus_no=None, cs_no=None):
-    if bus_no is None or cs_num is None:
+    if bus_no is None or cs_no is None:
         print("Skipping config ...")
     else:
-        print("MOCK: Configuring SPI-sensor on bus no.%d, CS-num=%d..." % (bus_no, cs_num))
+        print("MOCK: Configuring SPI-sensor on bus no.%d, CS-num=%d..." % (bus_no, cs_no))
 
 
 def get_i2c_val():
@@ -42,3 +55,349 @@ def get_uart_val():
     # Demonstrate returning a list (of values), instead of a single value:
     return [3, 4, 5]
 
+
+# 'read_into'-versions of the read functions - write the reading into a caller-provided buffer of floats
+# (memoryview, array or NumPy-array) at 'offset', instead of returning a new object. Return number of values written.
+# Layout is the same as the decoded reading (see 'sensor_readings'), e.g. ComplexValue as (triggered, channel, ch_val).
+# ==================================================================================================================
+def get_i2c_val_into(buffer, offset):
+    print("MOCK: Getting I2C-sensor value ...")
+    buffer[offset] = 1.12345
+    return 1
+
+
+def get_spi_val_into(buffer, offset):
+    print("MOCK: Getting SPI-sensor value ...")
+    buffer[offset] = 1.0
+    buffer[offset + 1] = 7.0
+    buffer[offset + 2] = 8.765
+    return 3
+
+
+def get_uart_val_into(buffer, offset):
+    print("MOCK: Getting UART-sensor value ...")
+    buffer[offset] = 3.0
+    buffer[offset + 1] = 4.0
+    buffer[offset + 2] = 5.0
+    return 3
+
+
+# Handle-based versions of the read functions - do the transfer on an open bus handle ('sensor_bus.BusHandle',
+# held locked by the caller), shared by all sensors on the bus. The second argument is the device's I2C address,
+# SPI chip-select or UART baud-rate.
+# ============================================================================================================
+def get_i2c_val_on(handle, i2c_addr):
+    print("MOCK: Getting I2C-sensor value (address=%d, on %s) ..." % (i2c_addr, handle.path))
+    handle.write(bytes((i2c_addr,)))
+    return 1.12345
+
+
+def get_spi_val_on(handle, cs_no):
+    print("MOCK: Getting SPI-sensor value (CS=%d, on %s) ..." % (cs_no, handle.path))
+    handle.write(bytes((cs_no,)))
+    return ComplexValue(True, 7, 8.765)
+
+
+def get_uart_val_on(handle, baud_rate):
+    print("MOCK: Getting UART-sensor value (on %s) ..." % handle.path)
+    handle.write(b"R\n")
+    return [3, 4, 5]
+
+
+# Bus type --> handle-based read function (see 'sensor_bus.BusHandlePool.attach()'):
+bus_reads = {"i2c": get_i2c_val_on, "spi": get_spi_val_on, "uart": get_uart_val_on}
+
+
+# asyncio-versions of the mock-up read functions (e.g. for testing 'Sensors.aread_all()'):
+# =========================================================================================
+MOCK_READ_DELAY = 0.01   # Simulated bus transaction time [sec].
+
+
+async def aget_i2c_val():
+    print("MOCK: Getting I2C-sensor value (async) ...")
+    await asyncio.sleep(MOCK_READ_DELAY)
+    return 1.12345
+
+
+async def aget_spi_val():
+    print("MOCK: Getting SPI-sensor value (async) ...")
+    await asyncio.sleep(MOCK_READ_DELAY)
+    return ComplexValue(True, 7, 8.765)
+
+
+async def aget_uart_val():
+    print("MOCK: Getting UART-sensor value (async) ...")
+    await asyncio.sleep(MOCK_READ_DELAY)
+    return [3, 4, 5]
+
+
+# ************************************ SIMULATION ENGINE ************************************
+# Simulated sensor devices - for capacity planning and benchmarking (e.g. 10k sensors) without hardware:
+# - bus latency from bus type, bus speed (I2C/SPI clock, UART baud-rate) and transfer size
+# - readings as waveforms (offset + sine + drift + noise)
+# - faults: NACKs, timeouts and stuck values - all random numbers from a SEEDED generator per device
+# - virtual clock, which may run faster than real time (or not sleep at all)
+# Usage: 'engine = SimulationEngine(seed=1, clock=SimClock()); engine.attach(sensors)' - replaces the
+# read functions of all sensors of a 'Sensors' registry by simulated devices.
+
+class SensorNack(IOError):
+    """ Device did not acknowledge (I2C NACK, SPI/UART no response). """
+
+
+class SensorTimeout(TimeoutError):
+    """ Device did not complete the transfer in time. """
+
+
+class SimClock:
+    """
+    Clock of the simulation (seconds) - with 'speedup=None', time is purely virtual: 'sleep()' just advances
+    the clock, instantly (NOTE: one shared timeline, i.e. for single-threaded use).
+    Otherwise the clock runs 'speedup' times faster than real time ('speedup=1.0': real time).
+    """
+    def __init__(self, speedup=None, start=0.0):
+        self.speedup = speedup
+        self.start = start
+        self.virtual_now = start
+        self.real_start = time.monotonic()
+        self.lock = threading.Lock()
+
+    def now(self):
+        if self.speedup is None:
+            return self.virtual_now
+        return self.start + (time.monotonic() - self.real_start) * self.speedup
+
+    def sleep(self, duration):
+        if duration <= 0:
+            return
+        if self.speedup is None:
+            with self.lock:
+                self.virtual_now += duration
+        else:
+            time.sleep(duration / self.speedup)
+
+    def monotonic_ns(self):
+        """ For use as clock of e.g. 'sensor_scheduler.SamplingScheduler'. """
+        return int(self.now() * 1e9)
+
+
+class BusLatencyModel:
+    """
+    Transfer time of one read on a bus type - wire time from bus speed and transfer size, plus fixed
+    driver overhead and (exponential) random extra delay with mean 'jitter'.
+    """
+    # Bits on the wire per byte - I2C: 8 + ACK, SPI: 8, UART: start + 8 + stop:
+    bits_per_byte = {"i2c": 9, "spi": 8, "uart": 10}
+    # Default bus speed [Hz/baud], transfer size [bytes] (I2C incl. address byte) and overhead [sec]:
+    default_speed = {"i2c": 100000, "spi": 1000000, "uart": 115200}
+    default_bytes = {"i2c": 4, "spi": 6, "uart": 16}
+    default_overhead = {"i2c": 50e-6, "spi": 20e-6, "uart": 500e-6}
+
+    def __init__(self, type_name, bus_speed=None, transfer_bytes=None, overhead=None, jitter=10e-6):
+        self.type_name = type_name
+        self.bus_speed = bus_speed or self.default_speed[type_name]
+        self.transfer_bytes = transfer_bytes or self.default_bytes[type_name]
+        self.overhead = self.default_overhead[type_name] if overhead is None else overhead
+        self.jitter = jitter
+
+    @property
+    def wire_time(self):
+        return self.transfer_bytes * self.bits_per_byte[self.type_name] / self.bus_speed
+
+    def latency(self, rng):
+        return self.overhead + self.wire_time + (rng.expovariate(1.0 / self.jitter) if self.jitter else 0.0)
+
+
+class Waveform:
+    """ Simulated physical quantity: offset + amplitude * sin(2*pi*t/period) + drift * t + gaussian noise. """
+    def __init__(self, offset=20.0, amplitude=1.0, period=60.0, drift=0.0, noise=0.01):
+        self.offset = offset
+        self.amplitude = amplitude
+        self.period = period
+        self.drift = drift
+        self.noise = noise
+
+    def value(self, now, rng, phase=0.0):
+        return (self.offset + self.amplitude * math.sin(2 * math.pi * now / self.period + phase) +
+                self.drift * now + (rng.gauss(0.0, self.noise) if self.noise else 0.0))
+
+
+class FaultModel:
+    """
+    Fault probabilities per read: NACK, timeout (after 'timeout' seconds), and getting stuck
+    (returning the last value for 'stuck_reads' reads).
+    """
+    def __init__(self, nack_rate=0.0, timeout_rate=0.0, stuck_rate=0.0, timeout=0.1, stuck_reads=10):
+        self.nack_rate = nack_rate
+        self.timeout_rate = timeout_rate
+        self.stuck_rate = stuck_rate
+        self.timeout = timeout
+        self.stuck_reads = stuck_reads
+
+
+class SimulatedDevice:
+    """
+    One simulated sensor device - 'read()' returns a result like the driver functions (I2C: float,
+    SPI: ComplexValue, UART: list of 3 values), 'read_into(buffer, offset)' as the '..._into()' functions.
+    """
+    def __init__(self, engine, type_name, device_key, latency_model, waveform, faults):
+        self.engine = engine
+        self.type_name = type_name
+        self.latency_model = latency_model
+        self.waveform = waveform
+        self.faults = faults
+        # Own generator per device - same results for same seed, regardless of read order across devices:
+        self.rng = random.Random("%s:%s" % (engine.seed, device_key))
+        self.phase = self.rng.uniform(0.0, 2 * math.pi)
+        self.stuck_left = 0
+        self.last_values = None
+        self.reads = 0
+
+    def _transfer(self):
+        """ Simulate one bus transfer - returns the reading's values, or raises 'SensorNack'/'SensorTimeout'. """
+        engine = self.engine
+        rng = self.rng
+        faults = self.faults
+        self.reads += 1
+        fault_draw = rng.random()
+        if fault_draw < faults.nack_rate:
+            engine.clock.sleep(self.latency_model.overhead)
+            engine.count("nacks")
+            raise SensorNack("%s device NACK" % self.type_name)
+        if fault_draw < faults.nack_rate + faults.timeout_rate:
+            engine.clock.sleep(faults.timeout)
+            engine.count("timeouts")
+            raise SensorTimeout("%s device timeout" % self.type_name)
+        engine.clock.sleep(self.latency_model.latency(rng))
+        if self.stuck_left > 0:
+            self.stuck_left -= 1
+            engine.count("stuck")
+            return self.last_values
+        if self.last_values is not None and rng.random() < faults.stuck_rate:
+            self.stuck_left = faults.stuck_reads - 1
+            engine.count("stuck")
+            return self.last_values
+        value = self.waveform.value(engine.clock.now(), rng, self.phase)
+        if self.type_name == "i2c":
+            values = (value,)
+        elif self.type_name == "spi":
+            values = (1.0, 7.0, value)
+        else:
+            values = (value, value + 1.0, value + 2.0)
+        self.last_values = values
+        return values
+
+    def read(self):
+        values = self._transfer()
+        self.engine.count("reads")
+        if self.type_name == "i2c":
+            return values[0]
+        if self.type_name == "spi":
+            return ComplexValue(bool(values[0]), int(values[1]), values[2])
+        return list(values)
+
+    def read_into(self, buffer, offset):
+        values = self._transfer()
+        self.engine.count("reads")
+        for idx, item_val in enumerate(values):
+            buffer[offset + idx] = item_val
+        return len(values)
+
+
+class SimulationEngine:
+    """
+    Factory & registry of simulated devices - with shared seed, clock, fault model and waveform,
+    and counters ('reads', 'nacks', 'timeouts', 'stuck').
+    """
+    def __init__(self, seed=0, clock=None, faults=None, waveform=None, jitter=10e-6):
+        self.seed = seed
+        self.clock = clock or SimClock(speedup=1.0)
+        self.faults = faults or FaultModel()
+        self.waveform = waveform or Waveform()
+        self.jitter = jitter
+        self.devices = {}
+        self.counters = {"reads": 0, "nacks": 0, "timeouts": 0, "stuck": 0}
+        self.lock = threading.Lock()
+
+    def count(self, counter_name):
+        with self.lock:
+            self.counters[counter_name] += 1
+
+    def device(self, type_name, bus_no, bus_value, bus_speed=None, transfer_bytes=None):
+        """ Simulated device at (type, bus_no, address/CS/baud-rate) - created on first request. """
+        device_key = (type_name, bus_no, bus_value)
+        device = self.devices.get(device_key)
+        if device is None:
+            if type_name == "uart" and bus_speed is None:
+                bus_speed = bus_value
+            latency_model = BusLatencyModel(type_name, bus_speed, transfer_bytes, jitter=self.jitter)
+            device = self.devices[device_key] = SimulatedDevice(self, type_name, device_key, latency_model,
+                                                                self.waveform, self.faults)
+        return device
+
+    def attach(self, sensors):
+        """ Replace 'read'/'read_into' of every sensor of a 'Sensors' registry by a simulated device. """
+        for sensor in sensors.sensors:
+            base = sensor.base
+            if base.type_name == "i2c":
+                bus_value = sensor.i2c_addr
+            elif base.type_name == "spi":
+                bus_value = sensor.cs_no
+            else:
+                bus_value = sensor.baud_rate
+            device = self.device(base.type_name, base.bus_no, bus_value, bus_speed=getattr(sensor, "clk_speed", None))
+            base.read = device.read
+            base.read_into = device.read_into
+        # Buffer layouts etc. of the registry refer to the old read functions:
+        if hasattr(sensors, "_read_layout"):
+            sensors._read_layout = None
+
+
+# *********** TEST ******************
+if __name__ == "__main__":
+    sim_clock = SimClock()
+    engine = SimulationEngine(seed=42, clock=sim_clock,
+                              faults=FaultModel(nack_rate=0.001, timeout_rate=0.0005, stuck_rate=0.0002))
+    devices = [engine.device("i2c", bus_no, addr) for bus_no in range(40) for addr in range(125)]
+    devices += [engine.device("spi", bus_no, cs_no, bus_speed=10000000) for bus_no in range(8) for cs_no in range(8)]
+    devices += [engine.device("uart", port, 115200) for port in range(16)]
+    real_start = time.monotonic()
+    failed = 0
+    for device in devices:
+        try:
+            device.read()
+        except (SensorNack, SensorTimeout):
+            failed += 1
+    print("One (sequential) read of %d simulated devices: %.3f sec simulated, %.3f sec real - %d failed" %
+          (len(devices), sim_clock.now(), time.monotonic() - real_start, failed))
+    for type_name in ("i2c", "spi", "uart"):
+        model = BusLatencyModel(type_name)
+        print("%-4s latency model: wire time %.1f us + overhead %.1f us" %
+              (type_name, model.wire_time * 1e6, model.overhead * 1e6))
+    print("Counters: %s" % engine.counters)
+    # Multi-rate sampling of 1000 simulated devices - 10 sec of virtual time:
+    import os
+    import sys
+    from types import SimpleNamespace
+    # Run as script (i.e. not with 'python -m sensor_drivers.mocked_sensor_driver' from 'source') - make the
+    # modules of 'source' importable:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from sensor_scheduler import SamplingScheduler
+
+    class SimSensor:
+        def __init__(self, alias, read):
+            self.base = SimpleNamespace(alias=alias, read=read)
+    sim_clock = SimClock()
+    engine = SimulationEngine(seed=42, clock=sim_clock)
+    scheduler = SamplingScheduler(clock=sim_clock.monotonic_ns, sleep=sim_clock.sleep)
+    for addr in range(1000):
+        device = engine.device("i2c", addr // 100, addr % 100, bus_speed=400000)
+        scheduler.add(SimSensor("sensor%d" % addr, device.read), period=0.1 if addr % 10 else 0.01)
+    real_start = time.monotonic()
+    num_reads = scheduler.run(duration=10.0)
+    stats = scheduler.stats()
+    print("Scheduler: %d reads in %.1f sec virtual (%.2f sec real) - overruns: %d" %
+          (num_reads, sim_clock.now(), time.monotonic() - real_start, sum(s.overruns for s in stats.values())))
+    # Same seed --> same readings:
+    replay = SimulationEngine(seed=42, clock=SimClock(), faults=engine.faults)
+    print("Reproducible: %s" % (replay.device("i2c", 0, 0).read() == SimulationEngine(
+        seed=42, clock=SimClock(), faults=engine.faults).device("i2c", 0, 0).read()))
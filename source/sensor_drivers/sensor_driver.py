@@ -20,10 +20,10 @@ def configure_i2c_sensor(bus_no=None, i2c_addr=None):
 
 
 def configure_spi_sensor(bus_no=None, cs_no=None):
-    if bus_no is None or cs_num is None:
+    if bus_no is None or cs_no is None:
         print("Skipping config ...")
     else:
-        print("Configuring SPI-sensor on bus no.%d, CS-num=%d..." % (bus_no, cs_num))
+        print("Configuring SPI-sensor on bus no.%d, CS-num=%d..." % (bus_no, cs_no))
 
 
 def get_i2c_val():
@@ -43,3 +43,54 @@ def get_uart_val():
     # Demonstrate returning a list (of values), instead of a single value:
     return [3, 4, 5]
 
+
+# 'read_into'-versions of the read functions - write the reading into a caller-provided buffer of floats
+# (memoryview, array or NumPy-array) at 'offset', instead of returning a new object. Return number of values written.
+# Layout is the same as the decoded reading (see 'sensor_readings'), e.g. ComplexValue as (triggered, channel, ch_val).
+# ==================================================================================================================
+def get_i2c_val_into(buffer, offset):
+    print("Getting I2C-sensor value ...")
+    buffer[offset] = 1.12345
+    return 1
+
+
+def get_spi_val_into(buffer, offset):
+    print("Getting SPI-sensor value ...")
+    buffer[offset] = 1.0
+    buffer[offset + 1] = 7.0
+    buffer[offset + 2] = 8.765
+    return 3
+
+
+def get_uart_val_into(buffer, offset):
+    print("Getting UART-sensor value ...")
+    buffer[offset] = 3.0
+    buffer[offset + 1] = 4.0
+    buffer[offset + 2] = 5.0
+    return 3
+
+
+# Handle-based versions of the read functions - do the transfer on an open bus handle ('sensor_bus.BusHandle',
+# held locked by the caller), shared by all sensors on the bus. The second argument is the device's I2C address,
+# SPI chip-select or UART baud-rate.
+# ============================================================================================================
+def get_i2c_val_on(handle, i2c_addr):
+    print("Getting I2C-sensor value (address=%d, on %s) ..." % (i2c_addr, handle.path))
+    handle.write(bytes((i2c_addr,)))
+    return 1.12345
+
+
+def get_spi_val_on(handle, cs_no):
+    print("Getting SPI-sensor value (CS=%d, on %s) ..." % (cs_no, handle.path))
+    handle.write(bytes((cs_no,)))
+    return ComplexValue(True, 7, 8.765)
+
+
+def get_uart_val_on(handle, baud_rate):
+    print("Getting UART-sensor value (on %s) ..." % handle.path)
+    handle.write(b"R\n")
+    return [3, 4, 5]
+
+
+# Bus type --> handle-based read function (see 'sensor_bus.BusHandlePool.attach()'):
+bus_reads = {"i2c": get_i2c_val_on, "spi": get_spi_val_on, "uart": get_uart_val_on}
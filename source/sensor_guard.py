@@ -0,0 +1,138 @@
+"""
+@file sensor_guard.py
+@brief Guarded reading - so that one dead or flapping device cannot stall (or slow down) a read-cycle.
+Circuit breaker per sensor - a sensor that keeps failing (errors or timeouts) is no longer read
+on every cycle, but only probed now and then, with growing back-off:
+- CLOSED    --> sensor is read normally; 'failure_threshold' failures in a row open the breaker
+- OPEN      --> sensor is NOT read (=skipped) until the back-off time has passed
+- HALF_OPEN --> ONE probe read is let through: success closes the breaker,
+                failure opens it again with doubled back-off (up to 'max_backoff')
+Read pool of DAEMON threads - a read that never returns occupies one thread, but does not block
+the reading cycle (which only waits until the read deadline) nor interpreter exit.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=3, base_backoff=1.0, max_backoff=60.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.backoff = base_backoff
+        self.open_until = 0.0
+
+    def allow(self):
+        """ May the sensor be read now? (In state OPEN, a True answer is the probe - moving to HALF_OPEN.) """
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and self.clock() >= self.open_until:
+            self.state = HALF_OPEN
+            return True
+        # Open - or half-open with the probe still pending:
+        return False
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.backoff = self.base_backoff
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN:
+            # Probe failed - back off longer:
+            self.backoff = min(2 * self.backoff, self.max_backoff)
+            self._open()
+        elif self.state == CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+
+    def record_skipped(self):
+        """ Read let through by 'allow()' was not done after all - neither success nor failure. """
+        if self.state == HALF_OPEN:
+            # Probe again on next 'allow()':
+            self.state = OPEN
+
+    def _open(self):
+        self.state = OPEN
+        self.open_until = self.clock() + self.backoff
+
+    def __repr__(self):
+        return "CircuitBreaker(%s, failures=%d, backoff=%.1fs)" % (self.state, self.failures, self.backoff)
+
+
+class DaemonReadPool:
+    """
+    Minimal thread-pool of daemon threads, returning 'concurrent.futures.Future's.
+    A thread is added whenever no idle thread is available (up to 'max_threads' - then tasks queue up).
+    """
+    def __init__(self, max_threads=256, name="sensor-read"):
+        self.max_threads = max_threads
+        self.name = name
+        self.tasks = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.num_threads = 0
+        # Threads waiting for a task, with no task reserved for them yet:
+        self.num_idle = 0
+
+    def submit(self, func, *args):
+        future = Future()
+        with self.lock:
+            if self.num_idle > 0:
+                self.num_idle -= 1
+            elif self.num_threads < self.max_threads:
+                self.num_threads += 1
+                threading.Thread(target=self._worker, name="%s-%d" % (self.name, self.num_threads),
+                                 daemon=True).start()
+        self.tasks.put((future, func, args))
+        return future
+
+    def _worker(self):
+        while True:
+            future, func, args = self.tasks.get()
+            if future is None:
+                return
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(func(*args))
+                except BaseException as exc:
+                    future.set_exception(exc)
+            with self.lock:
+                self.num_idle += 1
+
+    def shutdown(self):
+        """ Stop the threads once they are idle (a hung read keeps its thread - it is a daemon). """
+        with self.lock:
+            for _ in range(self.num_threads):
+                self.tasks.put((None, None, None))
+            self.num_threads = 0
+            self.num_idle = 0
+
+
+# *********** TEST ******************
+if __name__ == "__main__":
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, base_backoff=1.0, max_backoff=4.0, clock=lambda: now[0])
+    # Sensor fails until t=8, then recovers:
+    for tick in range(12):
+        now[0] = float(tick)
+        if breaker.allow():
+            if tick < 8:
+                breaker.record_failure()
+                result = "read FAILED"
+            else:
+                breaker.record_success()
+                result = "read OK"
+        else:
+            result = "skipped"
+        print("t=%2d: %-11s --> %s" % (tick, result, breaker))
@@ -0,0 +1,158 @@
+"""
+@file sensor_history.py
+@brief Recent-history store for sensor readings - one preallocated, fixed-capacity ring buffer per sensor,
+with timestamps and values in NumPy arrays (no per-reading Python objects).
+Multi-value readings (e.g. UART value lists, or ComplexValue as (triggered, channel, ch_val)) are stored as
+one row of 'width' values; a failed reading (=None) is stored as NaNs.
+Each sample is written twice - at position 'p' and 'p + capacity' - so the last N samples (N <= capacity)
+are always CONTIGUOUS, and windowed reads ('last()', 'since()') return views, not copies.
+
+@note Requires NumPy. Timestamps are assumed non-decreasing per sensor (as from 'Sensors.read_cycle()').
+"""
+
+import numpy as np
+
+
+def value_row(sensor_val):
+    """ Reading as a tuple of numbers - scalar, list/tuple or ComplexValue(-like). None = failed reading. """
+    if sensor_val is None:
+        return ()
+    if isinstance(sensor_val, (list, tuple)):
+        return sensor_val
+    if hasattr(sensor_val, "ch_val"):
+        return (sensor_val.triggered, sensor_val.channel, sensor_val.ch_val)
+    return (sensor_val,)
+
+
+class SensorHistory:
+    """ Ring buffer of (timestamp, value-row) samples of ONE sensor. """
+    def __init__(self, capacity=1024, width=1, dtype=np.float64):
+        self.capacity = capacity
+        self.width = width
+        self._timestamps = np.zeros(2 * capacity, dtype=np.float64)
+        self._values = np.full((2 * capacity, width), np.nan, dtype=dtype)
+        # Total number of samples appended (write position is 'num_samples % capacity'):
+        self.num_samples = 0
+
+    def __len__(self):
+        return min(self.num_samples, self.capacity)
+
+    def append(self, timestamp, sensor_val):
+        pos = self.num_samples % self.capacity
+        row = value_row(sensor_val)
+        values = self._values
+        try:
+            if len(row) == self.width:
+                values[pos] = row
+            else:
+                # Wrong number of values - pad with NaN (or truncate):
+                values[pos] = np.nan
+                num_values = min(len(row), self.width)
+                values[pos, :num_values] = row[:num_values]
+        except (TypeError, ValueError):
+            # Non-numeric values:
+            values[pos] = np.nan
+        values[pos + self.capacity] = values[pos]
+        self._timestamps[pos] = timestamp
+        self._timestamps[pos + self.capacity] = timestamp
+        self.num_samples += 1
+
+    def _window(self, num_samples):
+        end = self.num_samples % self.capacity + self.capacity
+        if self.num_samples < self.capacity:
+            end = self.num_samples
+        return slice(end - num_samples, end)
+
+    def last(self, num_samples=None):
+        """ Views (timestamps, values) of the last 'num_samples' samples (=None: all kept) - oldest first. """
+        kept = len(self)
+        num_samples = kept if num_samples is None else min(num_samples, kept)
+        window = self._window(num_samples)
+        return self._timestamps[window], self._values[window]
+
+    def since(self, timestamp):
+        """ Views (timestamps, values) of the samples taken at/after 'timestamp'. """
+        timestamps, values = self.last()
+        first = int(np.searchsorted(timestamps, timestamp, side="left"))
+        return timestamps[first:], values[first:]
+
+    def latest(self):
+        """ (timestamp, value-row) of the most recent sample - or None if empty. """
+        if self.num_samples == 0:
+            return None
+        pos = (self.num_samples - 1) % self.capacity
+        return self._timestamps[pos], self._values[pos]
+
+
+class HistoryStore:
+    """
+    History of all sensors, by sensor key (e.g. the stable sensor id of a 'Sensors' registry, or the alias).
+    Buffers are allocated by 'add(key, width)' - or, for a key not added, on its first reading: with the width
+    given in 'widths', else the width of that reading (so a first failed reading would give width 1).
+    """
+    def __init__(self, capacity=1024, widths=None):
+        self.capacity = capacity
+        self.widths = dict(widths or {})
+        self.histories = {}
+
+    def __getitem__(self, sensor_name):
+        return self.histories[sensor_name]
+
+    def __contains__(self, sensor_name):
+        return sensor_name in self.histories
+
+    def add(self, sensor_name, width):
+        """ (Re)allocate the buffer of a sensor - rows of 'width' values. """
+        self.histories[sensor_name] = SensorHistory(self.capacity, width)
+
+    def record(self, sensor_name, sensor_val, timestamp):
+        history = self.histories.get(sensor_name)
+        if history is None:
+            width = self.widths.get(sensor_name) or max(len(value_row(sensor_val)), 1)
+            history = self.histories[sensor_name] = SensorHistory(self.capacity, width)
+        history.append(timestamp, sensor_val)
+
+    def record_readings(self, readings):
+        """ Record list of (sensor_name, sensor_val, timestamp) - e.g. from 'Sensors.read_cycle()'. """
+        for sensor_name, sensor_val, timestamp in readings:
+            self.record(sensor_name, sensor_val, timestamp)
+
+    def drop(self, sensor_name):
+        self.histories.pop(sensor_name, None)
+
+    def latest(self, sensor_names=None):
+        """
+        Latest value of every sensor (or of 'sensor_names') in bulk - returns (sensor_names, timestamps, values),
+        where 'values' is an (N x max-width) array, NaN-padded; sensors without samples get NaN timestamps.
+        """
+        if sensor_names is None:
+            sensor_names = list(self.histories)
+        histories = [self.histories.get(sensor_name) for sensor_name in sensor_names]
+        max_width = max([history.width for history in histories if history is not None], default=1)
+        timestamps = np.full(len(sensor_names), np.nan)
+        values = np.full((len(sensor_names), max_width), np.nan)
+        for row, history in enumerate(histories):
+            if history is not None and history.num_samples:
+                timestamps[row], values[row, :history.width] = history.latest()
+        return sensor_names, timestamps, values
+
+
+# *********** TEST ******************
+if __name__ == "__main__":
+    class ComplexValue:
+        def __init__(self, triggered=False, channel=-1, ch_val=0.0):
+            self.triggered = triggered
+            self.channel = channel
+            self.ch_val = ch_val
+
+    store = HistoryStore(capacity=4)
+    for tick in range(6):
+        store.record_readings([("RHT-sensor1", 20.0 + tick, 100.0 + tick),
+                               ("RHT-sensor2A", ComplexValue(True, 7, 8.0 + tick), 100.0 + tick),
+                               ("RHT-sensor3", [3, 4, 5 + tick] if tick != 4 else None, 100.0 + tick)])
+    timestamps, values = store["RHT-sensor1"].last(3)
+    print("Last 3 of 'RHT-sensor1': %s at %s (view: %s)" % (values[:, 0], timestamps, values.base is not None))
+    timestamps, values = store["RHT-sensor3"].since(103.0)
+    print("'RHT-sensor3' since t=103:\n%s" % values)
+    names, timestamps, values = store.latest()
+    print("Latest of every sensor: %s\n%s" % (names, values))
@@ -0,0 +1,138 @@
+"""
+@file sensor_readings.py
+@brief Typed reading records - each sensor declares the SHAPE of its readings when registered:
+- scalar     --> e.g. I2C temperature sensor returning a float
+- vector     --> fixed-length list of values, e.g. UART submodule returning [3, 4, 5]
+- structured --> object with named fields, e.g. 'ComplexValue' (triggered, channel, ch_val)
+A decoder is built ONCE per shape, so reading a sensor needs no type-probing ('type(val) is list' etc.) -
+the raw driver value is turned directly into a compact record (a named tuple), which is the same
+kind of object for all three shapes: a tuple of values, with field names.
+"""
+
+from collections import namedtuple
+from operator import attrgetter
+
+
+# Status of a reading (in cycle results, the shared-memory table of 'sensor_workers' etc.):
+STATUS_NONE = 0       # No reading (yet)
+STATUS_OK = 1
+STATUS_ERROR = 2      # Driver raised an error
+STATUS_TIMEOUT = 3    # Read deadline passed
+STATUS_OPEN = 4       # Not read - circuit breaker open
+STATUS_BUSY = 5       # Not read - bus held by a timed-out read of another sensor
+status_names = {STATUS_NONE: "none", STATUS_OK: "ok", STATUS_ERROR: "error", STATUS_TIMEOUT: "timeout",
+                STATUS_OPEN: "open", STATUS_BUSY: "busy"}
+
+SCALAR = "scalar"
+VECTOR = "vector"
+STRUCTURED = "structured"
+
+ScalarReading = namedtuple("ScalarReading", ["value"])
+
+# Record types - one per vector-length/structure (shared by all shapes of same layout):
+_record_types = {}
+
+
+def record_type(type_name, field_names):
+    key = (type_name, tuple(field_names))
+    rec_type = _record_types.get(key)
+    if rec_type is None:
+        rec_type = _record_types[key] = namedtuple(type_name, field_names)
+    return rec_type
+
+
+class ValueShape:
+    """
+    Declared shape of a sensor's readings - use 'scalar()', 'vector(length)' or 'structured(name, fields)'.
+    'decode(raw_value)' returns the typed record, 'show(idx, sensor, reading)' prints it (as 'read_sensors()' does).
+    """
+    def __init__(self, kind, record_type, decode):
+        self.kind = kind
+        self.record_type = record_type
+        self.decode = decode
+        self.show = self._show_funcs[kind]
+
+    @property
+    def width(self):
+        """ Number of values per reading. """
+        return len(self.record_type._fields)
+
+    def __reduce__(self):
+        # Pickled as the call creating it (decoders are closures) - e.g. for sending to worker processes:
+        return self._created_by
+
+    @classmethod
+    def scalar(cls):
+        value_shape = cls(SCALAR, ScalarReading, ScalarReading)
+        value_shape._created_by = (cls.scalar, ())
+        return value_shape
+
+    @classmethod
+    def vector(cls, length):
+        rec_type = record_type("Vector%dReading" % length, ["v%d" % idx for idx in range(length)])
+        value_shape = cls(VECTOR, rec_type, rec_type._make)
+        value_shape._created_by = (cls.vector, (length,))
+        return value_shape
+
+    @classmethod
+    def structured(cls, name, field_names):
+        """ Reading is an object with attributes 'field_names' - e.g. structured("ComplexValue", [...]). """
+        rec_type = record_type("%sReading" % name, field_names)
+        get_fields = attrgetter(*field_names)
+        make_record = rec_type._make
+        if len(field_names) == 1:
+            value_shape = cls(STRUCTURED, rec_type, lambda raw_value: make_record((get_fields(raw_value),)))
+        else:
+            value_shape = cls(STRUCTURED, rec_type, lambda raw_value: make_record(get_fields(raw_value)))
+        value_shape._created_by = (cls.structured, (name, list(field_names)))
+        return value_shape
+
+    def __repr__(self):
+        return "%s(%s)" % (self.kind, ", ".join(self.record_type._fields))
+
+    @staticmethod
+    def _show_scalar(idx, sensor, reading):
+        print("Sensor no.%d: %s (type=%s) value = %s" % (idx, sensor.base.alias, sensor.base.dev_name, reading.value))
+
+    @staticmethod
+    def _show_vector(idx, sensor, reading):
+        print("Value list:")
+        print("------------")
+        for val_no, item_val in enumerate(reading):
+            print("Value no.%d = %d" % (val_no, item_val))
+        print("")
+
+    @staticmethod
+    def _show_structured(idx, sensor, reading):
+        record_name = type(reading).__name__
+        print("%s:" % record_name)
+        print("-" * (len(record_name) + 1))
+        for field_name, field_val in zip(reading._fields, reading):
+            print("%s: %s" % (field_name, field_val))
+        print("")
+
+    _show_funcs = {SCALAR: _show_scalar.__func__, VECTOR: _show_vector.__func__,
+                   STRUCTURED: _show_structured.__func__}
+
+
+# Shape of the 'ComplexValue' driver result:
+complex_value_shape = ValueShape.structured("ComplexValue", ["triggered", "channel", "ch_val"])
+
+# Default value shapes per sensor type (as returned by the drivers):
+default_value_shapes = {"i2c": ValueShape.scalar(),
+                        "spi": complex_value_shape,
+                        "uart": ValueShape.vector(3)}
+
+
+# *********** TEST ******************
+if __name__ == "__main__":
+    from sensor_drivers.mocked_sensor_driver import ComplexValue
+
+    for type_name, raw_value in (("i2c", 1.12345), ("spi", ComplexValue(True, 7, 8.765)), ("uart", [3, 4, 5])):
+        shape = default_value_shapes[type_name]
+        reading = shape.decode(raw_value)
+        print("%s: shape=%s --> %s (values: %s)" % (type_name, shape, reading, tuple(reading)))
+    try:
+        default_value_shapes["uart"].decode([1, 2])
+    except TypeError as exc:
+        print("Wrong vector length: %s" % exc)
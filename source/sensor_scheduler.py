@@ -0,0 +1,179 @@
+"""
+@file sensor_scheduler.py
+@brief Multi-rate periodic sampling of sensors - each sensor is read at its OWN rate
+(e.g. IMU at 1kHz, hygrometer at 1Hz), instead of polling all sensors in lockstep.
+Sensors are kept in a heap ordered by next deadline; the scheduler sleeps until the earliest deadline,
+reads that sensor and re-schedules it one period later.
+Timing is drift-free: deadlines are 'start + N x period' on the 'time.monotonic_ns()' clock
+(i.e. NOT 'time of last read + period'), so read durations and sleep inaccuracy do not accumulate.
+If a read finishes after its next deadline (=overrun), the missed deadlines are skipped - keeping the phase.
+Per-sensor statistics: reads, overruns, skipped deadlines and jitter (=read start - deadline).
+
+@note Reads are done in the calling thread - so a slow sensor delays the others (shows up as their jitter/overruns).
+"""
+
+import heapq
+import time
+
+
+NS_PER_SEC = 1000000000
+
+
+class SamplingStats:
+    """ Sampling statistics of one sensor (times in nanoseconds). """
+    def __init__(self):
+        self.reads = 0
+        self.errors = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.jitter_sum = 0
+        self.jitter_max = 0
+        self.read_time_sum = 0
+
+    @property
+    def jitter_mean(self):
+        return self.jitter_sum / self.reads if self.reads else 0.0
+
+    @property
+    def read_time_mean(self):
+        return self.read_time_sum / self.reads if self.reads else 0.0
+
+    def __repr__(self):
+        return ("reads=%d errors=%d overruns=%d skipped=%d jitter mean/max=%.1f/%.1fus read-time mean=%.1fus" %
+                (self.reads, self.errors, self.overruns, self.skipped,
+                 self.jitter_mean / 1000, self.jitter_max / 1000, self.read_time_mean / 1000))
+
+
+class SampledSensor:
+    """ Heap entry - a sensor with its sampling period and statistics. """
+    def __init__(self, sensor, period_ns):
+        self.sensor = sensor
+        self.period_ns = period_ns
+        self.deadline = 0
+        self.stats = SamplingStats()
+        self.active = True
+
+
+class SamplingScheduler:
+    """
+    Deadline-ordered scheduler - add sensors with 'add(sensor, period)' (period in seconds), then 'run()'.
+    Each reading is passed to 'callback(sensor_name, sensor_val, timestamp_ns)'.
+    """
+    def __init__(self, callback=None, clock=time.monotonic_ns, sleep=time.sleep):
+        self.callback = callback
+        self.clock = clock
+        self.sleep = sleep
+        self.sampled = {}
+        self._heap = []
+        # Tie-breaker for equal deadlines (=order of scheduling):
+        self._seq = 0
+
+    def _push(self, entry):
+        heapq.heappush(self._heap, (entry.deadline, self._seq, entry))
+        self._seq += 1
+
+    def add(self, sensor, period, start_ns=None):
+        """ Sample 'sensor' every 'period' seconds - first read at 'start_ns' (default: now). """
+        if period <= 0:
+            print("ERROR: sampling period of sensor '%s' must be >0 (is %s)!" % (sensor.base.alias, period))
+            return None
+        if sensor in self.sampled:
+            self.remove(sensor)
+        entry = self.sampled[sensor] = SampledSensor(sensor, int(round(period * NS_PER_SEC)))
+        entry.deadline = self.clock() if start_ns is None else start_ns
+        self._push(entry)
+        return entry
+
+    def remove(self, sensor):
+        """ Stop sampling 'sensor' - its heap entry is dropped lazily. """
+        entry = self.sampled.pop(sensor, None)
+        if entry is None:
+            return False
+        entry.active = False
+        return True
+
+    def stats(self):
+        """ Statistics per sensor - dict of sensor_name --> SamplingStats. """
+        return {entry.sensor.base.alias: entry.stats for entry in self.sampled.values()}
+
+    def run_once(self):
+        """ Wait for the earliest deadline and read that sensor - returns False if nothing is scheduled. """
+        while self._heap and not self._heap[0][2].active:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return False
+        deadline, _, entry = self._heap[0]
+        now = self.clock()
+        if now < deadline:
+            self.sleep((deadline - now) / NS_PER_SEC)
+        heapq.heappop(self._heap)
+        self._read(entry)
+        if entry.active:
+            self._push(entry)
+        return True
+
+    def _read(self, entry):
+        stats = entry.stats
+        base = entry.sensor.base
+        started = self.clock()
+        try:
+            sensor_val = base.read()
+        except Exception as exc:
+            print("ERROR reading sensor '%s': %s" % (base.alias, exc))
+            stats.errors += 1
+            sensor_val = None
+        finished = self.clock()
+        jitter = started - entry.deadline
+        stats.reads += 1
+        stats.jitter_sum += jitter
+        if jitter > stats.jitter_max:
+            stats.jitter_max = jitter
+        stats.read_time_sum += finished - started
+        if self.callback is not None:
+            self.callback(base.alias, sensor_val, started)
+        # Next deadline - in phase with the first one:
+        entry.deadline += entry.period_ns
+        if finished > entry.deadline:
+            missed = (finished - entry.deadline) // entry.period_ns + 1
+            stats.overruns += 1
+            stats.skipped += missed
+            entry.deadline += missed * entry.period_ns
+
+    def run(self, duration=None, max_reads=None):
+        """ Run for 'duration' seconds and/or 'max_reads' reads (=None: no limit) - returns number of reads. """
+        end_ns = None if duration is None else self.clock() + int(duration * NS_PER_SEC)
+        num_reads = 0
+        while max_reads is None or num_reads < max_reads:
+            while self._heap and not self._heap[0][2].active:
+                heapq.heappop(self._heap)
+            if not self._heap or (end_ns is not None and self._heap[0][0] >= end_ns):
+                break
+            self.run_once()
+            num_reads += 1
+        return num_reads
+
+
+# *********** TEST ******************
+if __name__ == "__main__":
+    class DemoBase:
+        def __init__(self, alias, read_time):
+            self.alias = alias
+            self.read_time = read_time
+
+        def read(self):
+            time.sleep(self.read_time)
+            return 1.0
+
+    class DemoSensor:
+        def __init__(self, alias, read_time=0.0):
+            self.base = DemoBase(alias, read_time)
+
+    readings = {}
+    scheduler = SamplingScheduler(callback=lambda name, val, ts: readings.__setitem__(name, readings.get(name, 0) + 1))
+    scheduler.add(DemoSensor("IMU-A1"), 0.001)
+    scheduler.add(DemoSensor("RHT-sensor1"), 0.1)
+    scheduler.add(DemoSensor("RHT-sensor3", read_time=0.3), 0.25)   # Slower than its period --> overruns
+    scheduler.run(duration=1.0)
+    print("Reads per sensor in 1 sec: %s" % readings)
+    for name, stats in scheduler.stats().items():
+        print("%-12s %s" % (name, stats))
@@ -0,0 +1,179 @@
+"""
+@file sensor_workers.py
+@brief Multi-process acquisition - the sensors are partitioned per physical bus (type, bus_no), and each bus
+is read (and its readings decoded) by its OWN worker process, so acquisition is not limited to one CPU core.
+Workers write the latest reading of each sensor into a shared-memory table ('multiprocessing.shared_memory'),
+indexed by the stable sensor id ('Sensors.sensor_ids'). The parent reads the table WITHOUT locks:
+each row has a sequence number that is odd while the row is written (i.e. a 'seqlock') -
+a snapshot re-reads only rows that changed while being copied.
+Table row: seq(u8) timestamp(f8) status(i8) values(width x f8) - values of a reading as decoded by its
+value shape (see 'sensor_readings'), NaN-padded.
+
+@note Requires NumPy. Read functions and value shapes are sent to the workers - so they must be picklable
+(module-level driver functions, like the ones in 'sensor_drivers', are).
+"""
+
+import multiprocessing
+import os
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Row status:
+from sensor_readings import STATUS_NONE, STATUS_OK, STATUS_ERROR
+
+
+def table_dtype(width):
+    return np.dtype([("seq", np.uint64), ("timestamp", np.float64), ("status", np.int64),
+                     ("values", np.float64, (width,))])
+
+
+def _bus_worker(shm_name, num_rows, width, bus_sensors, period, stop_event, quiet):
+    """ Worker process - reads the sensors of one bus every 'period' seconds, until 'stop_event' is set. """
+    if quiet:
+        sys.stdout = open(os.devnull, "w")
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        table = np.ndarray(num_rows, dtype=table_dtype(width), buffer=shm.buf)
+        seq = table["seq"]
+        while not stop_event.is_set():
+            for row, read, value_shape in bus_sensors:
+                try:
+                    values = value_shape.decode(read())
+                    status = STATUS_OK
+                except Exception as exc:
+                    print("ERROR reading sensor (id=%d): %s" % (row, exc))
+                    values = ()
+                    status = STATUS_ERROR
+                # Odd sequence number while row is being written:
+                seq[row] += 1
+                table["timestamp"][row] = time.time()
+                table["status"][row] = status
+                row_values = table["values"][row]
+                row_values[:] = np.nan
+                row_values[:len(values)] = values
+                seq[row] += 1
+            stop_event.wait(period)
+        del table, seq
+    finally:
+        shm.close()
+
+
+class ProcessAcquisition:
+    """
+    Multi-process acquisition of the sensors of a 'Sensors' registry (as registered at construction).
+    Use as context manager, or call 'start()'/'stop()' - then 'snapshot()' for the latest readings.
+    """
+    def __init__(self, sensors, period=0.1, quiet=False, mp_context=None):
+        self.period = period
+        self.quiet = quiet
+        self.mp_context = mp_context or multiprocessing.get_context()
+        self.sensor_ids = dict((sensor.base.alias, sensor_id) for sensor, sensor_id in sensors.sensor_ids.items())
+        self.num_rows = max(sensors.sensor_ids.values(), default=-1) + 1
+        self.width = max([value_shape.width for value_shape in sensors.value_shapes.values()], default=1)
+        # Partition per bus: (type, bus_no) --> [(sensor id, read function, value shape), ...]
+        self.partitions = {}
+        for bus_key, bus_sensors in sensors.bus_partitions.items():
+            self.partitions[bus_key] = [(sensors.sensor_ids[sensor], sensor.base.read, sensors.value_shapes[sensor])
+                                        for sensor in bus_sensors]
+        self.shm = None
+        self.table = None
+        self.workers = []
+        self.stop_event = None
+
+    def start(self):
+        dtype = table_dtype(self.width)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(self.num_rows, 1) * dtype.itemsize)
+        self.table = np.ndarray(self.num_rows, dtype=dtype, buffer=self.shm.buf)
+        self.table["seq"] = 0
+        self.table["timestamp"] = np.nan
+        self.table["status"] = STATUS_NONE
+        self.table["values"] = np.nan
+        self.stop_event = self.mp_context.Event()
+        for bus_key, bus_sensors in self.partitions.items():
+            worker = self.mp_context.Process(target=_bus_worker, name="sensor-bus-%s-%s" % bus_key,
+                                             args=(self.shm.name, self.num_rows, self.width, bus_sensors,
+                                                   self.period, self.stop_event, self.quiet), daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        return self
+
+    def stop(self):
+        if self.stop_event is not None:
+            self.stop_event.set()
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+        if self.shm is not None:
+            self.table = None
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def snapshot(self, max_retries=100):
+        """
+        Consistent copy of the table (lock-free) - structured array indexed by sensor id,
+        with fields 'seq', 'timestamp', 'status' and 'values'.
+        """
+        table = self.table
+        seq_before = table["seq"].copy()
+        result = table.copy()
+        torn = (seq_before != table["seq"]) | ((seq_before & 1) == 1)
+        for _ in range(max_retries):
+            if not torn.any():
+                return result
+            rows = np.flatnonzero(torn)
+            seq_before = table["seq"][rows]
+            result[rows] = table[rows]
+            torn[rows] = (seq_before != table["seq"][rows]) | ((seq_before & 1) == 1)
+        # Rows being rewritten constantly - report them as not read (yet):
+        result["status"][torn] = STATUS_NONE
+        result["values"][torn] = np.nan
+        return result
+
+    def latest(self, s_alias):
+        """ (timestamp, status, values) of the latest reading of a sensor - by alias. """
+        row = self.snapshot()[self.sensor_ids[s_alias]]
+        return float(row["timestamp"]), int(row["status"]), row["values"]
+
+
+# *********** TEST ******************
+if __name__ == "__main__":
+    import contextlib
+    import io
+    import json
+    import sensors_builder_validatedjson as builder_variant
+    from sensor_drivers import mocked_sensor_driver
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        sensors = builder_variant.Sensors()
+        for bus_no in range(4):
+            for i2c_addr in range(10, 13):
+                sensors.add_sensor(json.dumps({"sensor_type": "i2c", "bus_no": bus_no, "i2c_addr": i2c_addr,
+                                               "dev_name": "BM280", "alias": "RHT-%d-%d" % (bus_no, i2c_addr)}))
+        sensors.add_sensor(json.dumps({"sensor_type": "spi", "bus_no": 1, "cs_no": 3, "dev_name": "SHT721",
+                                       "alias": "RHT-sensor2A"}))
+        sensors.add_sensor(json.dumps({"sensor_type": "uart", "bus_no": 4, "baud_rate": 115200,
+                                       "dev_name": "CustomHygrometerSubmodule", "alias": "RHT-sensor3"}))
+    # Use the mocked drivers:
+    mocked_reads = {"i2c": mocked_sensor_driver.get_i2c_val, "spi": mocked_sensor_driver.get_spi_val,
+                    "uart": mocked_sensor_driver.get_uart_val}
+    for sensor in sensors.sensors:
+        sensor.base.read = mocked_reads[sensor.base.type_name]
+    #
+    with ProcessAcquisition(sensors, period=0.01, quiet=True) as acquisition:
+        print("Started %d bus workers (pids: %s)" % (len(acquisition.workers), [w.pid for w in acquisition.workers]))
+        time.sleep(0.5)
+        snapshot = acquisition.snapshot()
+        print("Rows read OK: %d of %d, row updates: %d" % ((snapshot["status"] == STATUS_OK).sum(), len(snapshot),
+                                                           (snapshot["seq"] // 2).sum()))
+        for s_alias in ("RHT-0-10", "RHT-sensor2A", "RHT-sensor3"):
+            print("Latest of '%s': %s" % (s_alias, acquisition.latest(s_alias)))
@@ -20,6 +20,9 @@ or 4 base-classes that are more specialized.
 
 import time
 
+from sensor_bus import bus_value
+from sensor_constructors import construct_sensor
+
 
 # TODO: add clk-speed(s) etc!
 MAX_BAUD_RATE = 921400
@@ -125,11 +128,6 @@ class I2cSensor(object):
         if base_type is None:
             print("ERROR: 'base_type' NOT defined!")
         self.base = base_type(type_name="i2c", config=configure_i2c_sensor, read=get_i2c_val)
-        # Configure/Initialize sensor if needed:
-        if self.base.config is None:
-            print("No configuration/initialization of sensor specified initially - skipping.")
-        else:
-            self.base.config(self.base.bus_no, self.i2c_addr)
 
     def get_info(self):
         # TODO: how to print extended properties info!??!
@@ -147,11 +145,6 @@ class SpiSensor(object):
         if base_type is None:
             print("ERROR: 'base_type' NOT defined!")
         self.base = base_type(type_name="spi", config=configure_spi_sensor, read=get_spi_val)
-        # Configure/Initialize sensor if needed:
-        if self.base.config is None:
-            print("No configuration/initialization of sensor specified - skipping.")
-        else:
-            self.base.config(self.base.bus_no, self.cs_no)
 
     def get_info(self):
         # TODO: how to print extended properties info!??!
@@ -170,11 +163,6 @@ class UartSensor(object):
         if base_type is None:
             print("ERROR: 'base_type' NOT defined!")
         self.base = base_type(type_name="uart", read=get_uart_val)
-        # Configure/Initialize sensor if needed:
-        if self.base.config is None:
-            print("No configuration/initialization of sensor specified - skipping.")
-        else:
-            self.base.config(self.base.bus_no, self.cs_no)
 
     def get_info(self):
         # TODO: how to print extended properties info!??!
@@ -218,38 +206,63 @@ i2c_prop_list = ['bus_no', 'i2c_addr', 'dev_name', 'alias']
 # TODO: same here ...
 sensor_type_map = {"i2c": I2cSensor, "spi": SpiSensor, "uart": UartSensor}
 prop_list_map = {"i2c": i2c_prop_list, "spi": spi_prop_list, "uart": uart_prop_list}
+sensor_class_type_names = {sensor_class: type_name for type_name, sensor_class in sensor_type_map.items()}
 
 class Sensors:
     """
     Class which is a PLACEHOLDER for multiple sensors of different type.
+    Devices are configured on their first read, or by 'configure_all()' - not when the sensor is built.
     """
-    def __init__(self, sensors=[]):
-        self.sensors = sensors
+    def __init__(self, sensors=None):
+        self.sensors = []
+        # Index of occupied bus-resources: (bus-type, bus_no, address/CS/port) --> sensor
+        self.bus_resources = {}
+        # Deferred device configuration - sensors not configured yet (ordered set):
+        self.unconfigured = {}
+        if sensors is not None:
+            for sensor in sensors:
+                self._index_sensor(sensor)
+
+    @staticmethod
+    def bus_resource_key(sensor):
+        """ Key of the bus-resource occupied by sensor - i.e. (bus-type, bus_no, address/CS/port). """
+        type_name = sensor.base.type_name
+        if type_name == "i2c":
+            return type_name, sensor.base.bus_no, sensor.i2c_addr
+        if type_name == "spi":
+            return type_name, sensor.base.bus_no, sensor.cs_no
+        # UART: the serial port itself is the resource - one sensor per port.
+        return type_name, sensor.base.bus_no, None
+
+    def _index_sensor(self, sensor):
+        self.sensors.append(sensor)
+        self.bus_resources[self.bus_resource_key(sensor)] = sensor
+        if getattr(sensor.base, "config", None) is not None:
+            self.unconfigured[sensor] = None
+
+    def _unindex_sensor(self, sensor):
+        self.sensors.remove(sensor)
+        del self.bus_resources[self.bus_resource_key(sensor)]
+        self.unconfigured.pop(sensor, None)
 
     def i2c_validate(self, sensor):
-        i2c_sensors = self.get_i2c_sensors()
-        for i2c_sensor in i2c_sensors:
-            if sensor.i2c_addr == i2c_sensor.i2c_addr:
-                print("ERROR validating I2C-sensor: address=%d already in use on bus#=%d!" %
-                      (sensor.i2c_addr, sensor.base.bus_no))
-                return False
+        if self.bus_resource_key(sensor) in self.bus_resources:
+            print("ERROR validating I2C-sensor: address=%d already in use on bus#=%d!" %
+                  (sensor.i2c_addr, sensor.base.bus_no))
+            return False
         return True
 
     def spi_validate(self, sensor):
-        spi_sensors = self.get_spi_sensors()
-        for spi_sensor in spi_sensors:
-            if sensor.base.bus_no == spi_sensor.base.bus_no and sensor.cs_no == spi_sensor.cs_no:
-                print("ERROR: validating SPI-sensor: CS=%d already in use on bus#=%d!" %
-                      (sensor.cs_no, sensor.base.bus_no))
-                return False
+        if self.bus_resource_key(sensor) in self.bus_resources:
+            print("ERROR: validating SPI-sensor: CS=%d already in use on bus#=%d!" %
+                  (sensor.cs_no, sensor.base.bus_no))
+            return False
         return True
 
     def uart_validate(self, sensor):
-        uart_sensors = self.get_uart_sensors()
-        for uart_sensor in uart_sensors:
-            if sensor.base.bus_no == uart_sensor.base.bus_no:
-                print("ERROR: validating UART-sensor: serialport=%d already in use!" % sensor.base.bus_no)
-                return False
+        if self.bus_resource_key(sensor) in self.bus_resources:
+            print("ERROR: validating UART-sensor: serialport=%d already in use!" % sensor.base.bus_no)
+            return False
         return True
 
     @staticmethod
@@ -260,23 +273,10 @@ class Sensors:
                   "'base_clsname' and 'ppack' parameters to be provided!")
             return None
         #
-        raw_obj = sensor_clsname(base_type=base_clsname)
-        sensor_builder = SensorBuilder(sensor_instance=raw_obj)
-        #
         # Set up list of props:
-        prop_list = prop_list_map[raw_obj.type_name]
-        # Build sensor:
-        tmp = None
-        for idx, sensor_prop_name in enumerate(prop_list):
-            field_val = ppack[idx]
-            if idx == 0:
-                tmp = sensor_builder.with_field(sensor_prop_name, field_val)
-            else:
-                tmp = tmp.with_field(sensor_prop_name, field_val)
-        # Get final object:
-        sensor = tmp.build()
-        #
-        return sensor
+        prop_list = prop_list_map[sensor_class_type_names[sensor_clsname]]
+        # Build sensor - in one call, using the (cached) constructor for this shape of sensor:
+        return construct_sensor(sensor_clsname, base_clsname, tuple(prop_list), tuple(ppack[:len(prop_list)]))
 
     def add_sensor(self, ppack):
         validators = {"i2c": self.i2c_validate, "spi": self.spi_validate, "uart": self.uart_validate}
@@ -290,13 +290,21 @@ class Sensors:
             # Validating sensor instance BEFORE appending to list:
             validator = validators[sensor.base.type_name]
             if validator(sensor):
-                self.sensors.append(sensor)
+                self._index_sensor(sensor)
             else:
                 raise Exception("Parameter ERROR: cannot add sensor to sensor-list!")
         except Exception as exc:
             print("ERROR creating sensor!!")
             print(exc.args)
 
+    def remove_sensor(self, sensor):
+        """ Remove a registered sensor - releasing the bus-resource it occupies. """
+        if self.bus_resources.get(self.bus_resource_key(sensor)) is not sensor:
+            print("ERROR: cannot remove sensor - not registered!")
+            return False
+        self._unindex_sensor(sensor)
+        return True
+
     def list_sensors(self):
         if len(self.sensors) == 0:
             print("No sensors registered!")
@@ -308,11 +316,44 @@ class Sensors:
             # TODO: check if 'sensor' has attribute(=method) 'get_info()' before attempting invocation!
             sensor.get_info()
 
+    def configure_sensor(self, sensor, force=False):
+        """
+        Configure the device of 'sensor' - unless done already, or with force=True (e.g. after a bus reset).
+        Errors of the config function are passed on.
+        """
+        if sensor in self.unconfigured or force:
+            self.unconfigured[sensor] = None
+            sensor.base.config(sensor.base.bus_no, bus_value(sensor))
+            self.unconfigured.pop(sensor, None)
+
+    def configure_all(self, force=False):
+        """
+        Configure all sensors not configured yet now, instead of on first read - with force=True, (re)configure
+        all registered sensors. Returns a list of (alias, error-message) tuples, which is empty on success
+        - failed ones retry on first read.
+        """
+        errors = []
+        for sensor in list(self.sensors if force else self.unconfigured):
+            if getattr(sensor.base, "config", None) is None:
+                continue
+            try:
+                self.configure_sensor(sensor, force)
+            except Exception as exc:
+                print("ERROR configuring sensor '%s': %s" % (sensor.base.alias, exc))
+                errors.append((sensor.base.alias, str(exc)))
+        return errors
+
+    def read_value(self, sensor):
+        """ Raw value of 'sensor' - configures the sensor on its first read. """
+        if sensor in self.unconfigured:
+            self.configure_sensor(sensor)
+        return sensor.base.read()
+
     def read_sensors(self):
         print("Registered sensors:")
         print("===================")
         for idx, sensor in enumerate(self.sensors):
-            val = sensor.base.read()
+            val = self.read_value(sensor)
             if type(val) is not float:
                 # Check if list or complex value:
                 if type(val) is list:
@@ -337,7 +378,7 @@ class Sensors:
     def get_sensor_data(self):
         """ Generator version of 'read_sensors()' which may be more usable. """
         for sensor in self.sensors:
-            sensor_val = sensor.base.read()
+            sensor_val = self.read_value(sensor)
             sensor_name = sensor.base.alias
             yield (sensor_name, sensor_val)  # use 'sdata_gen = sensors.get_sensor_data()' to obtain generator.
 
@@ -20,8 +20,12 @@ or 4 base-classes that are more specialized.
 @note NO schema-validation of JSON input!
 """
 
+import itertools
 import json
 
+from sensor_bus import bus_value
+from sensor_constructors import construct_sensor
+
 
 # TODO: add clk-speed(s) etc!
 MAX_BAUD_RATE = 921400
@@ -38,6 +42,92 @@ else:
     from sensor_drivers.sensor_driver import *
 
 
+# ******************* JSON-streaming ************************
+
+def iter_json_specs(fileobj, block_size=65536, max_item_size=1048576):
+    """
+    Generator of sensor specs (dicts) read incrementally from a (text-mode) file object,
+    containing either NDJSON (one JSON object per line) or a top-level JSON array.
+    Only one block (plus the spec being decoded) is held in memory at any time.
+    Malformed NDJSON lines are yielded as None (and reported) - a malformed array raises ValueError
+    (as soon as the bad item is detected - or has grown beyond 'max_item_size' characters).
+    """
+    decoder = json.JSONDecoder()
+    pending = fileobj.read(block_size)
+    pos = 0
+    # Skip leading whitespace to detect the format:
+    while True:
+        while pos < len(pending) and pending[pos].isspace():
+            pos += 1
+        if pos < len(pending):
+            break
+        pending = fileobj.read(block_size)
+        pos = 0
+        if not pending:
+            return
+    #
+    if pending[pos] == "[":
+        pos += 1
+        expect_item = True
+        first_item = True
+        item_no = 0
+        while True:
+            while pos < len(pending) and (pending[pos].isspace() or (pending[pos] == "," and not expect_item)):
+                if pending[pos] == ",":
+                    expect_item = True
+                pos += 1
+            if pos < len(pending) and pending[pos] == "]":
+                if expect_item and not first_item:
+                    raise ValueError("Trailing ',' in JSON array!")
+                return
+            try:
+                if pos == len(pending):
+                    raise ValueError("need more data")
+                sensor_spec, end = decoder.raw_decode(pending, pos)
+            except ValueError as exc:
+                # Error before the end of the buffered data - i.e. NOT just an incomplete item at end of block
+                # (an unterminated string is reported at its start, so may still be incomplete):
+                error_pos = getattr(exc, "pos", len(pending))
+                if error_pos < len(pending) and not exc.msg.startswith("Unterminated string"):
+                    raise ValueError("Malformed JSON array item no.%d: %s" % (item_no, exc))
+                if len(pending) - pos > max_item_size:
+                    raise ValueError("JSON array item no.%d exceeds %d characters!" % (item_no, max_item_size))
+                # Incomplete item at end of block - read more:
+                block = fileobj.read(block_size)
+                if not block:
+                    raise ValueError("Malformed or truncated JSON array item no.%d!" % item_no)
+                pending = pending[pos:] + block
+                pos = 0
+                continue
+            if not expect_item:
+                raise ValueError("Missing ',' between JSON array items!")
+            yield sensor_spec
+            pos = end
+            expect_item = False
+            first_item = False
+            item_no += 1
+    else:
+        while True:
+            newline = pending.find("\n", pos)
+            if newline < 0:
+                block = fileobj.read(block_size)
+                if block:
+                    pending = pending[pos:] + block
+                    pos = 0
+                    continue
+                newline = len(pending)
+            line = pending[pos:newline].strip()
+            pos = newline + 1
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError as exc:
+                    print("ERROR: malformed NDJSON line - %s" % exc)
+                    yield None
+            if pos > len(pending):
+                return
+
+
 class ExternalSensorBase:
     """
     Base sensor class no.1 (external sensors, connected to a bus)
@@ -127,11 +217,6 @@ class I2cSensor(object):
         if base_type is None:
             print("ERROR: 'base_type' NOT defined!")
         self.base = base_type(type_name="i2c", config=configure_i2c_sensor, read=get_i2c_val)
-        # Configure/Initialize sensor if needed:
-        if self.base.config is None:
-            print("No configuration/initialization of sensor specified initially - skipping.")
-        else:
-            self.base.config(self.base.bus_no, self.i2c_addr)
 
     def get_info(self):
         # TODO: how to print extended properties info!??!
@@ -149,11 +234,6 @@ class SpiSensor(object):
         if base_type is None:
             print("ERROR: 'base_type' NOT defined!")
         self.base = base_type(type_name="spi", config=configure_spi_sensor, read=get_spi_val)
-        # Configure/Initialize sensor if needed:
-        if self.base.config is None:
-            print("No configuration/initialization of sensor specified - skipping.")
-        else:
-            self.base.config(self.base.bus_no, self.cs_no)
 
     def get_info(self):
         # TODO: how to print extended properties info!??!
@@ -172,11 +252,6 @@ class UartSensor(object):
         if base_type is None:
             print("ERROR: 'base_type' NOT defined!")
         self.base = base_type(type_name="uart", read=get_uart_val)
-        # Configure/Initialize sensor if needed:
-        if self.base.config is None:
-            print("No configuration/initialization of sensor specified - skipping.")
-        else:
-            self.base.config(self.base.bus_no, self.cs_no)
 
     def get_info(self):
         # TODO: how to print extended properties info!??!
@@ -220,34 +295,58 @@ sensor_type_map = {"i2c": I2cSensor, "spi": SpiSensor, "uart": UartSensor}
 class Sensors:
     """
     Class which is a PLACEHOLDER for multiple sensors of different type.
+    Devices are configured on their first read, or by 'configure_all()' - not when the sensor is built.
     """
-    def __init__(self, sensors=[]):
-        self.sensors = sensors
+    def __init__(self, sensors=None):
+        self.sensors = []
+        # Index of occupied bus-resources: (bus-type, bus_no, address/CS/port) --> sensor
+        self.bus_resources = {}
+        # Deferred device configuration - sensors not configured yet (ordered set):
+        self.unconfigured = {}
+        if sensors is not None:
+            for sensor in sensors:
+                self._index_sensor(sensor)
+
+    @staticmethod
+    def bus_resource_key(sensor):
+        """ Key of the bus-resource occupied by sensor - i.e. (bus-type, bus_no, address/CS/port). """
+        type_name = sensor.base.type_name
+        if type_name == "i2c":
+            return type_name, sensor.base.bus_no, sensor.i2c_addr
+        if type_name == "spi":
+            return type_name, sensor.base.bus_no, sensor.cs_no
+        # UART: the serial port itself is the resource - one sensor per port.
+        return type_name, sensor.base.bus_no, None
+
+    def _index_sensor(self, sensor):
+        self.sensors.append(sensor)
+        self.bus_resources[self.bus_resource_key(sensor)] = sensor
+        if getattr(sensor.base, "config", None) is not None:
+            self.unconfigured[sensor] = None
+
+    def _unindex_sensor(self, sensor):
+        self.sensors.remove(sensor)
+        del self.bus_resources[self.bus_resource_key(sensor)]
+        self.unconfigured.pop(sensor, None)
 
     def i2c_validate(self, sensor):
-        i2c_sensors = self.get_i2c_sensors()
-        for i2c_sensor in i2c_sensors:
-            if sensor.i2c_addr == i2c_sensor.i2c_addr:
-                print("ERROR validating I2C-sensor: address=%d already in use on bus#=%d!" %
-                      (sensor.i2c_addr, sensor.base.bus_no))
-                return False
+        if self.bus_resource_key(sensor) in self.bus_resources:
+            print("ERROR validating I2C-sensor: address=%d already in use on bus#=%d!" %
+                  (sensor.i2c_addr, sensor.base.bus_no))
+            return False
         return True
 
     def spi_validate(self, sensor):
-        spi_sensors = self.get_spi_sensors()
-        for spi_sensor in spi_sensors:
-            if sensor.base.bus_no == spi_sensor.base.bus_no and sensor.cs_no == spi_sensor.cs_no:
-                print("ERROR: validating SPI-sensor: CS=%d already in use on bus#=%d!" %
-                      (sensor.cs_no, sensor.base.bus_no))
-                return False
+        if self.bus_resource_key(sensor) in self.bus_resources:
+            print("ERROR: validating SPI-sensor: CS=%d already in use on bus#=%d!" %
+                  (sensor.cs_no, sensor.base.bus_no))
+            return False
         return True
 
     def uart_validate(self, sensor):
-        uart_sensors = self.get_uart_sensors()
-        for uart_sensor in uart_sensors:
-            if sensor.base.bus_no == uart_sensor.base.bus_no:
-                print("ERROR: validating UART-sensor: serialport=%d already in use!" % sensor.base.bus_no)
-                return False
+        if self.bus_resource_key(sensor) in self.bus_resources:
+            print("ERROR: validating UART-sensor: serialport=%d already in use!" % sensor.base.bus_no)
+            return False
         return True
 
     @staticmethod
@@ -258,46 +357,69 @@ class Sensors:
                   "'base_clsname' and 'ppack' parameters to be provided!")
             return None
         #
-        raw_obj = sensor_clsname(base_type=base_clsname)
-        sensor_builder = SensorBuilder(sensor_instance=raw_obj)
-        #
-        # Set up list of props:
-        # Build sensor:
-        first_pass = True
-        for sensor_prop_name, prop_value in props.items():
-            if sensor_prop_name != "sensor_type":
-                if first_pass:
-                    tmp = sensor_builder.with_field(sensor_prop_name, prop_value)
-                    first_pass = False
-                else:
-                    tmp = tmp.with_field(sensor_prop_name, prop_value)
-        # Get final object:
-        sensor = tmp.build()
-        #
-        return sensor
+        # Build sensor - in one call, using the (cached) constructor for this shape of sensor:
+        return construct_sensor(sensor_clsname, base_clsname, tuple(props), tuple(props.values()))
 
     def add_sensor(self, json_spec):
-        validators = {"i2c": self.i2c_validate, "spi": self.spi_validate, "uart": self.uart_validate}
-        #
         # Turn JSON-input into dictionary:
         sensor_spec = json.loads(json_spec)
-        #
-        sensor_type = sensor_spec["sensor_type"]
-        sensor_class_type = sensor_type_map[sensor_type]
+        self.add_sensor_spec(sensor_spec)
+
+    def add_sensor_spec(self, sensor_spec):
+        """ Add sensor from an (already decoded) spec - returns True if added. """
+        validators = {"i2c": self.i2c_validate, "spi": self.spi_validate, "uart": self.uart_validate}
         # Create sensor ...
         try:
+            sensor_type = sensor_spec["sensor_type"]
+            sensor_class_type = sensor_type_map[sensor_type]
             sensor = self.build_sensor(sensor_clsname=sensor_class_type,
                                        base_clsname=ExternalSensorBase,
                                        props=sensor_spec)
             # Validating sensor instance BEFORE appending to list:
             validator = validators[sensor.base.type_name]
             if validator(sensor):
-                self.sensors.append(sensor)
+                self._index_sensor(sensor)
             else:
                 raise Exception("Parameter ERROR: cannot add sensor to sensor-list!")
         except Exception as exc:
             print("ERROR creating sensor!!")
             print(exc.args)
+            return False
+        return True
+
+    def load_stream(self, fileobj, chunk_size=1000, progress=None):
+        """
+        Add sensors from a (text-mode) file object containing NDJSON or a JSON array,
+        which is read incrementally and processed in chunks of (at most) 'chunk_size' specs
+        - so memory use does not grow with the size of the input.
+        After each chunk, 'progress(num_added, num_failed)' is called (default: print progress).
+        Returns tuple (num_added, num_failed).
+        """
+        num_added = 0
+        num_failed = 0
+        sensor_specs = iter_json_specs(fileobj)
+        while True:
+            chunk = list(itertools.islice(sensor_specs, chunk_size))
+            if not chunk:
+                break
+            for sensor_spec in chunk:
+                if sensor_spec is not None and self.add_sensor_spec(sensor_spec):
+                    num_added += 1
+                else:
+                    num_failed += 1
+            if progress is None:
+                print("Loading sensors: %d added, %d failed ..." % (num_added, num_failed))
+            else:
+                progress(num_added, num_failed)
+        return num_added, num_failed
+
+    def remove_sensor(self, sensor):
+        """ Remove a registered sensor - releasing the bus-resource it occupies. """
+        if self.bus_resources.get(self.bus_resource_key(sensor)) is not sensor:
+            print("ERROR: cannot remove sensor - not registered!")
+            return False
+        self._unindex_sensor(sensor)
+        return True
 
     def list_sensors(self):
         if len(self.sensors) == 0:
@@ -310,11 +432,44 @@ class Sensors:
             # TODO: check if 'sensor' has attribute(=method) 'get_info()' before attempting invocation!
             sensor.get_info()
 
+    def configure_sensor(self, sensor, force=False):
+        """
+        Configure the device of 'sensor' - unless done already, or with force=True (e.g. after a bus reset).
+        Errors of the config function are passed on.
+        """
+        if sensor in self.unconfigured or force:
+            self.unconfigured[sensor] = None
+            sensor.base.config(sensor.base.bus_no, bus_value(sensor))
+            self.unconfigured.pop(sensor, None)
+
+    def configure_all(self, force=False):
+        """
+        Configure all sensors not configured yet now, instead of on first read - with force=True, (re)configure
+        all registered sensors. Returns a list of (alias, error-message) tuples, which is empty on success
+        - failed ones retry on first read.
+        """
+        errors = []
+        for sensor in list(self.sensors if force else self.unconfigured):
+            if getattr(sensor.base, "config", None) is None:
+                continue
+            try:
+                self.configure_sensor(sensor, force)
+            except Exception as exc:
+                print("ERROR configuring sensor '%s': %s" % (sensor.base.alias, exc))
+                errors.append((sensor.base.alias, str(exc)))
+        return errors
+
+    def read_value(self, sensor):
+        """ Raw value of 'sensor' - configures the sensor on its first read. """
+        if sensor in self.unconfigured:
+            self.configure_sensor(sensor)
+        return sensor.base.read()
+
     def read_sensors(self):
         print("Registered sensors:")
         print("===================")
         for idx, sensor in enumerate(self.sensors):
-            val = sensor.base.read()
+            val = self.read_value(sensor)
             if type(val) is not float:
                 # Check if list or complex value:
                 if type(val) is list:
@@ -339,7 +494,7 @@ class Sensors:
     def get_sensor_data(self):
         """ Generator version of 'read_sensors()' which may be more usable. """
         for sensor in self.sensors:
-            sensor_val = sensor.base.read()
+            sensor_val = self.read_value(sensor)
             sensor_name = sensor.base.alias
             yield (sensor_name, sensor_val)  # use 'sdata_gen = sensors.get_sensor_data()' to obtain generator.
 
@@ -417,6 +572,18 @@ if __name__ == "__main__":
     sensors.add_sensor(json.dumps({"sensor_type": "i2c", "bus_no": 2, "i2c_addr": 77, "dev_name": "BM281", "alias": "sensor2C"}))
     #
     sensors.list_sensors()
+    #
+    # Streaming - NDJSON and JSON-array input:
+    import io
+    ndjson_input = io.StringIO("""
+{"sensor_type": "i2c", "bus_no": 5, "i2c_addr": 10, "dev_name": "BM280", "alias": "stream-1"}
+{"sensor_type": "spi", "bus_no": 5, "cs_no": 1, "dev_name": "SHT721", "alias": "stream-2"}
+{"sensor_type": "i2c", "bus_no": 5, "i2c_addr": 10, "dev_name": "BM280", "alias": "stream-3"}
+""")
+    print(sensors.load_stream(ndjson_input, chunk_size=2))
+    array_input = io.StringIO(json.dumps([{"sensor_type": "i2c", "bus_no": 6, "i2c_addr": addr,
+                                           "dev_name": "BM280", "alias": "array-%d" % addr} for addr in range(5)]))
+    print(sensors.load_stream(array_input, chunk_size=2))
 
 
 
@@ -20,9 +20,26 @@ or 4 base-classes that are more specialized.
 @note Schema-validation of JSON input is included to avoid faulty input to propagate errors!
 """
 
+import array
+import asyncio
+import inspect
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
 # from collections import OrderedDict
-from jsonschema import Draft4Validator, exceptions
+from jsonschema import Draft4Validator
+from schema_compiler import compile_schema
+import registry_snapshot
+from sensor_constructors import construct_sensor
+from sensor_scheduler import SamplingScheduler
+from sensor_readings import default_value_shapes, status_names, STATUS_OK, STATUS_ERROR, STATUS_TIMEOUT, STATUS_OPEN, \
+    STATUS_BUSY
+from sensor_guard import CircuitBreaker, DaemonReadPool
+from sensor_cache import ReadCache
+from sensor_bus import BusHandlePool, bus_value
+from sensors_compact import build_compact_sensor
 
 
 # TODO: add clk-speed(s) etc!
@@ -34,6 +51,11 @@ MAX_I2C_ADDR = 127
 
 MOCKED_DRIVER_TEST = False
 
+# Use schemas compiled into Python check-functions (=fast path), with 'jsonschema' only for error-reporting:
+FAST_JSON_VALIDATION = True
+
+NAN = float("nan")
+
 if MOCKED_DRIVER_TEST:
     from sensor_drivers.mocked_sensor_driver import *
 else:
@@ -60,67 +82,113 @@ sensor_i2c_schema = {
     "type": "object",
     "required": ["i2c_addr"],
     "properties": {
-        "i2c_addr": {"type": "integer"},
+        "i2c_addr": {"type": "integer", "minimum": 0, "maximum": MAX_I2C_ADDR},
     },
 }
 sensor_spi_schema = {
     "type": "object",
     "required": ["cs_no"],
     "properties": {
-        "cs_no": {"type": "integer"},
+        "cs_no": {"type": "integer", "minimum": 0, "maximum": MAX_CS_VAL},
     },
 }
 sensor_uart_schema = {
     "type": "object",
     "required": ["baud_rate"],
     "properties": {
-        "baud_rate": {"type": "integer"},
+        "baud_rate": {"type": "integer", "minimum": MIN_BAUD_RATE, "maximum": MAX_BAUD_RATE},
     },
 }
 
 # ******************* JSON-validation ************************
 
 class JsonValidator:
-    def __init__(self, schema=None, formal_check=True, debug=False):
+    def __init__(self, schema=None, formal_check=True, debug=False, fast=False):
         self.schema = schema
         self.formal_check = formal_check
         self.debug = debug
+        self.fast_check = None
         if schema is None:
             print("ERROR: cannot construct class correctly without schema argument given!!")
         else:
             self.validator = Draft4Validator(schema)
+            if fast:
+                try:
+                    self.fast_check = compile_schema(schema)
+                except ValueError as exc:
+                    print("Warning: cannot compile schema (%s) - using 'jsonschema' only." % exc)
+
+    def is_valid(self, json_input):
+        if self.fast_check is not None:
+            return self.fast_check(json_input)
+        return self.validator.is_valid(json_input)
 
     def check(self, json_input=None):
         if json_input is None:
             print("ERROR: no input to check!")
             return False
-        # Check for required:
-        try:
-            self.validator.validate(json_input)
-        except exceptions.ValidationError:
-            for error in self.validator.iter_errors(json_input):
-                first_err_line = str(error).splitlines()[0]
-                prop_name = first_err_line.split()[0]
-                if first_err_line.endswith('required property'):
-                    print("JSON-validation ERROR: missing required property %s" % prop_name)
-                elif first_err_line.find('not of type') >= 0:
-                    print("JSON-validation ERROR: property %s has wrong type." % prop_name)
-                else:
-                    print("JSON-validation ERROR: %s" % first_err_line)
+        # Single validation pass - errors are only walked (again) in case of failure:
+        if not self.is_valid(json_input):
+            for err_msg in self.errors(json_input):
+                print("JSON-validation ERROR: %s" % err_msg)
             return False
         #
-        if self.formal_check:
-            if self.validator.is_valid(json_input):
-                if self.debug:
-                    if self.debug:
-                        print("JSON has valid format.")
-            else:
-                print("ERROR: JSON input has invalid format!")
-                return False
+        if self.formal_check and self.debug:
+            print("JSON has valid format.")
         if self.debug:
             print("SUCCESS: JSON is valid! :-)")
         return True
 
+    def errors(self, json_input):
+        """ Returns validation errors as (single-line) messages - i.e. an empty list if input is valid. """
+        err_msgs = []
+        for error in self.validator.iter_errors(json_input):
+            first_err_line = str(error).splitlines()[0]
+            prop_name = first_err_line.split()[0]
+            if first_err_line.endswith('required property'):
+                err_msgs.append("missing required property %s" % prop_name)
+            elif first_err_line.find('not of type') >= 0:
+                err_msgs.append("property %s has wrong type." % prop_name)
+            elif error.validator in ("minimum", "maximum") and error.path:
+                err_msgs.append("property '%s' out of range: %s" % (error.path[-1], first_err_line))
+            else:
+                err_msgs.append(first_err_line)
+        return err_msgs
+
+
+# Device-specific schemas per sensor type:
+json_dev_schemas = {"i2c": sensor_i2c_schema, "spi": sensor_spi_schema, "uart": sensor_uart_schema}
+
+# Compiled validators per sensor type - created on first use, then reused:
+_json_validator_cache = {}
+
+
+def get_json_validator(sensor_type=None):
+    """
+    Returns the (cached) validator for a sensor type, which checks the base- AND device-specific
+    schema in one pass. With sensor_type=None, or an unknown type, the base-schema validator is returned.
+    """
+    if sensor_type not in json_dev_schemas:
+        sensor_type = None
+    validator = _json_validator_cache.get(sensor_type)
+    if validator is None:
+        if sensor_type is None:
+            validator = JsonValidator(sensor_base_schema, fast=FAST_JSON_VALIDATION)
+        else:
+            validator = JsonValidator({"allOf": [sensor_base_schema, json_dev_schemas[sensor_type]]},
+                                      fast=FAST_JSON_VALIDATION)
+        _json_validator_cache[sensor_type] = validator
+    return validator
+
+
+def spec_sensor_type(sensor_spec):
+    """ Sensor type of a (decoded) sensor spec, or None if missing/unknown. """
+    if isinstance(sensor_spec, dict):
+        sensor_type = sensor_spec.get("sensor_type")
+        if isinstance(sensor_type, str) and sensor_type in json_dev_schemas:
+            return sensor_type
+    return None
+
 
 # ***************************** Sensor BASE-classes ********************************
 
@@ -130,10 +198,11 @@ class ExternalSensorBase:
     """
     bus_property1 = {"i2c": "bus-address", "spi": "ChipSelect-number", "uart": "baud_rate"}
 
-    def __init__(self, type_name=None, bus_no=None, dev_name=None, alias=None, config=None, read=None):
+    def __init__(self, type_name=None, bus_no=None, dev_name=None, alias=None, config=None, read=None, read_into=None):
         #
         self.config = config
         self.read = read
+        self.read_into = read_into
         self.type_name = type_name
         self.bus_no = bus_no
         if dev_name:
@@ -166,8 +235,10 @@ class InternalSensorBase:
     """
     Base sensor class no.2 (MCU/SoC-internal sensors)
     """
-    def __init__(self, type_name=None, dev_no=None, dev_addr=None, dev_name=None, use_irq=False, alias=None, read=None):
+    def __init__(self, type_name=None, dev_no=None, dev_addr=None, dev_name=None, use_irq=False, alias=None, read=None,
+                 read_into=None):
         self.read = read
+        self.read_into = read_into
         # TODO: throw error if =None or negative (and possibly above some limit)!
         self.type_name = type_name
         self.dev_no = dev_no
@@ -226,12 +297,9 @@ class I2cSensor(SensorHelper):
         self.i2c_addr = None
         if base_type is None:
             print("ERROR: 'base_type' NOT defined!")
-        self.base = base_type(type_name="i2c", config=configure_i2c_sensor, read=get_i2c_val)
-        # Configure/Initialize sensor if needed:
-        if self.base.config is None:
-            print("No configuration/initialization of sensor specified initially - skipping.")
-        else:
-            self.base.config(self.base.bus_no, self.i2c_addr)
+        self.base = base_type(type_name="i2c", config=configure_i2c_sensor, read=get_i2c_val,
+                              read_into=get_i2c_val_into)
+        # Configuration/initialization of the device is deferred - done on its first read, or by 'Sensors.configure_all()'.
 
 
 class SpiSensor(SensorHelper):
@@ -242,12 +310,9 @@ class SpiSensor(SensorHelper):
         self.cs_no = None
         if base_type is None:
             print("ERROR: 'base_type' NOT defined!")
-        self.base = base_type(type_name="spi", config=configure_spi_sensor, read=get_spi_val)
-        # Configure/Initialize sensor if needed:
-        if self.base.config is None:
-            print("No configuration/initialization of sensor specified - skipping.")
-        else:
-            self.base.config(self.base.bus_no, self.cs_no)
+        self.base = base_type(type_name="spi", config=configure_spi_sensor, read=get_spi_val,
+                              read_into=get_spi_val_into)
+        # Configuration/initialization of the device is deferred - done on its first read, or by 'Sensors.configure_all()'.
 
 
 class UartSensor(SensorHelper):
@@ -259,12 +324,8 @@ class UartSensor(SensorHelper):
         self.baud_rate = None
         if base_type is None:
             print("ERROR: 'base_type' NOT defined!")
-        self.base = base_type(type_name="uart", read=get_uart_val)
-        # Configure/Initialize sensor if needed:
-        if self.base.config is None:
-            print("No configuration/initialization of sensor specified - skipping.")
-        else:
-            self.base.config(self.base.bus_no, self.cs_no)
+        self.base = base_type(type_name="uart", read=get_uart_val, read_into=get_uart_val_into)
+        # Configuration/initialization of the device is deferred - done on its first read, or by 'Sensors.configure_all()'.
 
 
 # **************** SENSOR-BUILDER ********************
@@ -302,34 +363,135 @@ sensor_type_map = {"i2c": I2cSensor, "spi": SpiSensor, "uart": UartSensor}
 class Sensors:
     """
     Class which is a PLACEHOLDER for multiple sensors of different type.
+    With compact=True, sensors are built as compact (slotted) sensor objects - see 'sensors_compact'.
     """
-    def __init__(self, sensors=[]):
-        self.sensors = sensors
+    def __init__(self, sensors=None, compact=False):
+        self.sensors = []
+        self.compact = compact
+        # Index of occupied bus-resources: (bus-type, bus_no, address/CS/port) --> sensor
+        self.bus_resources = {}
+        # Declared shape of the readings of each sensor (see 'sensor_readings'): sensor --> ValueShape
+        self.value_shapes = {}
+        # Stable sensor ids (never reused within this registry): sensor --> id
+        self.sensor_ids = {}
+        self.next_sensor_id = 0
+        # Index of (unique) sensor aliases: alias --> sensor
+        self.aliases = {}
+        # Partitions (insertion-ordered dicts used as ordered sets) per type, per (type, bus_no) and per dev_name:
+        self.type_partitions = {type_name: {} for type_name in sensor_type_map}
+        self.bus_partitions = {}
+        self.dev_name_partitions = {}
+        # Concurrent reading - one lock per physical bus (type, bus_no), and worker-pool (created on first use):
+        self.bus_locks = {}
+        self.read_pool = None
+        self.read_pool_size = 0
+        # Reading history (see 'enable_history()'):
+        self.history = None
+        # Read-through value cache (see 'enable_read_cache()'):
+        self.read_cache = None
+        # Buffer layout of 'read_all_into()' - (re)built on first use after sensors are added/removed:
+        self._read_layout = None
+        self._read_into_funcs = None
+        self.read_buffer_size = 0
+        # Guarded reading (see 'read_cycle_guarded()') - read deadline [sec] and circuit breaker per sensor:
+        self.default_read_deadline = 1.0
+        self.read_deadlines = {}
+        self.breaker_settings = {"failure_threshold": 3, "base_backoff": 1.0, "max_backoff": 60.0}
+        self.breakers = {}
+        self.reads_in_flight = {}
+        # Sensor being read (i.e. holding the bus lock) per bus - in guarded reading:
+        self.bus_readers = {}
+        self.guarded_pool = None
+        # Persistent bus handles, shared by the sensors of each bus (see 'enable_bus_pool()'):
+        self.bus_pool = None
+        # Deferred device configuration - sensors not configured yet (ordered set), one lock per bus:
+        self.unconfigured = {}
+        self.config_locks = {}
+        if sensors is not None:
+            for idx, err_msg in self.add_built_sensors(sensors):
+                print("ERROR: cannot add sensor no.%d: %s" % (idx, err_msg))
+
+    @staticmethod
+    def bus_resource_key(sensor):
+        """ Key of the bus-resource occupied by sensor - i.e. (bus-type, bus_no, address/CS/port). """
+        type_name = sensor.base.type_name
+        if type_name == "i2c":
+            return type_name, sensor.base.bus_no, sensor.i2c_addr
+        if type_name == "spi":
+            return type_name, sensor.base.bus_no, sensor.cs_no
+        # UART: the serial port itself is the resource - one sensor per port.
+        return type_name, sensor.base.bus_no, None
+
+    def _index_sensor(self, sensor, value_shape=None):
+        self.sensors.append(sensor)
+        self.bus_resources[self.bus_resource_key(sensor)] = sensor
+        self.value_shapes[sensor] = value_shape or default_value_shapes[sensor.base.type_name]
+        self.sensor_ids[sensor] = self.next_sensor_id
+        self.next_sensor_id += 1
+        self._read_layout = None
+        if self.history is not None:
+            self.history.add(self.sensor_ids[sensor], self.value_shapes[sensor].width)
+        if sensor.base.alias != "none":
+            self.aliases[sensor.base.alias] = sensor
+        base = sensor.base
+        self.type_partitions.setdefault(base.type_name, {})[sensor] = None
+        self.bus_partitions.setdefault((base.type_name, base.bus_no), {})[sensor] = None
+        self.dev_name_partitions.setdefault(base.dev_name, {})[sensor] = None
+        if getattr(base, "config", None) is not None:
+            self.unconfigured[sensor] = None
+            if (base.type_name, base.bus_no) not in self.config_locks:
+                self.config_locks[(base.type_name, base.bus_no)] = threading.Lock()
+        if self.bus_pool is not None:
+            self.bus_pool.attach_sensor(sensor, bus_reads)
+
+    def _unindex_sensor(self, sensor):
+        self.sensors.remove(sensor)
+        del self.bus_resources[self.bus_resource_key(sensor)]
+        del self.value_shapes[sensor]
+        del self.sensor_ids[sensor]
+        self._read_layout = None
+        self.read_deadlines.pop(sensor, None)
+        self.breakers.pop(sensor, None)
+        self.unconfigured.pop(sensor, None)
+        if self.bus_pool is not None:
+            self.bus_pool.detach_sensor(sensor)
+        if self.aliases.get(sensor.base.alias) is sensor:
+            del self.aliases[sensor.base.alias]
+        base = sensor.base
+        del self.type_partitions[base.type_name][sensor]
+        bus_key = (base.type_name, base.bus_no)
+        del self.bus_partitions[bus_key][sensor]
+        if not self.bus_partitions[bus_key]:
+            del self.bus_partitions[bus_key]
+        del self.dev_name_partitions[base.dev_name][sensor]
+        if not self.dev_name_partitions[base.dev_name]:
+            del self.dev_name_partitions[base.dev_name]
 
     def i2c_validate(self, sensor):
-        i2c_sensors = self.get_i2c_sensors()
-        for i2c_sensor in i2c_sensors:
-            if sensor.i2c_addr == i2c_sensor.i2c_addr:
-                print("ERROR validating I2C-sensor: address=%d already in use on bus#=%d!" %
-                      (sensor.i2c_addr, sensor.base.bus_no))
-                return False
+        if self.bus_resource_key(sensor) in self.bus_resources:
+            print("ERROR validating I2C-sensor: address=%d already in use on bus#=%d!" %
+                  (sensor.i2c_addr, sensor.base.bus_no))
+            return False
         return True
 
     def spi_validate(self, sensor):
-        spi_sensors = self.get_spi_sensors()
-        for spi_sensor in spi_sensors:
-            if sensor.base.bus_no == spi_sensor.base.bus_no and sensor.cs_no == spi_sensor.cs_no:
-                print("ERROR: validating SPI-sensor: CS=%d already in use on bus#=%d!" %
-                      (sensor.cs_no, sensor.base.bus_no))
-                return False
+        if self.bus_resource_key(sensor) in self.bus_resources:
+            print("ERROR: validating SPI-sensor: CS=%d already in use on bus#=%d!" %
+                  (sensor.cs_no, sensor.base.bus_no))
+            return False
         return True
 
     def uart_validate(self, sensor):
-        uart_sensors = self.get_uart_sensors()
-        for uart_sensor in uart_sensors:
-            if sensor.base.bus_no == uart_sensor.base.bus_no:
-                print("ERROR: validating UART-sensor: serialport=%d already in use!" % sensor.base.bus_no)
-                return False
+        if self.bus_resource_key(sensor) in self.bus_resources:
+            print("ERROR: validating UART-sensor: serialport=%d already in use!" % sensor.base.bus_no)
+            return False
+        return True
+
+    def alias_validate(self, sensor):
+        # Sensors w/o alias are all named "none" - only given aliases must be unique.
+        if sensor.base.alias != "none" and sensor.base.alias in self.aliases:
+            print("ERROR: validating sensor: alias '%s' already in use!" % sensor.base.alias)
+            return False
         return True
 
     @staticmethod
@@ -340,69 +502,176 @@ class Sensors:
                   "'base_clsname' and 'ppack' parameters to be provided!")
             return None
         #
-        raw_obj = sensor_clsname(base_type=base_clsname)
-        sensor_builder = SensorBuilder(sensor_instance=raw_obj)
-        #
-        # Set up list of props:
-        # Build sensor:
-        first_pass = True
-        for sensor_prop_name, prop_value in props.items():
-            if sensor_prop_name != "sensor_type":
-                if first_pass:
-                    tmp = sensor_builder.with_field(sensor_prop_name, prop_value)
-                    first_pass = False
-                else:
-                    tmp = tmp.with_field(sensor_prop_name, prop_value)
-        # Get final object:
-        sensor = tmp.build()
-        #
-        return sensor
-
-    def add_sensor(self, json_spec):
-        # TODO: bring these dicts in from a config module or similar!
-        # Dictionaries for sensor-type-to-<mapped instance> mapping:
-        json_dev_schemas = {"i2c": sensor_i2c_schema, "spi": sensor_spi_schema, "uart": sensor_uart_schema}
+        # Build sensor - in one call, using the (cached) constructor for this shape of sensor:
+        return construct_sensor(sensor_clsname, base_clsname, tuple(props), tuple(props.values()))
+
+    def _build_from_spec(self, sensor_type, sensor_spec):
+        """ Build sensor from a validated (decoded JSON-)spec - compact or builder-variant, as per registry. """
+        if self.compact:
+            return build_compact_sensor(sensor_spec)
+        return self.build_sensor(sensor_clsname=sensor_type_map[sensor_type],
+                                 base_clsname=ExternalSensorBase,
+                                 props=sensor_spec)
+
+    def add_sensor(self, json_spec, value_shape=None):
+        """ Add sensor from JSON-spec - 'value_shape' declares the shape of its readings (default: per sensor type). """
+        # TODO: bring this dict in from a config module or similar!
+        # Dictionary for sensor-type-to-<mapped instance> mapping:
         validators = {"i2c": self.i2c_validate, "spi": self.spi_validate, "uart": self.uart_validate}
         #
-        json_base_validator = JsonValidator(sensor_base_schema)
-        #
         # Turn JSON-input into dictionary:
         sensor_spec = json.loads(json_spec)
-        # Validate JSON:
-        if json_base_validator.check(sensor_spec):
-            # May log something for DEBUG-purposes here ...
-            pass
-        else:
+        # Validate JSON - base- and device-specific schema in one go (using cached validator):
+        sensor_type = spec_sensor_type(sensor_spec)
+        if not get_json_validator(sensor_type).check(sensor_spec):
             print("ERROR: invalid sensor JSON input!")
             return
-        #
-        sensor_type = sensor_spec["sensor_type"]
-        sensor_class_type = sensor_type_map[sensor_type]
-        # Can validate device-specific JSON:
-        json_dev_spec_schema = json_dev_schemas[sensor_type]
-        json_dev_spec_validator = JsonValidator(json_dev_spec_schema)
-        # Validate ...
-        if json_dev_spec_validator.check(sensor_spec):
-            # May log something for DEBUG-purposes here ...
-            pass
-        else:
-            print("ERROR: invalid device-specific JSON input!")
+        if sensor_type is None:
+            print("ERROR: unknown sensor type '%s'!" % sensor_spec["sensor_type"])
             return
+        #
         # Create sensor ...
         try:
-            sensor = self.build_sensor(sensor_clsname=sensor_class_type,
-                                       base_clsname=ExternalSensorBase,
-                                       props=sensor_spec)
+            sensor = self._build_from_spec(sensor_type, sensor_spec)
             # Validating sensor instance BEFORE appending to list:
             validator = validators[sensor.base.type_name]
-            if validator(sensor):
-                self.sensors.append(sensor)
+            if validator(sensor) and self.alias_validate(sensor):
+                self._index_sensor(sensor, value_shape)
             else:
                 raise Exception("Parameter ERROR: cannot add sensor to sensor-list!")
         except Exception as exc:
             print("ERROR creating sensor!!")
             print(exc.args)
 
+    def add_sensors(self, json_specs):
+        """
+        Bulk version of 'add_sensor()' - takes an iterable of JSON-strings (or already decoded dicts).
+        The whole batch is parsed, schema-checked, built and checked for bus-resource and alias conflicts
+        (within the batch as well as against registered sensors) in ONE pass, using hash-lookups.
+        Sensors are added atomically: either ALL of them, or - if any item has errors - NONE.
+        Returns a list of (item-index, error-message) tuples, which is empty on success.
+        """
+        errors = []
+        batch = []
+        batch_resources = {}
+        batch_aliases = {}
+        for idx, json_spec in enumerate(json_specs):
+            try:
+                sensor_spec = json.loads(json_spec) if isinstance(json_spec, (str, bytes)) else json_spec
+            except ValueError as exc:
+                errors.append((idx, "invalid JSON: %s" % exc))
+                continue
+            # Validate JSON (errors are only collected for invalid items):
+            sensor_type = spec_sensor_type(sensor_spec)
+            json_validator = get_json_validator(sensor_type)
+            if not json_validator.is_valid(sensor_spec):
+                errors.extend((idx, err_msg) for err_msg in json_validator.errors(sensor_spec))
+                continue
+            if sensor_type is None:
+                errors.append((idx, "unknown sensor type '%s'" % sensor_spec["sensor_type"]))
+                continue
+            # Create sensor ...
+            try:
+                sensor = self._build_from_spec(sensor_type, sensor_spec)
+            except Exception as exc:
+                errors.append((idx, "cannot create sensor: %s" % (exc.args,)))
+                continue
+            self._check_conflicts(idx, sensor, batch_resources, batch_aliases, errors)
+            batch.append(sensor)
+        # Commit:
+        if not errors:
+            for sensor in batch:
+                self._index_sensor(sensor)
+        return errors
+
+    def _check_conflicts(self, idx, sensor, batch_resources, batch_aliases, errors):
+        """ Check for conflicts - both against registered sensors and earlier items of the batch. """
+        resource_key = self.bus_resource_key(sensor)
+        if resource_key in self.bus_resources:
+            errors.append((idx, "%s bus#=%s resource %s already in use!" % resource_key))
+        elif resource_key in batch_resources:
+            errors.append((idx, "%s bus#=%s resource %s already used by item %d!" %
+                           (resource_key + (batch_resources[resource_key],))))
+        else:
+            batch_resources[resource_key] = idx
+        s_alias = sensor.base.alias
+        if s_alias != "none":
+            if s_alias in self.aliases:
+                errors.append((idx, "alias '%s' already in use!" % s_alias))
+            elif s_alias in batch_aliases:
+                errors.append((idx, "alias '%s' already used by item %d!" % (s_alias, batch_aliases[s_alias])))
+            else:
+                batch_aliases[s_alias] = idx
+
+    def add_built_sensors(self, sensors):
+        """
+        Add already built sensor objects - with the same bus-resource and alias conflict checks as 'add_sensors()',
+        and like it atomically. Returns a list of (item-index, error-message) tuples, which is empty on success.
+        """
+        errors = []
+        batch_resources = {}
+        batch_aliases = {}
+        sensors = list(sensors)
+        for idx, sensor in enumerate(sensors):
+            self._check_conflicts(idx, sensor, batch_resources, batch_aliases, errors)
+        if not errors:
+            for sensor in sensors:
+                self._index_sensor(sensor)
+        return errors
+
+    def remove_sensor(self, sensor):
+        """ Remove a registered sensor - releasing the bus-resource it occupies. """
+        if self.bus_resources.get(self.bus_resource_key(sensor)) is not sensor:
+            print("ERROR: cannot remove sensor - not registered!")
+            return False
+        sensor_id = self.sensor_ids[sensor]
+        self._unindex_sensor(sensor)
+        if self.history is not None:
+            self.history.drop(sensor_id)
+        if self.read_cache is not None:
+            self.read_cache.forget(sensor)
+        return True
+
+    def remove_sensor_by_alias(self, s_alias):
+        """ Remove sensor by alias - returns the removed sensor, or None if no such alias. """
+        sensor = self.aliases.get(s_alias)
+        if sensor is None:
+            print("ERROR: no sensor with alias '%s' to remove!" % s_alias)
+            return None
+        self.remove_sensor(sensor)
+        return sensor
+
+    def save_snapshot(self, path, config_digest):
+        """
+        Save registry as binary snapshot - 'config_digest' is the content-hash of the source config
+        (see 'registry_snapshot.config_digest()'), used to invalidate the snapshot when the config changes.
+        Not supported for compact registries - their config is simply (re)loaded.
+        """
+        if self.compact:
+            print("ERROR: snapshots of compact sensors are not supported!")
+            return
+        registry_snapshot.write_snapshot(path, self.sensors, config_digest, sensor_type_map, ExternalSensorBase,
+                                         self.value_shapes)
+
+    @classmethod
+    def load_snapshot(cls, path, config_digest):
+        """
+        Create registry (incl. all indexes) from binary snapshot - without schema-validation or builder calls.
+        Returns None if there is no valid snapshot for the given config digest - i.e. config must be (re)loaded.
+        """
+        value_shapes = {}
+        sensors = registry_snapshot.read_snapshot(path, config_digest, sensor_type_map, ExternalSensorBase,
+                                                  value_shapes)
+        if sensors is None:
+            return None
+        registry = cls()
+        if registry.add_built_sensors(sensors):
+            # Conflicting sensors - i.e. not a snapshot of a valid registry:
+            return None
+        for sensor, value_shape in value_shapes.items():
+            registry.set_value_shape(sensor, value_shape)
+        return registry
+
     def list_sensors(self):
         if len(self.sensors) == 0:
             print("No sensors registered!")
@@ -414,76 +683,583 @@ class Sensors:
             # TODO: check if 'sensor' has attribute(=method) 'get_info()' before attempting invocation!
             sensor.get_info()
 
-    def read_sensors(self):
+    def configure_sensor(self, sensor, force=False):
+        """
+        Configure the device of 'sensor' - unless done already, or with force=True (e.g. after a bus reset).
+        Errors of the config function are passed on.
+        """
+        base = sensor.base
+        with self.config_locks[(base.type_name, base.bus_no)]:
+            if sensor in self.unconfigured or force:
+                self.unconfigured[sensor] = None
+                base.config(base.bus_no, bus_value(sensor))
+                self.unconfigured.pop(sensor, None)
+
+    def _configure_bus(self, bus_key, bus_sensors, force=False):
+        """ Configure sensors of one bus - one after another, holding its config lock. """
+        errors = []
+        with self.config_locks[bus_key]:
+            for sensor in bus_sensors:
+                if sensor not in self.unconfigured and not force:
+                    continue
+                # Not configured until the config function has succeeded:
+                self.unconfigured[sensor] = None
+                try:
+                    sensor.base.config(sensor.base.bus_no, bus_value(sensor))
+                    self.unconfigured.pop(sensor, None)
+                except Exception as exc:
+                    print("ERROR configuring sensor '%s': %s" % (sensor.base.alias, exc))
+                    errors.append((sensor.base.alias, str(exc)))
+        return errors
+
+    def configure_all(self, parallel=False, max_workers=None, sensors=None, force=False):
+        """
+        Configure all sensors not configured yet (or those of them in 'sensors') now, instead of on first read
+        - batched per bus. Sensors configured already are skipped - unless force=True, which (re)configures all
+        registered sensors (or all of 'sensors'), e.g. after a bus reset.
+        With parallel=True, buses are configured in parallel (at most 'max_workers' threads).
+        Returns a list of (alias, error-message) tuples, which is empty on success - failed ones retry on first read.
+        """
+        if sensors is None:
+            sensors = self.sensors if force else self.unconfigured
+        batches = {}
+        for sensor in list(sensors):
+            if sensor in self.unconfigured or (force and sensor in self.sensor_ids and
+                                               getattr(sensor.base, "config", None) is not None):
+                batches.setdefault((sensor.base.type_name, sensor.base.bus_no), []).append(sensor)
+        if parallel and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers or len(batches),
+                                    thread_name_prefix="sensor-config") as config_pool:
+                bus_errors = list(config_pool.map(self._configure_bus, batches, batches.values(),
+                                                  [force] * len(batches)))
+        else:
+            bus_errors = [self._configure_bus(bus_key, bus_sensors, force)
+                          for bus_key, bus_sensors in batches.items()]
+        return [error for errors in bus_errors for error in errors]
+
+    def read_value(self, sensor):
+        """ Raw value of 'sensor' - through the read cache, if enabled. Configures the sensor on its first read. """
+        if sensor in self.unconfigured:
+            self.configure_sensor(sensor)
+        if self.read_cache is not None:
+            return self.read_cache.read(sensor)
+        return sensor.base.read()
+
+    def read_sensors(self, guarded=False):
+        """ Read and show all sensors - with guarded=True, using 'read_cycle_guarded()' (i.e. with deadlines). """
         print("Registered sensors:")
         print("===================")
+        if guarded:
+            guarded_results = self.read_cycle_guarded()
         for idx, sensor in enumerate(self.sensors):
-            val = sensor.base.read()
-            if type(val) is not float:
-                # Check if list or complex value:
-                if type(val) is list:
-                    print("Value list:")
-                    print("------------")
-                    for val_no, item_val in enumerate(val):
-                        print("Value no.%d = %d" % (val_no, item_val))
-                    print("")
-                else:
-                    if isinstance(val, ComplexValue):
-                        print("Complex value:")
-                        print("--------------")
-                        print("Triggered: ", val.triggered)
-                        print("Channel no: ", val.channel)
-                        print("Value: ", val.ch_val)
-                        print("")
-                    else:
-                        print("ERROR: cannot parse sensor readout result!")
+            if guarded:
+                _, sensor_val, _, status = guarded_results[idx]
+                if status != STATUS_OK:
+                    print("Sensor no.%d: %s - no value (%s)" % (idx, sensor.base.alias, status_names[status]))
+                    continue
             else:
-                print("Sensor no.%d: %s (type=%s) value = %s" % (idx, sensor.base.alias, sensor.base.dev_name, val))
+                sensor_val = self.read_value(sensor)
+            # Decoder of the value shape declared at registration - no probing of the value type:
+            value_shape = self.value_shapes[sensor]
+            try:
+                reading = value_shape.decode(sensor_val)
+            except (TypeError, AttributeError):
+                print("ERROR: cannot parse sensor readout result (expected %s)!" % value_shape)
+                continue
+            value_shape.show(idx, sensor, reading)
+
+    def get_sensor_readings(self):
+        """ Like 'get_sensor_data()' - but yields (sensor_name, reading) with the reading as typed record. """
+        for sensor in self.sensors:
+            yield (sensor.base.alias, self.value_shapes[sensor].decode(self.read_value(sensor)))
 
-    def get_sensor_data(self):
-        """ Generator version of 'read_sensors()' which may be more usable. """
+    def set_value_shape(self, sensor, value_shape):
+        """ Declare shape of the readings of a registered sensor - see 'sensor_readings.ValueShape'. """
+        self.value_shapes[sensor] = value_shape
+        self._read_layout = None
+        if self.history is not None:
+            self.history.add(self.sensor_ids[sensor], value_shape.width)
+
+    def read_layout(self):
+        """
+        Buffer layout of 'read_all_into()' - list of (sensor, offset, width), in registry order:
+        each sensor's reading takes 'width' floats (see its value shape), starting at 'offset'.
+        """
+        if self._read_layout is None:
+            layout = []
+            read_into_funcs = []
+            offset = 0
+            for sensor in self.sensors:
+                width = self.value_shapes[sensor].width
+                layout.append((sensor, offset, width))
+                read_into_funcs.append((self._read_into_func(sensor), offset, width, sensor.base.alias))
+                offset += width
+            self._read_layout = layout
+            self._read_into_funcs = read_into_funcs
+            self.read_buffer_size = offset
+        return self._read_layout
+
+    def _read_into_func(self, sensor):
+        """ The driver's 'read_into()' - or, for drivers without one, a (allocating) fallback via 'read()'. """
+        read_into = getattr(sensor.base, "read_into", None)
+        if read_into is not None:
+            return read_into
+        read = sensor.base.read
+        decode = self.value_shapes[sensor].decode
+
+        def decode_into(buffer, offset):
+            reading = decode(read())
+            for idx, item_val in enumerate(reading):
+                buffer[offset + idx] = item_val
+            return len(reading)
+        return decode_into
+
+    def make_read_buffer(self):
+        """ Buffer (array of doubles) for 'read_all_into()' - a NumPy-array of 'read_buffer_size' floats works too. """
+        self.read_layout()
+        return array.array("d", bytes(8 * self.read_buffer_size))
+
+    def read_all_into(self, buffer):
+        """
+        Read all sensors into ONE preallocated buffer (see 'read_layout()' and 'make_read_buffer()'),
+        through the drivers' 'read_into(buffer, offset)' - so a read-loop reusing the buffer allocates no
+        reading objects. A failed read leaves NaNs - as do values missing from a reading shorter than its slot
+        (i.e. the driver returned fewer values than the value shape's width). NOTE: the read cache is not used here.
+        Raises ValueError if the buffer is smaller than 'read_buffer_size'.
+        """
+        if self.unconfigured:
+            self.configure_all()
+        if self._read_layout is None:
+            self.read_layout()
+        if len(buffer) < self.read_buffer_size:
+            raise ValueError("Buffer too small for 'read_all_into()': %d values, layout needs %d!" %
+                             (len(buffer), self.read_buffer_size))
+        for read_into, offset, width, s_alias in self._read_into_funcs:
+            try:
+                num_values = read_into(buffer, offset)
+            except Exception as exc:
+                print("ERROR reading sensor '%s': %s" % (s_alias, exc))
+                num_values = 0
+            if num_values != width:
+                # Short reading - NaN-pad the rest of the slot (a longer one is clamped: its excess is overwritten
+                # by the next slot):
+                for idx in range(offset + min(num_values or 0, width), offset + width):
+                    buffer[idx] = NAN
+        return buffer
+
+    def get_sensor_data(self, concurrent=False, guarded=False):
+        """
+        Generator version of 'read_sensors()' which may be more usable.
+        With concurrent=True, all sensors are read in one concurrent cycle (see 'read_cycle()') first.
+        With guarded=True, they are read by 'read_cycle_guarded()' - value is None for sensors not read.
+        """
+        if guarded:
+            for sensor_name, sensor_val, _, _ in self.read_cycle_guarded():
+                yield (sensor_name, sensor_val)
+            return
+        if concurrent:
+            for sensor_name, sensor_val, _ in self.read_cycle():
+                yield (sensor_name, sensor_val)
+            return
         for sensor in self.sensors:
-            sensor_val = sensor.base.read()
+            sensor_val = self.read_value(sensor)
             sensor_name = sensor.base.alias
             yield (sensor_name, sensor_val)  # use 'sdata_gen = sensors.get_sensor_data()' to obtain generator.
 
-    def get_i2c_sensors(self):
-        i2c_sensors = []
+    def _read_bus(self, bus_key, bus_sensors):
+        """ Read all sensors of one physical bus - one after another, holding the bus lock. """
+        results = []
+        with self.bus_locks[bus_key]:
+            for sensor in bus_sensors:
+                try:
+                    sensor_val = self.read_value(sensor)
+                except Exception as exc:
+                    print("ERROR reading sensor '%s': %s" % (sensor.base.alias, exc))
+                    sensor_val = None
+                results.append((sensor, sensor_val, time.time()))
+        return results
+
+    def read_cycle(self, max_workers=None):
+        """
+        Read all sensors in ONE cycle, where each physical bus (type, bus_no) is read by its own worker thread:
+        reads on the same bus are serialized, while independent buses proceed in parallel
+        - so the cycle takes (roughly) as long as the slowest bus, not the sum of all reads.
+        Returns list of (sensor_name, sensor_val, timestamp) - in registry order.
+        """
+        num_workers = max_workers or max(len(self.bus_partitions), 1)
+        if self.read_pool is not None and self.read_pool_size < num_workers:
+            # More buses than workers now - replace (only) the read pool:
+            self.read_pool.shutdown()
+            self.read_pool = None
+        if self.read_pool is None:
+            self.read_pool = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="sensor-bus")
+            self.read_pool_size = num_workers
+        # Bus locks are created here (not in the workers):
+        for bus_key in self.bus_partitions:
+            if bus_key not in self.bus_locks:
+                self.bus_locks[bus_key] = threading.Lock()
+        futures = [self.read_pool.submit(self._read_bus, bus_key, list(bus_sensors))
+                   for bus_key, bus_sensors in self.bus_partitions.items()]
+        readings = {}
+        for future in futures:
+            for sensor, sensor_val, timestamp in future.result():
+                readings[sensor] = (sensor_val, timestamp)
+        cycle_readings = [(sensor.base.alias,) + readings[sensor] for sensor in self.sensors]
+        if self.history is not None:
+            self._record_history(cycle_readings)
+        return cycle_readings
+
+    def set_read_deadline(self, s_alias, deadline):
+        """ Read deadline [sec] of a sensor in 'read_cycle_guarded()' - others use 'default_read_deadline'. """
+        sensor = self.aliases.get(s_alias)
+        if sensor is None:
+            print("ERROR: no sensor with alias '%s' - cannot set read deadline!" % s_alias)
+            return False
+        self.read_deadlines[sensor] = deadline
+        return True
+
+    def get_breaker(self, sensor):
+        breaker = self.breakers.get(sensor)
+        if breaker is None:
+            breaker = self.breakers[sensor] = CircuitBreaker(**self.breaker_settings)
+        return breaker
+
+    def _guarded_read(self, sensor, deadline_at, given_up):
+        """
+        Read sensor holding its bus lock - giving up if the bus is not free before 'deadline_at'
+        (or the read is stale already when it gets to run), or if the cycle has given up on it ('given_up' set).
+        """
+        bus_key = (sensor.base.type_name, sensor.base.bus_no)
+        bus_lock = self.bus_locks[bus_key]
+        if given_up.is_set():
+            return STATUS_BUSY, None
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0.0 or not bus_lock.acquire(timeout=remaining):
+            return STATUS_TIMEOUT, None
+        try:
+            if given_up.is_set():
+                return STATUS_BUSY, None
+            self.bus_readers[bus_key] = sensor
+            return STATUS_OK, self.read_value(sensor)
+        finally:
+            self.bus_readers.pop(bus_key, None)
+            bus_lock.release()
+
+    def read_cycle_guarded(self):
+        """
+        Read all sensors in ONE cycle, bounded by the read deadlines - so a hung or flapping device can not stall it:
+        - reads run in (daemon) worker threads, serialized per bus; the cycle waits for each read until its deadline
+          (counted from the start of the cycle) - i.e. the cycle takes at most as long as the longest deadline
+        - a read not done by then is reported as timed out; while it hangs, the sensor is not read again,
+          and the other sensors of its bus are skipped as busy (not counted against their circuit breakers)
+        - each sensor has a circuit breaker (see 'sensor_guard') - failing sensors are skipped, and probed with back-off
+        Returns list of (sensor_name, sensor_val, timestamp, status) - in registry order,
+        where 'status' is one of the 'STATUS_...' codes of 'sensor_readings'.
+        """
+        if self.guarded_pool is None:
+            self.guarded_pool = DaemonReadPool()
+        cycle_start = time.monotonic()
+        results = {}
+        pending_reads = []
+        # Buses held by a read given up on (in an earlier cycle, or in this one):
+        busy_buses = {bus_key for bus_key, sensor in list(self.bus_readers.items()) if sensor in self.reads_in_flight}
         for sensor in self.sensors:
-            if sensor.base.type_name == "i2c":
-                i2c_sensors.append(sensor)
-        return i2c_sensors
+            bus_key = (sensor.base.type_name, sensor.base.bus_no)
+            if bus_key not in self.bus_locks:
+                self.bus_locks[bus_key] = threading.Lock()
+            breaker = self.get_breaker(sensor)
+            if bus_key in busy_buses and sensor not in self.reads_in_flight:
+                results[sensor] = (None, time.time(), STATUS_BUSY)
+            elif not breaker.allow():
+                results[sensor] = (None, time.time(), STATUS_OPEN)
+            elif sensor in self.reads_in_flight:
+                # Previous read still hanging:
+                breaker.record_failure()
+                results[sensor] = (None, time.time(), STATUS_TIMEOUT)
+            else:
+                deadline_at = cycle_start + self.read_deadlines.get(sensor, self.default_read_deadline)
+                given_up = threading.Event()
+                pending_reads.append((deadline_at, sensor, bus_key, given_up,
+                                      self.guarded_pool.submit(self._guarded_read, sensor, deadline_at, given_up)))
+        pending_reads.sort(key=lambda pending_read: pending_read[0])
+        for deadline_at, sensor, bus_key, given_up, future in pending_reads:
+            if bus_key in busy_buses and not future.done():
+                # Waiting for the bus held by a read given up on - skip (its thread gives up, too):
+                given_up.set()
+                future.cancel()
+                self.breakers[sensor].record_skipped()
+                results[sensor] = (None, time.time(), STATUS_BUSY)
+                continue
+            try:
+                status, sensor_val = future.result(timeout=max(deadline_at - time.monotonic(), 0.0))
+            except FutureTimeout:
+                status, sensor_val = STATUS_TIMEOUT, None
+                given_up.set()
+                if self.bus_readers.get(bus_key) is sensor:
+                    busy_buses.add(bus_key)
+                self.reads_in_flight[sensor] = future
+                future.add_done_callback(lambda _, sensor=sensor: self.reads_in_flight.pop(sensor, None))
+            except Exception as exc:
+                print("ERROR reading sensor '%s': %s" % (sensor.base.alias, exc))
+                status, sensor_val = STATUS_ERROR, None
+            if status == STATUS_OK:
+                self.breakers[sensor].record_success()
+            elif status == STATUS_BUSY:
+                self.breakers[sensor].record_skipped()
+            else:
+                if status == STATUS_TIMEOUT:
+                    print("ERROR: reading sensor '%s' timed out!" % sensor.base.alias)
+                self.breakers[sensor].record_failure()
+            results[sensor] = (sensor_val, time.time(), status)
+        cycle_results = [(sensor.base.alias,) + results[sensor] for sensor in self.sensors]
+        if self.history is not None:
+            self._record_history(cycle_results)
+        return cycle_results
+
+    async def _aread_sensor(self, sensor, timeout, bus_semaphores, max_per_bus):
+        """
+        Read one sensor - natively if the driver's 'read' is a coroutine function, otherwise in a worker thread.
+        At most 'max_per_bus' reads run at the same time on a bus ('bus_semaphores' - one per bus, created by the
+        calling cycle, i.e. in its event loop). 'timeout' covers waiting for a bus slot AND the read - a sensor that
+        gets no slot in time, or whose read times out, is reported as None. A read that times out keeps its bus
+        slot until it actually returns (a coroutine read is cancelled, a blocking driver read can not be).
+        """
+        base = sensor.base
+        bus_key = (base.type_name, base.bus_no)
+        bus_semaphore = bus_semaphores.get(bus_key)
+        if bus_semaphore is None:
+            bus_semaphore = bus_semaphores[bus_key] = asyncio.Semaphore(max_per_bus)
+        loop = asyncio.get_running_loop()
+        timeout_at = None if timeout is None else loop.time() + timeout
+        is_coroutine = inspect.iscoroutinefunction(base.read)
+        has_slot = False
+        pending_read = None
+        try:
+            await asyncio.wait_for(bus_semaphore.acquire(), timeout)
+            has_slot = True
+            if is_coroutine:
+                if sensor in self.unconfigured:
+                    await loop.run_in_executor(None, self.configure_sensor, sensor)
+                pending_read = asyncio.ensure_future(base.read())
+            else:
+                # Bus slot is released by the worker thread, once the driver read has returned:
+                pending_read = loop.run_in_executor(None, self._read_releasing, sensor, loop, bus_semaphore)
+            remaining = None if timeout_at is None else max(0.0, timeout_at - loop.time())
+            sensor_val = await asyncio.wait_for(asyncio.shield(pending_read), remaining)
+        except asyncio.TimeoutError:
+            if pending_read is None:
+                print("ERROR: reading sensor '%s' timed out - no bus slot (after %s sec)!" % (base.alias, timeout))
+            else:
+                print("ERROR: reading sensor '%s' timed out (after %s sec)!" % (base.alias, timeout))
+                # Late result/error of the read is of no interest:
+                pending_read.add_done_callback(lambda done_read: done_read.cancelled() or done_read.exception())
+            sensor_val = None
+        except Exception as exc:
+            print("ERROR reading sensor '%s': %s" % (base.alias, exc))
+            sensor_val = None
+        finally:
+            if not has_slot:
+                pass
+            elif pending_read is None:
+                # Failed before reading (e.g. in configuration, or timed out in it):
+                bus_semaphore.release()
+            elif is_coroutine:
+                if pending_read.done():
+                    bus_semaphore.release()
+                else:
+                    pending_read.cancel()
+                    pending_read.add_done_callback(lambda _: bus_semaphore.release())
+        return base.alias, sensor_val, time.time()
 
-    def get_spi_sensors(self):
-        spi_sensors = []
+    def _read_releasing(self, sensor, loop, bus_semaphore):
+        """ Blocking read (in a worker thread) - releases the bus slot in 'loop' when the read has returned. """
+        try:
+            return self.read_value(sensor)
+        finally:
+            try:
+                loop.call_soon_threadsafe(bus_semaphore.release)
+            except RuntimeError:
+                # Event loop closed meanwhile - its semaphores are gone with it:
+                pass
+
+    async def aread_all(self, timeout=None, max_per_bus=1):
+        """
+        Asyncio version of 'read_cycle()' - reads all sensors without blocking the event loop.
+        'timeout' is per read (=None: no timeout), 'max_per_bus' limits concurrent reads per physical bus.
+        Returns list of (sensor_name, sensor_val, timestamp) - in registry order.
+        """
+        bus_semaphores = {}
+        cycle_readings = await asyncio.gather(*[self._aread_sensor(sensor, timeout, bus_semaphores, max_per_bus)
+                                                for sensor in self.sensors])
+        if self.history is not None:
+            self._record_history(cycle_readings)
+        return cycle_readings
+
+    async def aget_sensor_data(self, timeout=None, max_per_bus=1):
+        """
+        Async generator version of 'get_sensor_data()' - use 'async for sensor_name, sensor_val in ...'.
+        Readings are yielded as they complete (i.e. NOT in registry order).
+        """
+        bus_semaphores = {}
+        for pending_read in asyncio.as_completed([self._aread_sensor(sensor, timeout, bus_semaphores, max_per_bus)
+                                                  for sensor in self.sensors]):
+            sensor_name, sensor_val, _ = await pending_read
+            yield (sensor_name, sensor_val)
+
+    def enable_history(self, capacity=1024):
+        """
+        Keep the last 'capacity' readings of every sensor (from 'read_cycle()'/'aread_all()') in NumPy ring-buffers
+        - see 'sensor_history.HistoryStore'. Keyed by sensor id (see 'get_history()' for lookup by alias),
+        with rows as wide as the sensor's value shape.
+        @note Requires NumPy.
+        """
+        from sensor_history import HistoryStore
+        self.history = HistoryStore(capacity=capacity)
         for sensor in self.sensors:
-            if sensor.base.type_name == "spi":
-                spi_sensors.append(sensor)
-        return spi_sensors
+            self.history.add(self.sensor_ids[sensor], self.value_shapes[sensor].width)
+        return self.history
 
-    def get_uart_sensors(self):
-        uart_sensors = []
+    def get_history(self, s_alias):
+        """ History ('sensor_history.SensorHistory') of a sensor - by alias. None if no such sensor. """
+        sensor = self.aliases.get(s_alias)
+        if sensor is None or self.history is None:
+            return None
+        return self.history[self.sensor_ids[sensor]]
+
+    def _record_history(self, cycle_readings):
+        """
+        Record readings of a cycle - tuples starting with (sensor_name, sensor_val, timestamp), in registry order.
+        Values are recorded as decoded by the sensor's value shape - a value it cannot decode is recorded as NaN.
+        """
+        sensor_ids = self.sensor_ids
+        value_shapes = self.value_shapes
+        history_readings = []
+        for sensor, cycle_reading in zip(self.sensors, cycle_readings):
+            sensor_val = cycle_reading[1]
+            if sensor_val is not None:
+                try:
+                    sensor_val = value_shapes[sensor].decode(sensor_val)
+                except Exception as exc:
+                    print("ERROR: reading of sensor '%s' does not match its value shape %s: %s" %
+                          (sensor.base.alias, value_shapes[sensor], exc))
+                    sensor_val = None
+            history_readings.append((sensor_ids[sensor], sensor_val, cycle_reading[2]))
+        self.history.record_readings(history_readings)
+
+    def enable_read_cache(self, default_max_age=0.0, max_ages=None):
+        """
+        Put a read-through cache in front of the sensor reads (all reading methods, except the scheduler's),
+        so independent consumers share bus transactions - see 'sensor_cache.ReadCache'.
+        'max_ages' is a dict of alias --> max age [sec] of a cached value; others get 'default_max_age'.
+        """
+        self.read_cache = ReadCache(default_max_age=default_max_age)
+        for s_alias, max_age in (max_ages or {}).items():
+            sensor = self.aliases.get(s_alias)
+            if sensor is None:
+                print("ERROR: no sensor with alias '%s' - cannot set max age!" % s_alias)
+            else:
+                self.read_cache.set_max_age(sensor, max_age)
+        return self.read_cache
+
+    def enable_bus_pool(self, device_paths=None):
+        """
+        Read all sensors (also ones added later) through persistent bus handles - each bus's device node is
+        opened once and shared by its sensors, instead of per sensor/read - see 'sensor_bus.BusHandlePool'.
+        'device_paths': bus type --> path pattern, or function (type_name, bus_no) --> path (e.g. for stand-ins).
+        Handles stay open until 'close()'.
+        """
+        if self.bus_pool is None:
+            self.bus_pool = BusHandlePool(device_paths)
+            self.bus_pool.attach(self, bus_reads)
+        return self.bus_pool
+
+    def process_acquisition(self, period=0.1, quiet=False):
+        """
+        Multi-process acquisition - one worker process per bus, latest readings in shared memory
+        (see 'sensor_workers.ProcessAcquisition'). Use as: 'with sensors.process_acquisition() as acq: acq.snapshot()'.
+        @note Requires NumPy.
+        """
+        from sensor_workers import ProcessAcquisition
+        # Workers read through the drivers directly:
+        self.configure_all(parallel=True)
+        return ProcessAcquisition(self, period=period, quiet=quiet)
+
+    def sampling_scheduler(self, periods, default_period=None, callback=None):
+        """
+        Multi-rate scheduler for the registered sensors - 'periods' is a dict of alias --> sampling period [sec].
+        Sensors not in 'periods' are sampled every 'default_period' seconds (=None: not sampled).
+        """
+        scheduler = SamplingScheduler(callback=callback)
+        scheduled = []
         for sensor in self.sensors:
-            if sensor.base.type_name == "uart":
-                uart_sensors.append(sensor)
-        return uart_sensors
+            period = periods.get(sensor.base.alias, default_period)
+            if period is not None:
+                scheduler.add(sensor, period)
+                scheduled.append(sensor)
+        # Scheduler reads through the drivers directly:
+        self.configure_all(sensors=scheduled)
+        for s_alias in periods:
+            if s_alias not in self.aliases:
+                print("ERROR: no sensor with alias '%s' to schedule!" % s_alias)
+        return scheduler
+
+    def close(self):
+        """ Shut down worker threads (of concurrent and guarded reading) and close the bus handles. """
+        if self.read_pool is not None:
+            self.read_pool.shutdown()
+            self.read_pool = None
+        if self.guarded_pool is not None:
+            self.guarded_pool.shutdown()
+            self.guarded_pool = None
+        if self.bus_pool is not None:
+            self.bus_pool.close()
+
+    # NOTE: the 'get_<type>_sensors()' methods return read-only, live views - copy with 'list()' if needed.
+    def get_i2c_sensors(self):
+        return self.type_partitions["i2c"].keys()
+
+    def get_spi_sensors(self):
+        return self.type_partitions["spi"].keys()
+
+    def get_uart_sensors(self):
+        return self.type_partitions["uart"].keys()
+
+    def sensors_by(self, type_name=None, bus_no=None, dev_name=None):
+        """
+        Find sensors matching ALL of the given criteria (=None means 'any').
+        Starts from the smallest applicable partition and filters that on the remaining criteria.
+        """
+        partitions = []
+        if type_name is not None:
+            if bus_no is not None:
+                partitions.append(self.bus_partitions.get((type_name, bus_no), {}))
+            else:
+                partitions.append(self.type_partitions.get(type_name, {}))
+        if dev_name is not None:
+            partitions.append(self.dev_name_partitions.get(dev_name, {}))
+        if not partitions:
+            partitions.append(self.sensors)
+        smallest = min(partitions, key=len)
+        return [sensor for sensor in smallest
+                if (type_name is None or sensor.base.type_name == type_name) and
+                (bus_no is None or sensor.base.bus_no == bus_no) and
+                (dev_name is None or sensor.base.dev_name == dev_name)]
 
     def get_sensor_by_alias(self, s_alias=None):
         """
-        Find sensor by alias - which SHOULD be unique.
+        Find sensor by alias - which is unique (enforced by 'add_sensor()').
         This is NOT the case with attribute 'dev_name'.
-        TODO: infer checks for alias uniqueness! (on input also ...)
         """
-        sensor_found = None
         if s_alias is None:
             # TODO: rather throw ArgumentException error ... (no?)
             print("ERROR: no sensor name specified!")
-        else:
-            for sensor in self.sensors:
-                if s_alias == sensor.base.alias:
-                    sensor_found = sensor
-                    break
-        return sensor_found
+            return None
+        return self.aliases.get(s_alias)
+
+    def get_sensors_by_aliases(self, s_aliases):
+        """ Batch version of 'get_sensor_by_alias()' - yields None for each unknown alias. """
+        aliases_get = self.aliases.get
+        return [aliases_get(s_alias) for s_alias in s_aliases]
 
 
 # *********** TEST ******************
@@ -507,6 +1283,12 @@ if __name__ == "__main__":
     #
     sensors.list_sensors()
     #
+    # Deferred configuration - nothing configured by adding; 'RHT-sensor1' on its first read, the rest batched per bus:
+    print("Not configured: %s" % [s.base.alias for s in sensors.unconfigured])
+    sensors.read_value(sensors.get_sensor_by_alias("RHT-sensor1"))
+    print("Not configured after first read of 'RHT-sensor1': %s" % [s.base.alias for s in sensors.unconfigured])
+    print("configure_all() errors: %s" % sensors.configure_all(parallel=True))
+    #
     # Alt1:
     sensors.read_sensors()
     #
@@ -517,6 +1299,87 @@ if __name__ == "__main__":
     for num in range(len(sensors.sensors)):
         name, value = next(sdata)
         print("Sensor %d named '%s' value: %s" % (num, name, value))
+    # Alt2b (concurrent - one worker per bus):
+    print("Sensor data from concurrent read-cycle:")
+    print("=======================================")
+    sensors.enable_history(capacity=16)
+    for name, value, timestamp in sensors.read_cycle():
+        print("Sensor named '%s' value: %s (at %.3f)" % (name, value, timestamp))
+    # Alt2c (asyncio):
+    print("Sensor data from asyncio read:")
+    print("==============================")
+    for name, value, timestamp in asyncio.run(sensors.aread_all(timeout=1.0)):
+        print("Sensor named '%s' value: %s (at %.3f)" % (name, value, timestamp))
+    # History (of the 2 read-cycles above):
+    print("Latest value of every sensor (by id): %s" % (sensors.history.latest(),))
+    print("Last 2 readings of 'RHT-sensor3': %s" % (sensors.get_history("RHT-sensor3").last(2),))
+    # History of a sensor with a custom (structured) value shape:
+    from types import SimpleNamespace
+    from sensor_readings import ValueShape
+    th_sensors = Sensors()
+    th_sensors.add_sensor('{"sensor_type": "i2c", "bus_no": 7, "i2c_addr": 64, "dev_name": "SHT31", "alias": "TH-1"}')
+    th_sensor = th_sensors.get_sensor_by_alias("TH-1")
+    th_sensors.set_value_shape(th_sensor, ValueShape.structured("TH", ["temp", "hum"]))
+    th_sensors.configure_all()
+    th_sensors.enable_history(capacity=4)
+    th_sensor.base.read = lambda: SimpleNamespace(temp=21.5, hum=40.0)
+    th_sensors.read_cycle()
+    asyncio.run(th_sensors.aread_all())
+    th_sensor.base.read = lambda: 21.5      # Does not match the declared shape --> NaN
+    th_sensors.read_cycle()
+    print("History of 'TH-1' (temp, hum): %s" % (th_sensors.get_history("TH-1").last()[1].tolist(),))
+    th_sensors.close()
+    # Alt2d (multi-rate sampling - each sensor at its own rate):
+    print("Sensor data from multi-rate scheduler:")
+    print("======================================")
+    scheduler = sensors.sampling_scheduler({"RHT-sensor1": 0.01, "RHT-sensor2A": 0.02}, default_period=0.05,
+                                           callback=lambda name, value, ts: print("Sensor named '%s' value: %s (at %dns)" %
+                                                                                  (name, value, ts)))
+    scheduler.run(max_reads=6)
+    print(scheduler.stats())
+    # Alt2e (cached - two consumers, one bus-read per sensor):
+    sensors.enable_read_cache(default_max_age=1.0, max_ages={"RHT-sensor3": 0.0})
+    print("Consumer 1: %s" % list(sensors.get_sensor_data()))
+    print("Consumer 2: %s" % list(sensors.get_sensor_data()))
+    print("Read cache counters: %s" % sensors.read_cache.counters())
+    sensors.read_cache = None
+    # Alt2f (into ONE preallocated buffer - reused every cycle):
+    read_buffer = sensors.make_read_buffer()
+    for _ in range(2):
+        sensors.read_all_into(read_buffer)
+    print("Buffer layout: %s" % [(sensor.base.alias, offset, width) for sensor, offset, width in sensors.read_layout()])
+    print("Buffer after read-cycle: %s" % read_buffer.tolist())
+    # Alt2g (guarded - hung device: read deadline, then circuit breaker):
+    print("Sensor data from guarded read-cycles (with hung UART-device):")
+    print("=============================================================")
+
+    def hung_uart_read():
+        time.sleep(0.3)
+        return [3, 4, 5]
+    sensors.get_sensor_by_alias("RHT-sensor3").base.read = hung_uart_read
+    sensors.set_read_deadline("RHT-sensor3", 0.1)
+    sensors.breaker_settings["failure_threshold"] = 2
+    for cycle_no in range(4):
+        cycle_start = time.monotonic()
+        cycle_results = sensors.read_cycle_guarded()
+        print("Cycle %d (%.2f sec): %s" % (cycle_no, time.monotonic() - cycle_start,
+                                          [(name, status_names[status]) for name, _, _, status in cycle_results]))
+    print(sensors.breakers[sensors.get_sensor_by_alias("RHT-sensor3")])
+    sensors.get_sensor_by_alias("RHT-sensor3").base.read = get_uart_val
+    # Hung I2C-device - its bus-mates are skipped as busy, without waiting for their (longer) deadlines:
+    mates = Sensors()
+    mates.add_sensors([{"sensor_type": "i2c", "bus_no": 5, "i2c_addr": i2c_addr, "dev_name": "HDC1080",
+                        "alias": "RHT-5-%d" % i2c_addr} for i2c_addr in (64, 65, 66)])
+    mates.configure_all()
+    mates.get_sensor_by_alias("RHT-5-64").base.read = lambda: time.sleep(0.3) or 21.5
+    mates.set_read_deadline("RHT-5-64", 0.1)
+    for cycle_no in range(2):
+        cycle_start = time.monotonic()
+        cycle_results = mates.read_cycle_guarded()
+        print("Bus-mates cycle %d (%.2f sec): %s" %
+              (cycle_no, time.monotonic() - cycle_start,
+               [(name, status_names[status]) for name, _, _, status in cycle_results]))
+    mates.close()
     # Alt3 (using generator just as Alt2 - but simpler):
     print("Sensor data from generator:")
     print("===========================")
@@ -545,13 +1408,51 @@ if __name__ == "__main__":
         print(my_sensor.base.__dict__)
         print(my_sensor.__dict__)
     #
+    # Batch-lookup (unknown alias gives None):
+    print(sensors.get_sensors_by_aliases(["RHT-sensor1", "IMU-A2", "no-such-sensor"]))
+    print("SPI-sensors on bus#1: %s" % [s.base.alias for s in sensors.sensors_by(type_name="spi", bus_no=1)])
+    print("BM281-sensors: %s" % [s.base.alias for s in sensors.sensors_by(dev_name="BM281")])
+    # Bulk-add - rejected as a whole due to bus-resource conflict within batch:
+    print(sensors.add_sensors([
+        {"sensor_type": "i2c", "bus_no": 3, "i2c_addr": 10, "dev_name": "BM280", "alias": "bulk-1"},
+        {"sensor_type": "i2c", "bus_no": 3, "i2c_addr": 10, "dev_name": "BM280", "alias": "bulk-2"},
+        """{"sensor_type": "spi", "bus_no": 2, "dev_name": "SHT721", "alias": "bulk-3"}""",
+    ]))
+    print(sensors.add_sensors([
+        {"sensor_type": "i2c", "bus_no": 3, "i2c_addr": 10, "dev_name": "BM280", "alias": "bulk-1"},
+        {"sensor_type": "i2c", "bus_no": 3, "i2c_addr": 11, "dev_name": "BM280", "alias": "bulk-2"},
+    ]))
+    print("I2C-sensors on bus#3: %s" % [s.base.alias for s in sensors.sensors_by(type_name="i2c", bus_no=3)])
+    # Snapshot - save & restore, then reject for another config:
+    import os
+    import tempfile
+    snap_path = os.path.join(tempfile.mkdtemp(), "sensors.snap")
+    digest = registry_snapshot.config_digest("demo-config v1")
+    sensors.save_snapshot(snap_path, digest)
+    restored = Sensors.load_snapshot(snap_path, digest)
+    print("Restored %d of %d sensors from snapshot: %s" % (len(restored.sensors), len(sensors.sensors),
+                                                            [s.base.alias for s in restored.sensors]))
+    print("Restored 'sensor2D': %s" % restored.get_sensor_by_alias("sensor2D").__dict__)
+    print("Snapshot for changed config: %s" %
+          Sensors.load_snapshot(snap_path, registry_snapshot.config_digest("demo-config v2")))
+    # Fails alias-uniqueness test:
+    sensors.add_sensor(json.dumps({"sensor_type": "i2c", "bus_no": 2, "i2c_addr": 76, "dev_name": "BM281", "alias": "sensor2D"}))
+    # Removal frees both alias and bus-resource:
+    sensors.remove_sensor_by_alias("sensor2D")
+    sensors.add_sensor(json.dumps({"sensor_type": "i2c", "bus_no": 2, "i2c_addr": 77, "dev_name": "BM281", "alias": "sensor2D"}))
+    #
     # Fails base-schema test:
     sensors.add_sensor("""{"sensor_type": "i2c", "i2c_addr": 77, "clk_speed": 100000, "dev_name": "BM281","alias": "sensor2E"}""")
     # Fails devspec-schema test:
     sensors.add_sensor("""{"sensor_type": "i2c", "bus_no": 2, "clk_speed": 100000, "dev_name": "BM281", "alias": "sensor2F"}""")
-
-
-
-
-
-
+    #
+    # Persistent bus handles - regular files standing in for the device nodes:
+    stand_in_dir = tempfile.mkdtemp()
+    bus_pool = sensors.enable_bus_pool(lambda type_name, bus_no: os.path.join(stand_in_dir, "%s-%d" % (type_name, bus_no)))
+    for bus_key in sensors.bus_partitions:
+        open(bus_pool.device_path(*bus_key), "wb").close()
+    for _ in range(3):
+        list(sensors.get_sensor_data())
+    print("Bus pool after 3 read-loops over %d sensors: %s" % (len(sensors.sensors), bus_pool.counters()))
+    #
+    sensors.close()
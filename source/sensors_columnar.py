@@ -0,0 +1,203 @@
+"""
+@file sensors_columnar.py
+@brief Columnar (struct-of-arrays) sensor registry, backed by NumPy - for fleet-wide operations
+(filtering, conflict detection, grouping) that run vectorized instead of looping over sensor objects.
+Each sensor is one row in the typed columns 'type_code', 'bus_no', 'bus_value' (=I2C-address, SPI CS-number
+or UART baud-rate) and 'dev_name_id' (index into an interned string table).
+The sensor objects (I2cSensor/SpiSensor/UartSensor) are kept alongside - or built on demand from a row.
+
+@note Requires NumPy.
+"""
+
+import numpy as np
+
+from registry_snapshot import type_codes, type_names, bus_value_fields
+
+
+class ColumnarSensors:
+    """
+    Columnar sensor registry - use 'from_sensors()' to create one from the sensors of a 'Sensors' instance.
+    """
+    def __init__(self, capacity=1024, build_sensor=None):
+        # Optional 'build_sensor(props)' function, for creating sensor objects on demand:
+        self.build_sensor = build_sensor
+        self.num_sensors = 0
+        self._type_code = np.zeros(capacity, dtype=np.uint8)
+        self._bus_no = np.zeros(capacity, dtype=np.int32)
+        self._bus_value = np.zeros(capacity, dtype=np.int32)
+        self._dev_name_id = np.zeros(capacity, dtype=np.int32)
+        # Interned string tables:
+        self.dev_names = []
+        self._dev_name_ids = {}
+        self.aliases = []
+        # Sensor objects per row (None = not built yet):
+        self._objects = []
+
+    @classmethod
+    def from_sensors(cls, sensors, build_sensor=None):
+        columnar = cls(capacity=max(len(sensors), 1), build_sensor=build_sensor)
+        for sensor in sensors:
+            columnar.add_sensor(sensor)
+        return columnar
+
+    # Column views (of the used part of the arrays):
+    @property
+    def type_code(self):
+        return self._type_code[:self.num_sensors]
+
+    @property
+    def bus_no(self):
+        return self._bus_no[:self.num_sensors]
+
+    @property
+    def bus_value(self):
+        return self._bus_value[:self.num_sensors]
+
+    @property
+    def dev_name_id(self):
+        return self._dev_name_id[:self.num_sensors]
+
+    def _grow(self):
+        capacity = 2 * len(self._type_code)
+        self._type_code = np.resize(self._type_code, capacity)
+        self._bus_no = np.resize(self._bus_no, capacity)
+        self._bus_value = np.resize(self._bus_value, capacity)
+        self._dev_name_id = np.resize(self._dev_name_id, capacity)
+
+    def dev_name_to_id(self, dev_name):
+        dev_name_id = self._dev_name_ids.get(dev_name)
+        if dev_name_id is None:
+            dev_name_id = self._dev_name_ids[dev_name] = len(self.dev_names)
+            self.dev_names.append(dev_name)
+        return dev_name_id
+
+    def add_row(self, type_name, bus_no, bus_value, dev_name="none", alias="none", sensor=None):
+        """ Append one sensor (row) - returns its row index. """
+        row = self.num_sensors
+        if row == len(self._type_code):
+            self._grow()
+        self._type_code[row] = type_codes[type_name]
+        self._bus_no[row] = bus_no
+        self._bus_value[row] = bus_value
+        self._dev_name_id[row] = self.dev_name_to_id(dev_name)
+        self.aliases.append(alias)
+        self._objects.append(sensor)
+        self.num_sensors += 1
+        return row
+
+    def add_sensor(self, sensor):
+        base = sensor.base
+        bus_value = getattr(sensor, bus_value_fields[base.type_name])
+        return self.add_row(base.type_name, base.bus_no, bus_value, base.dev_name, base.alias, sensor=sensor)
+
+    # ****************** Vectorized operations ******************
+
+    def mask(self, type_name=None, bus_no=None, dev_name=None):
+        """ Boolean row-mask for the given criteria (=None means 'any') - combine with column comparisons. """
+        row_mask = np.ones(self.num_sensors, dtype=bool)
+        if type_name is not None:
+            row_mask &= self.type_code == type_codes[type_name]
+        if bus_no is not None:
+            row_mask &= self.bus_no == bus_no
+        if dev_name is not None:
+            if dev_name not in self._dev_name_ids:
+                return np.zeros(self.num_sensors, dtype=bool)
+            row_mask &= self.dev_name_id == self._dev_name_ids[dev_name]
+        return row_mask
+
+    def select(self, type_name=None, bus_no=None, dev_name=None, row_mask=None):
+        """
+        Row indices matching ALL of the given criteria, e.g. all SPI-sensors on bus 1 with CS>3:
+        'select("spi", bus_no=1, row_mask=(columnar.bus_value > 3))'.
+        """
+        selected = self.mask(type_name, bus_no, dev_name)
+        if row_mask is not None:
+            selected &= row_mask
+        return np.flatnonzero(selected)
+
+    def resource_keys(self):
+        """ Bus-resource key per row as (N x 3)-array of (type-code, bus_no, address/CS) - UART: port only. """
+        keys = np.empty((self.num_sensors, 3), dtype=np.int64)
+        keys[:, 0] = self.type_code
+        keys[:, 1] = self.bus_no
+        keys[:, 2] = np.where(self.type_code == type_codes["uart"], 0, self.bus_value)
+        return keys
+
+    def conflicts(self):
+        """ Bulk conflict check - returns list of row-index arrays, one per bus-resource used by >1 sensor. """
+        keys = self.resource_keys()
+        order = np.lexsort(keys.T[::-1])
+        sorted_keys = keys[order]
+        # Start of each run of equal keys:
+        new_key = np.ones(len(order), dtype=bool)
+        new_key[1:] = np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1)
+        run_starts = np.flatnonzero(new_key)
+        run_lengths = np.diff(np.append(run_starts, len(order)))
+        return [np.sort(order[start:start + length])
+                for start, length in zip(run_starts, run_lengths) if length > 1]
+
+    def group_by_bus(self):
+        """ Row indices grouped per physical bus - dict of (type_name, bus_no) --> row-index array. """
+        bus_keys = self.type_code.astype(np.int64) << 32 | (self.bus_no.astype(np.int64) & 0xFFFFFFFF)
+        unique_keys, inverse = np.unique(bus_keys, return_inverse=True)
+        order = np.argsort(inverse, kind="stable")
+        split_at = np.flatnonzero(np.diff(inverse[order])) + 1
+        groups = {}
+        for bus_key, rows in zip(unique_keys, np.split(order, split_at)):
+            type_code = int(bus_key >> 32)
+            bus_no = int(np.int32(np.uint32(bus_key & 0xFFFFFFFF)))
+            groups[(type_names[type_code], bus_no)] = rows
+        return groups
+
+    # ****************** Sensor objects ******************
+
+    def row_props(self, row):
+        """ Sensor spec (props) of a row - as for 'Sensors.build_sensor()'. """
+        type_name = type_names[int(self._type_code[row])]
+        return {"sensor_type": type_name,
+                "bus_no": int(self._bus_no[row]),
+                bus_value_fields[type_name]: int(self._bus_value[row]),
+                "dev_name": self.dev_names[self._dev_name_id[row]],
+                "alias": self.aliases[row]}
+
+    def sensor(self, row):
+        """ Sensor object of a row - the one added, or (if built from columns) built on first request. """
+        sensor = self._objects[row]
+        if sensor is None:
+            if self.build_sensor is None:
+                raise ValueError("No sensor object for row %d - and no 'build_sensor' function given!" % row)
+            sensor = self._objects[row] = self.build_sensor(self.row_props(row))
+        return sensor
+
+    def sensors(self, rows):
+        return [self.sensor(row) for row in rows]
+
+
+# *********** TEST ******************
+if __name__ == "__main__":
+    import contextlib
+    import io
+    import sensors_builder_validatedjson as builder_variant
+
+    def build_sensor(props):
+        return builder_variant.Sensors.build_sensor(sensor_clsname=builder_variant.sensor_type_map[props["sensor_type"]],
+                                                    base_clsname=builder_variant.ExternalSensorBase,
+                                                    props=props)
+
+    columnar = ColumnarSensors(capacity=4, build_sensor=build_sensor)
+    for cs_no in range(8):
+        columnar.add_row("spi", 1, cs_no, "MPU6050", "IMU-%d" % cs_no)
+    columnar.add_row("spi", 2, 3, "MPU6050", "IMU-B3")
+    columnar.add_row("i2c", 2, 78, "BM280", "RHT-sensor1")
+    columnar.add_row("i2c", 2, 78, "BM281", "RHT-sensor1-dup")
+    columnar.add_row("uart", 4, 115200, "CustomHygrometerSubmodule", "RHT-sensor3")
+    columnar.add_row("uart", 4, 38400, "CustomHygrometerSubmodule", "RHT-sensor4")
+    #
+    rows = columnar.select("spi", bus_no=1, row_mask=(columnar.bus_value > 3))
+    print("SPI-sensors on bus 1 with CS>3: %s" % [columnar.aliases[row] for row in rows])
+    print("Conflicts: %s" % [[columnar.aliases[row] for row in rows] for rows in columnar.conflicts()])
+    print("Sensors per bus: %s" % {bus: len(rows) for bus, rows in columnar.group_by_bus().items()})
+    with contextlib.redirect_stdout(io.StringIO()):
+        sensor = columnar.sensor(rows[0])
+    print("Sensor object (built on demand): %s %s - same on next request: %s" %
+          (sensor, sensor.base.alias, columnar.sensor(rows[0]) is sensor))
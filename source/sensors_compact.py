@@ -0,0 +1,188 @@
+"""
+@file sensors_compact.py
+@brief Compact sensor object model - ONE object per sensor, using '__slots__' (i.e. no per-object '__dict__'),
+with interned strings. The read/config functions are slots too - set from the sensor class' driver functions,
+so they can be rebound per sensor (e.g. by 'sensor_bus.BusHandlePool.attach()' or 'SimulationEngine.attach()').
+The sensor object is its own 'base', so code written for the builder-variants
+('sensor.base.alias', 'sensor.base.read()', 'sensor.i2c_addr' etc.) works unchanged.
+Fields unknown to the sensor class (extension fields, like 'clk_speed') go into an optional side table ('extras').
+
+Use in a registry as 'sensors_builder_validatedjson.Sensors(compact=True)'.
+
+@note Device configuration is NOT done on construction - fields are unset at that point anyway.
+"""
+
+import sys
+
+
+MOCKED_DRIVER_TEST = False
+
+if MOCKED_DRIVER_TEST:
+    from sensor_drivers.mocked_sensor_driver import *
+else:
+    from sensor_drivers.sensor_driver import *
+
+
+class CompactSensorBase:
+    """
+    Compact (external) sensor base class - holds base AND device-specific fields.
+    """
+    __slots__ = ("bus_no", "dev_name", "alias", "extras", "config", "read", "read_into")
+    bus_property1 = {"i2c": "bus-address", "spi": "ChipSelect-number", "uart": "baud_rate"}
+    # Per sensor class - type name, and driver functions (config, read, read_into):
+    type_name = None
+    drivers = (None, None, None)
+
+    def __init__(self):
+        self.bus_no = None
+        self.dev_name = "none"
+        self.alias = "none"
+        self.extras = None
+        self.config, self.read, self.read_into = self.drivers
+
+    @property
+    def base(self):
+        return self
+
+    @property
+    def bus_prop1(self):
+        return self.bus_property1[self.type_name]
+
+    def __getattr__(self, field_name):
+        # Only called if NOT a slot/class attribute - i.e. look in side table
+        # (read via slot-descriptor, so an unset slot cannot recurse into here):
+        extras = CompactSensorBase.extras.__get__(self)
+        if extras is not None and field_name in extras:
+            return extras[field_name]
+        raise AttributeError("'%s' sensor has no field '%s'" % (self.type_name, field_name))
+
+    def fields(self):
+        """ Device-specific fields (incl. extension fields) as (name, value) pairs. """
+        for field_name in type(self).__slots__:
+            yield field_name, getattr(self, field_name)
+        if self.extras is not None:
+            yield from self.extras.items()
+
+    def get_info(self):
+        bus_type_name = self.type_name.upper()
+        print("%s-sensor properties:" % bus_type_name)
+        print("---------------------")
+        print("%s-interface no: %d" % (bus_type_name, self.bus_no))
+        print("%s connected device: %s" % (bus_type_name, self.dev_name))
+        print("%s sensor alias: %s" % (bus_type_name, self.alias))
+        print("Bus-specific properties:")
+        for sensor_prop, prop_value in self.fields():
+            print("Sensor property %s = %s" % (sensor_prop, prop_value))
+
+
+class CompactI2cSensor(CompactSensorBase):
+    __slots__ = ("i2c_addr",)
+    type_name = "i2c"
+    drivers = (configure_i2c_sensor, get_i2c_val, get_i2c_val_into)
+
+    def __init__(self):
+        super().__init__()
+        self.i2c_addr = None
+
+
+class CompactSpiSensor(CompactSensorBase):
+    __slots__ = ("cs_no",)
+    type_name = "spi"
+    drivers = (configure_spi_sensor, get_spi_val, get_spi_val_into)
+
+    def __init__(self):
+        super().__init__()
+        self.cs_no = None
+
+
+class CompactUartSensor(CompactSensorBase):
+    __slots__ = ("baud_rate",)
+    type_name = "uart"
+    drivers = (None, get_uart_val, get_uart_val_into)
+
+    def __init__(self):
+        super().__init__()
+        self.baud_rate = None
+
+
+# **************** SENSOR-BUILDER ********************
+class CompactSensorBuilder(object):
+    """
+    Slot-aware sensor builder - known fields are set through their slot, others go into the side table.
+    """
+    # Settable (slot-)fields per sensor class - string-values of these are interned:
+    _slot_fields = {}
+    _interned_fields = frozenset(("dev_name", "alias"))
+    # Slots not settable from a spec:
+    _internal_slots = frozenset(("extras", "config", "read", "read_into"))
+
+    def __init__(self, sensor_instance=None):
+        self.sensor_obj = sensor_instance
+        sensor_class = type(sensor_instance)
+        slot_fields = self._slot_fields.get(sensor_class)
+        if slot_fields is None:
+            slot_fields = frozenset(field_name for cls in sensor_class.__mro__
+                                    for field_name in cls.__dict__.get("__slots__", ())) - self._internal_slots
+            self._slot_fields[sensor_class] = slot_fields
+        self.slot_fields = slot_fields
+
+    def with_field(self, field_name, field_value):
+        if field_name in self.slot_fields:
+            if field_name in self._interned_fields and type(field_value) is str:
+                field_value = sys.intern(field_value)
+            setattr(self.sensor_obj, field_name, field_value)
+        else:
+            if self.sensor_obj.extras is None:
+                self.sensor_obj.extras = {}
+            self.sensor_obj.extras[sys.intern(field_name)] = field_value
+        return self
+
+    def build(self):
+        return self.sensor_obj
+
+
+compact_sensor_type_map = {"i2c": CompactI2cSensor, "spi": CompactSpiSensor, "uart": CompactUartSensor}
+
+
+def build_compact_sensor(props):
+    """ Build compact sensor from (decoded JSON-)spec - 'sensor_type' selects the sensor class. """
+    sensor_builder = CompactSensorBuilder(compact_sensor_type_map[props["sensor_type"]]())
+    for sensor_prop_name, prop_value in props.items():
+        if sensor_prop_name != "sensor_type":
+            sensor_builder.with_field(sensor_prop_name, prop_value)
+    return sensor_builder.build()
+
+
+# *********** TEST ******************
+if __name__ == "__main__":
+    sensor = build_compact_sensor({"sensor_type": "spi", "bus_no": 1, "cs_no": 3, "clk_speed": 5000000,
+                                   "dev_name": "MPU6050", "alias": "IMU-A1"})
+    sensor.get_info()
+    print("Alias (via base): %s, CS: %d, clk_speed: %d, read: %s" %
+          (sensor.base.alias, sensor.cs_no, sensor.clk_speed, sensor.base.read()))
+    # Per-sensor read overrides - through a bus pool and by simulated devices - in a compact registry:
+    import contextlib
+    import os
+    import tempfile
+    from sensors_builder_validatedjson import Sensors
+    from sensor_drivers.mocked_sensor_driver import SimClock, SimulationEngine
+    specs = [{"sensor_type": "i2c", "bus_no": bus_no, "i2c_addr": addr, "dev_name": "HDC1080",
+              "alias": "RHT-%d-%d" % (bus_no, addr)}
+             for bus_no in range(2) for addr in (0x40, 0x41)]
+    specs.append({"sensor_type": "spi", "bus_no": 0, "cs_no": 1, "clk_speed": 1000000, "dev_name": "MPU6050",
+                  "alias": "IMU-0"})
+    sensors = Sensors(compact=True)
+    print("Errors: %s" % sensors.add_sensors(specs))
+    tmp_dir = tempfile.mkdtemp()
+    for type_name in ("i2c", "spi"):
+        for bus_no in range(2):
+            open(os.path.join(tmp_dir, "%s-%d" % (type_name, bus_no)), "wb").close()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        pool = sensors.enable_bus_pool(lambda type_name, bus_no: os.path.join(tmp_dir, "%s-%d" % (type_name,
+                                                                                                    bus_no)))
+        readings = sensors.read_cycle()
+    print("Bus pool: %d readings, %s" % (len(readings), pool.counters()))
+    sensors.close()
+    engine = SimulationEngine(seed=1, clock=SimClock())
+    engine.attach(sensors)
+    print("Simulated: %s - counters: %s" % (sensors.read_cycle()[:2], engine.counters))
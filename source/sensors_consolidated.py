@@ -18,6 +18,8 @@ or 4 base-classes that are more specialized.
 
 import time
 
+from sensor_readings import ValueShape, complex_value_shape
+
 
 # TODO: add clk-speed(s) etc!
 MAX_BAUD_RATE = 921400
@@ -62,6 +64,10 @@ def get_uart_val():
     return 3.1234
 
 
+# Value shapes of the readings from the functions above - all single values:
+default_value_shapes = {"i2c": ValueShape.scalar(), "spi": ValueShape.scalar(), "uart": ValueShape.scalar()}
+
+
 class ExternalSensorBase:
     """
     Base sensor class no.1 (external sensors, connected to a bus)
@@ -263,33 +269,55 @@ class Sensors:
     """
     Class which is a PLACEHOLDER for multiple sensors of different type.
     """
-    def __init__(self, sensors=[]):
-        self.sensors = sensors
+    def __init__(self, sensors=None):
+        self.sensors = []
+        # Index of occupied bus-resources: (bus-type, bus_no, address/CS/port) --> sensor
+        self.bus_resources = {}
+        # Declared shape of the readings of each sensor (see 'sensor_readings'): sensor --> ValueShape
+        self.value_shapes = {}
+        if sensors is not None:
+            for sensor in sensors:
+                self._index_sensor(sensor)
+
+    @staticmethod
+    def bus_resource_key(sensor):
+        """ Key of the bus-resource occupied by sensor - i.e. (bus-type, bus_no, address/CS/port). """
+        type_name = sensor.base.type_name
+        if type_name == "i2c":
+            return type_name, sensor.base.bus_no, sensor.i2c_addr
+        if type_name == "spi":
+            return type_name, sensor.base.bus_no, sensor.cs_no
+        # UART: the serial port itself is the resource - one sensor per port.
+        return type_name, sensor.base.bus_no, None
+
+    def _index_sensor(self, sensor, value_shape=None):
+        self.sensors.append(sensor)
+        self.bus_resources[self.bus_resource_key(sensor)] = sensor
+        self.value_shapes[sensor] = value_shape or default_value_shapes[sensor.base.type_name]
+
+    def _unindex_sensor(self, sensor):
+        self.sensors.remove(sensor)
+        del self.bus_resources[self.bus_resource_key(sensor)]
+        del self.value_shapes[sensor]
 
     def i2c_validate(self, sensor):
-        i2c_sensors = self.get_i2c_sensors()
-        for i2c_sensor in i2c_sensors:
-            if sensor.i2c_addr == i2c_sensor.i2c_addr:
-                print("ERROR validating I2C-sensor: address=%d already in use on bus#=%d!" %
-                      (sensor.i2c_addr, sensor.base.bus_no))
-                return False
+        if self.bus_resource_key(sensor) in self.bus_resources:
+            print("ERROR validating I2C-sensor: address=%d already in use on bus#=%d!" %
+                  (sensor.i2c_addr, sensor.base.bus_no))
+            return False
         return True
 
     def spi_validate(self, sensor):
-        spi_sensors = self.get_spi_sensors()
-        for spi_sensor in spi_sensors:
-            if sensor.base.bus_no == spi_sensor.base.bus_no and sensor.cs_no == spi_sensor.cs_no:
-                print("ERROR validating SPI-sensor: CS=%d already in use on bus#=%d!" %
-                      (sensor.cs_no, sensor.base.bus_no))
-                return False
+        if self.bus_resource_key(sensor) in self.bus_resources:
+            print("ERROR validating SPI-sensor: CS=%d already in use on bus#=%d!" %
+                  (sensor.cs_no, sensor.base.bus_no))
+            return False
         return True
 
     def uart_validate(self, sensor):
-        uart_sensors = self.get_uart_sensors()
-        for uart_sensor in uart_sensors:
-            if sensor.base.bus_no == uart_sensor.base.bus_no:
-                print("ERROR validating UART-sensor: serialport=%d already in use!" % sensor.base.bus_no)
-                return False
+        if self.bus_resource_key(sensor) in self.bus_resources:
+            print("ERROR validating UART-sensor: serialport=%d already in use!" % sensor.base.bus_no)
+            return False
         return True
 
     @staticmethod
@@ -337,7 +365,7 @@ class Sensors:
         #
         return sensor
 
-    def add_sensor(self, ppack):
+    def add_sensor(self, ppack, value_shape=None):
         validators = {"i2c": self.i2c_validate, "spi": self.spi_validate, "uart": self.uart_validate}
         sensor_type = ppack[0]
         print("Type: ", sensor_type)
@@ -351,7 +379,7 @@ class Sensors:
             print("Validating sensor properties ...")
             validator = validators[sensor.base.type_name]
             if validator(sensor):
-                self.sensors.append(sensor)
+                self._index_sensor(sensor, value_shape)
             else:
                 raise Exception("Parameter ERROR: cannot add sensor to sensor-list!")
         except Exception as exc:
@@ -359,6 +387,14 @@ class Sensors:
             # print(sys.exc_info())
             print(exc.args)
 
+    def remove_sensor(self, sensor):
+        """ Remove a registered sensor - releasing the bus-resource it occupies. """
+        if self.bus_resources.get(self.bus_resource_key(sensor)) is not sensor:
+            print("ERROR: cannot remove sensor - not registered!")
+            return False
+        self._unindex_sensor(sensor)
+        return True
+
     def list_sensors(self):
         if len(self.sensors) == 0:
             print("No sensors registered!")
@@ -374,29 +410,23 @@ class Sensors:
         print("Registered sensors:")
         print("===================")
         for idx, sensor in enumerate(self.sensors):
-            val = sensor.base.read()
-            print("Sensor no.%d: %s (type=%s) value = %s" % (idx, sensor.base.alias, sensor.base.dev_name, val))
-            if type(val) is not float:
-                # Check if list or complex value:
-                if type(val) is list:
-                    print("Value list:")
-                    print("------------")
-                    for val_no, item_val in enumerate(val):
-                        print("Value no.%d = %d" % (val_no, item_val))
-                    print("")
-                else:
-                    print("Reading sensor: complex value - cannot parse!")
-                    """
-                    if isinstance(val, ComplexValue):
-                        print("Complex value:")
-                        print("--------------")
-                        print("Triggered: ", val.triggered)
-                        print("Channel no: ", val.channel)
-                        print("Value: ", val.ch_val)
-                        print("")
-                    else:
-                        print("ERROR: cannot parse sensor readout result!")
-                    """
+            # Decoder of the value shape declared at registration - no probing of the value type:
+            value_shape = self.value_shapes[sensor]
+            try:
+                reading = value_shape.decode(sensor.base.read())
+            except (TypeError, AttributeError):
+                print("ERROR: cannot parse sensor readout result (expected %s)!" % value_shape)
+                continue
+            value_shape.show(idx, sensor, reading)
+
+    def get_sensor_readings(self):
+        """ Like 'get_sensor_data()' - but yields (sensor_name, reading) with the reading as typed record. """
+        for sensor in self.sensors:
+            yield (sensor.base.alias, self.value_shapes[sensor].decode(sensor.base.read()))
+
+    def set_value_shape(self, sensor, value_shape):
+        """ Declare shape of the readings of a registered sensor - see 'sensor_readings.ValueShape'. """
+        self.value_shapes[sensor] = value_shape
 
     def get_sensor_data(self):
         """ Generator version of 'read_sensors()' which may be more usable. """
@@ -470,6 +500,13 @@ if __name__ == "__main__":
     sensors.add_sensor(("i2c", 2, 77, "BM281", "sensor2C"))
     #
     sensors.list_sensors()
+    #
+    # Sensor with structured readings ('ComplexValue') - shape declared at registration:
+    from sensor_drivers.sensor_driver import ComplexValue
+    sensors.add_sensor(("spi", 2, 1, "ADS1118", "ADC-1"), value_shape=complex_value_shape)
+    sensors.sensors[-1].base.read = lambda: ComplexValue(True, 7, 8.765)
+    sensors.read_sensors()
+    print(list(sensors.get_sensor_readings()))
 
 
 
@@ -221,33 +221,51 @@ class UartSensor:
 class Sensors:
     sensor_type_map = {"i2c": I2cSensor, "spi": SpiSensor, "uart": UartSensor}
 
-    def __init__(self, sensors=[]):
-        self.sensors = sensors
+    def __init__(self, sensors=None):
+        self.sensors = []
+        # Index of occupied bus-resources: (bus-type, bus_no, address/CS/port) --> sensor
+        self.bus_resources = {}
+        if sensors is not None:
+            for sensor in sensors:
+                self._index_sensor(sensor)
+
+    @staticmethod
+    def bus_resource_key(sensor):
+        """ Key of the bus-resource occupied by sensor - i.e. (bus-type, bus_no, address/CS/port). """
+        type_name = sensor.base.type_name
+        if type_name == "i2c":
+            return type_name, sensor.base.bus_no, sensor.i2c_addr
+        if type_name == "spi":
+            return type_name, sensor.base.bus_no, sensor.cs_no
+        # UART: the serial port itself is the resource - one sensor per port.
+        return type_name, sensor.base.bus_no, None
+
+    def _index_sensor(self, sensor):
+        self.sensors.append(sensor)
+        self.bus_resources[self.bus_resource_key(sensor)] = sensor
+
+    def _unindex_sensor(self, sensor):
+        self.sensors.remove(sensor)
+        del self.bus_resources[self.bus_resource_key(sensor)]
 
     def i2c_validate(self, sensor):
-        i2c_sensors = self.get_i2c_sensors()
-        for i2c_sensor in i2c_sensors:
-            if sensor.i2c_addr == i2c_sensor.i2c_addr:
-                print("ERROR validating I2C-sensor: address=%d already in use on bus#=%d!" %
-                      (sensor.i2c_addr, sensor.base.bus_no))
-                return False
+        if self.bus_resource_key(sensor) in self.bus_resources:
+            print("ERROR validating I2C-sensor: address=%d already in use on bus#=%d!" %
+                  (sensor.i2c_addr, sensor.base.bus_no))
+            return False
         return True
 
     def spi_validate(self, sensor):
-        spi_sensors = self.get_spi_sensors()
-        for spi_sensor in spi_sensors:
-            if sensor.base.bus_no == spi_sensor.base.bus_no and sensor.cs_no == spi_sensor.cs_no:
-                print("ERROR validating SPI-sensor: CS=%d already in use on bus#=%d!" %
-                      (sensor.cs_no, sensor.base.bus_no))
-                return False
+        if self.bus_resource_key(sensor) in self.bus_resources:
+            print("ERROR validating SPI-sensor: CS=%d already in use on bus#=%d!" %
+                  (sensor.cs_no, sensor.base.bus_no))
+            return False
         return True
 
     def uart_validate(self, sensor):
-        uart_sensors = self.get_uart_sensors()
-        for uart_sensor in uart_sensors:
-            if sensor.base.bus_no == uart_sensor.base.bus_no:
-                print("ERROR validating UART-sensor: serialport=%d already in use!" % sensor.base.bus_no)
-                return False
+        if self.bus_resource_key(sensor) in self.bus_resources:
+            print("ERROR validating UART-sensor: serialport=%d already in use!" % sensor.base.bus_no)
+            return False
         return True
 
     def add_sensor(self, ppack):
@@ -261,7 +279,7 @@ class Sensors:
             # Validating sensor instance BEFORE appending to list:
             validator = validators[sensor.base.type_name]
             if validator(sensor):
-                self.sensors.append(sensor)
+                self._index_sensor(sensor)
             else:
                 raise Exception("Parameter ERROR: cannot add sensor to sensor-list!")
         except Exception as exc:
@@ -269,6 +287,14 @@ class Sensors:
             # print(sys.exc_info())
             print(exc.args)
 
+    def remove_sensor(self, sensor):
+        """ Remove a registered sensor - releasing the bus-resource it occupies. """
+        if self.bus_resources.get(self.bus_resource_key(sensor)) is not sensor:
+            print("ERROR: cannot remove sensor - not registered!")
+            return False
+        self._unindex_sensor(sensor)
+        return True
+
     def list_sensors(self):
         if len(self.sensors) == 0:
             print("No sensors registered!")